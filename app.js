@@ -4744,7 +4744,7 @@ function showGeneratedPhoto(data) {
     
     // 显示结果
     if (selfieResult && generatedSelfie) {
-        generatedSelfie.src = data.image_url || data.base64;
+        generatedSelfie.src = data.base64 || `${API_BASE_URL}${data.image_url}`;
         selfieResult.style.display = 'block';
         
         // 保存生成的照片数据
@@ -4770,8 +4770,9 @@ function showGeneratedPhoto(data) {
 // 下载生成的照片
 function downloadSelfie() {
     if (window.generatedPhotoData) {
-        // 获取图片URL，优先使用base64，其次使用image_url
-        const imageUrl = window.generatedPhotoData.base64 || window.generatedPhotoData.image_url;
+        // 获取图片URL，优先使用base64，其次使用下载接口（返回attachment，跨域时也能触发下载）
+        const { base64, filename } = window.generatedPhotoData;
+        const imageUrl = base64 || (filename && `${API_BASE_URL}/api/download-image/${encodeURIComponent(filename)}`);
         
         if (!imageUrl) {
             logger.error('❌ 没有可下载的图片数据');
@@ -5180,7 +5181,7 @@ function renderDoroSelector(tab) {
         doroItem.className = 'doro-item';
         doroItem.dataset.doroId = doro.id;
         doroItem.innerHTML = `
-            <img src="${doro.url || doro.thumbnail}" alt="${doro.name}">
+            <img src="${doro.thumbnail || doro.url}" alt="${doro.name}" loading="lazy">
             <div class="doro-item-name">${doro.name}</div>
         `;
         doroItem.onclick = () => selectDoro(doro);
@@ -5553,8 +5554,8 @@ async function generateDoroSelfie() {
         
         if (data.success) {
             // 显示结果
-            doroSelfieData.generatedImage = data.data;
-            document.getElementById('generatedDoroSelfie').src = data.data.image_url;
+            doroSelfieData.generatedImage = { ...data.data, image_url: `${API_BASE_URL}${data.data.image_url}` };
+            document.getElementById('generatedDoroSelfie').src = doroSelfieData.generatedImage.image_url;
             
             document.getElementById('doroLoading').style.display = 'none';
             document.getElementById('doroResult').style.display = 'block';
@@ -5579,7 +5580,7 @@ function downloadDoroSelfie() {
     if (!doroSelfieData.generatedImage) return;
     
     const link = document.createElement('a');
-    link.href = doroSelfieData.generatedImage.image_url;
+    link.href = `${API_BASE_URL}/api/download-image/${encodeURIComponent(doroSelfieData.generatedImage.filename)}`;
     link.download = doroSelfieData.generatedImage.filename || `doro_selfie_${Date.now()}.png`;
     link.click();
     
@@ -5599,7 +5600,7 @@ async function shareDoroSelfie() {
     
     try {
         if (navigator.share) {
-            // 先将base64转换为blob
+            // 先将图片下载为blob
             const response = await fetch(doroSelfieData.generatedImage.image_url);
             const blob = await response.blob();
             const file = new File([blob], 'doro_selfie.png', { type: 'image/png' });
@@ -5742,24 +5743,29 @@ async function generateDoroVideo() {
         
         if (!response.ok) {
             const error = await response.json();
-            throw new Error(error.detail || '视频生成失败');
+            throw new Error(error.detail?.message || error.detail || '视频生成失败');
         }
         
         const data = await response.json();
         
-        if (data.success) {
-            // 显示结果
-            doroSelfieData.generatedVideo = data.data;
-            document.getElementById('generatedDoroVideo').src = data.data.video_url;
-            
-            document.getElementById('doroLoading').style.display = 'none';
-            document.getElementById('doroVideoResult').style.display = 'block';
-            
-            logger.info(`✅ Doro合影视频生成成功: ${data.data.filename}`);
-        } else {
+        if (!data.success) {
             throw new Error(data.message || '视频生成失败');
         }
         
+        // 任务已提交，轮询任务状态直到完成
+        logger.info(`🕐 视频生成任务已提交: ${data.data.job_id}`);
+        const job = await waitForDoroVideoJob(data.data.status_url);
+        const videoData = { ...job, video_url: `${API_BASE_URL}${job.video_url}` };
+        
+        // 显示结果
+        doroSelfieData.generatedVideo = videoData;
+        document.getElementById('generatedDoroVideo').src = videoData.video_url;
+        
+        document.getElementById('doroLoading').style.display = 'none';
+        document.getElementById('doroVideoResult').style.display = 'block';
+        
+        logger.info(`✅ Doro合影视频生成成功: ${job.filename}`);
+        
     } catch (error) {
         logger.error('❌ 生成Doro合影视频失败:', error);
         
@@ -5770,6 +5776,32 @@ async function generateDoroVideo() {
     }
 }
 
+// 轮询Doro视频任务，直到成功或失败
+async function waitForDoroVideoJob(statusUrl, interval = 5000, maxWait = 15 * 60 * 1000) {
+    const startTime = Date.now();
+    
+    while (Date.now() - startTime < maxWait) {
+        await new Promise(resolve => setTimeout(resolve, interval));
+        
+        const response = await fetch(`${API_BASE_URL}${statusUrl}`);
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || '查询视频任务失败');
+        }
+        
+        const job = (await response.json()).data;
+        if (job.status === 'succeeded') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.message || '视频生成失败');
+        }
+        logger.info(`⏳ 视频任务 ${job.job_id}: ${job.message}`);
+    }
+    
+    throw new Error('视频生成超时，请稍后重试');
+}
+
 // 显示Doro视频结果
 function displayDoroVideoResult(videoData) {
     // 隐藏其他区域
@@ -10,6 +10,8 @@ import os
 from typing import List, Dict, Optional
 from urllib.parse import quote
 
+from http_client import http_clients
+
 class AmapService:
     """高德地图API服务"""
     
@@ -33,20 +35,20 @@ class AmapService:
                 'extensions': 'all'  # 返回详细信息
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        print(f"高德地图POI搜索结果: {data.get('count', 0)} 个")
-                        
-                        if data.get('status') == '1' and data.get('pois'):
-                            return self._parse_pois(data['pois'])
-                        else:
-                            print(f"高德地图API错误: {data.get('info', 'Unknown error')}")
-                            return []
+            session = http_clients.get("amap")
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    print(f"高德地图POI搜索结果: {data.get('count', 0)} 个")
+                    
+                    if data.get('status') == '1' and data.get('pois'):
+                        return self._parse_pois(data['pois'])
                     else:
-                        print(f"高德地图API请求失败: HTTP {response.status}")
+                        print(f"高德地图API错误: {data.get('info', 'Unknown error')}")
                         return []
+                else:
+                    print(f"高德地图API请求失败: HTTP {response.status}")
+                    return []
                         
         except Exception as e:
             print(f"高德地图API异常: {e}")
@@ -240,7 +242,43 @@ class AmapService:
         else:
             return "https://images.unsplash.com/photo-1477959858617-67f85cf4f1df?w=400"
     
-    async def geocode_reverse(self, lat: float, lon: float) -> Optional[Dict]:
+    async def geocode(self, address: str, session: Optional[aiohttp.ClientSession] = None) -> Optional[Dict]:
+        """
+        地理编码 - 根据地址获取坐标
+        
+        Args:
+            address: 地址或地名
+            session: 调用方提供的HTTP会话，为空时使用http_clients注册表中共享的amap会话
+            
+        Returns:
+            高德geocodes中的第一条结果，失败时返回None
+        """
+        try:
+            url = f"{self.base_url}/geocode/geo"
+            params = {
+                'key': self.api_key,
+                'address': address,
+                'output': 'json'
+            }
+            
+            data = await self._get_json(url, params, session)
+            if data is None:
+                return None
+            
+            if data.get('status') == '1' and data.get('geocodes'):
+                return data['geocodes'][0]
+            
+            print(f"高德地理编码错误: {data.get('info', 'Unknown error')}")
+            return None
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"高德地理编码异常: {e}")
+            return None
+    
+    async def geocode_reverse(self, lat: float, lon: float,
+                              session: Optional[aiohttp.ClientSession] = None) -> Optional[Dict]:
         """逆地理编码 - 根据坐标获取地址信息"""
         try:
             url = f"{self.base_url}/geocode/regeo"
@@ -254,36 +292,46 @@ class AmapService:
                 'roadlevel': 0
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        if data.get('status') == '1' and data.get('regeocode'):
-                            regeocode = data['regeocode']
-                            addressComponent = regeocode.get('addressComponent', {})
-                            
-                            return {
-                                'formatted_address': regeocode.get('formatted_address', ''),
-                                'country': addressComponent.get('country', '中国'),
-                                'province': addressComponent.get('province', ''),
-                                'city': addressComponent.get('city', ''),
-                                'district': addressComponent.get('district', ''),
-                                'township': addressComponent.get('township', ''),
-                                'neighborhood': addressComponent.get('neighborhood', {}),
-                                'building': addressComponent.get('building', {}),
-                                'pois': regeocode.get('pois', [])
-                            }
-                        else:
-                            print(f"高德逆地理编码错误: {data.get('info', 'Unknown error')}")
-                            return None
-                    else:
-                        print(f"高德逆地理编码请求失败: HTTP {response.status}")
-                        return None
+            data = await self._get_json(url, params, session)
+            if data is None:
+                return None
+            
+            if data.get('status') == '1' and data.get('regeocode'):
+                regeocode = data['regeocode']
+                addressComponent = regeocode.get('addressComponent', {})
+                
+                return {
+                    'formatted_address': regeocode.get('formatted_address', ''),
+                    'country': addressComponent.get('country', '中国'),
+                    'province': addressComponent.get('province', ''),
+                    'city': addressComponent.get('city', ''),
+                    'district': addressComponent.get('district', ''),
+                    'township': addressComponent.get('township', ''),
+                    'neighborhood': addressComponent.get('neighborhood', {}),
+                    'building': addressComponent.get('building', {}),
+                    'pois': regeocode.get('pois', [])
+                }
+            else:
+                print(f"高德逆地理编码错误: {data.get('info', 'Unknown error')}")
+                return None
                         
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             print(f"高德逆地理编码异常: {e}")
             return None
+    
+    async def _get_json(self, url: str, params: Dict,
+                        session: Optional[aiohttp.ClientSession] = None) -> Optional[Dict]:
+        """发送GET请求并解析JSON，HTTP状态码非200时返回None"""
+        if session is None:
+            session = http_clients.get("amap")
+        
+        async with session.get(url, params=params) as response:
+            if response.status != 200:
+                print(f"高德地图API请求失败: HTTP {response.status}")
+                return None
+            return await response.json()
 
 # 全局实例
 amap_service = AmapService()
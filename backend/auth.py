@@ -8,8 +8,9 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 import jwt
 import os
+import asyncio
 import logging
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient
 from gotrue.errors import AuthApiError
 
 router = APIRouter()
@@ -22,16 +23,38 @@ logger = logging.getLogger(__name__)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+supabase_enabled = bool(SUPABASE_URL and SUPABASE_SERVICE_KEY)
+if not supabase_enabled:
     logger.warning("Supabase配置缺失，使用本地认证模式")
-    supabase: Optional[Client] = None
-else:
+
+# 异步客户端在第一次使用时创建，所有认证请求复用同一个连接池
+_supabase: Optional[AsyncClient] = None
+_supabase_lock = asyncio.Lock()
+
+async def get_supabase() -> Optional[AsyncClient]:
+    """获取共享的Supabase异步客户端，配置缺失或初始化失败时返回None"""
+    global _supabase, supabase_enabled
+    if _supabase is None and supabase_enabled:
+        async with _supabase_lock:
+            if _supabase is None and supabase_enabled:
+                try:
+                    _supabase = await acreate_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+                    logger.info("✅ Supabase客户端初始化成功")
+                except Exception as e:
+                    logger.error(f"❌ Supabase客户端初始化失败: {e}")
+                    supabase_enabled = False
+    return _supabase
+
+async def close_supabase():
+    """关闭Supabase异步客户端的连接池"""
+    global _supabase
+    client, _supabase = _supabase, None
+    if client is None:
+        return
     try:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-        logger.info("✅ Supabase客户端初始化成功")
+        await client.postgrest.aclose()
     except Exception as e:
-        logger.error(f"❌ Supabase客户端初始化失败: {e}")
-        supabase = None
+        logger.warning(f"关闭Supabase客户端失败: {e}")
 
 # JWT配置
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -78,8 +101,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_supabase_token(token: str) -> Optional[Dict]:
+async def verify_supabase_token(token: str) -> Optional[Dict]:
     """验证Supabase JWT令牌"""
+    supabase = await get_supabase()
     if not supabase:
         return None
     
@@ -138,13 +162,8 @@ def verify_supabase_token(token: str) -> Optional[Dict]:
         
         # 方法2: 使用Supabase客户端验证（备用方式）
         try:
-            # 创建一个临时的Supabase客户端来验证令牌
-            from supabase import create_client
-            temp_supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-            
             # 尝试使用令牌获取用户信息
-            headers = {"Authorization": f"Bearer {token}"}
-            response = temp_supabase.auth.get_user(token)
+            response = await supabase.auth.get_user(token)
             
             if response and response.user:
                 return {
@@ -162,6 +181,7 @@ def verify_supabase_token(token: str) -> Optional[Dict]:
 
 async def get_or_create_user_profile(user_id: str, email: str, username: Optional[str] = None) -> Dict:
     """获取或创建用户配置文件"""
+    supabase = await get_supabase()
     if not supabase:
         return {
             "user_id": user_id,
@@ -173,7 +193,7 @@ async def get_or_create_user_profile(user_id: str, email: str, username: Optiona
     
     try:
         # 查询用户配置文件
-        result = supabase.table('users').select('*').eq('id', user_id).execute()
+        result = await supabase.table('users').select('*').eq('id', user_id).execute()
         
         if result.data:
             user_data = result.data[0]
@@ -197,7 +217,7 @@ async def get_or_create_user_profile(user_id: str, email: str, username: Optiona
                 "updated_at": datetime.now().isoformat()
             }
             
-            result = supabase.table('users').insert(new_user).execute()
+            result = await supabase.table('users').insert(new_user).execute()
             if result.data:
                 user_data = result.data[0]
                 return {
@@ -224,6 +244,7 @@ async def get_or_create_user_profile(user_id: str, email: str, username: Optiona
 @router.post("/login", response_model=Token)
 async def login(user_credentials: UserLogin):
     """用户登录 - 使用Supabase认证"""
+    supabase = await get_supabase()
     if not supabase:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -234,7 +255,7 @@ async def login(user_credentials: UserLogin):
         logger.info(f"🔐 尝试登录用户: {user_credentials.email}")
         
         # 使用Supabase进行认证
-        response = supabase.auth.sign_in_with_password({
+        response = await supabase.auth.sign_in_with_password({
             "email": user_credentials.email,
             "password": user_credentials.password
         })
@@ -290,6 +311,7 @@ async def login(user_credentials: UserLogin):
 @router.post("/register", response_model=Dict[str, Any])
 async def register(user_data: UserRegister):
     """用户注册 - 使用Supabase认证"""
+    supabase = await get_supabase()
     if not supabase:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -314,7 +336,7 @@ async def register(user_data: UserRegister):
         logger.info(f"📝 尝试注册用户: {user_data.email}")
         
         # 使用Supabase进行注册
-        response = supabase.auth.sign_up({
+        response = await supabase.auth.sign_up({
             "email": user_data.email,
             "password": user_data.password,
             "options": {
@@ -374,9 +396,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     logger.info(f"🔍 收到/me请求，令牌长度: {len(token) if token else 0}")
     
     # 首先尝试验证Supabase令牌
-    if supabase:
+    if await get_supabase():
         logger.info("🔐 尝试Supabase令牌验证...")
-        supabase_user = verify_supabase_token(token)
+        supabase_user = await verify_supabase_token(token)
         if supabase_user:
             logger.info(f"✅ Supabase验证成功: {supabase_user['email']}")
             user_profile = await get_or_create_user_profile(
@@ -419,10 +441,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 @router.post("/logout")
 async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """用户登出"""
+    supabase = await get_supabase()
     if supabase:
         try:
             # 使用Supabase登出
-            supabase.auth.sign_out()
+            await supabase.auth.sign_out()
             logger.info("✅ 用户已登出")
         except Exception as e:
             logger.error(f"登出过程中发生错误: {e}")
@@ -438,9 +461,10 @@ async def update_profile(
     token = credentials.credentials
     
     # 验证用户身份
+    supabase = await get_supabase()
     user_info = None
     if supabase:
-        user_info = verify_supabase_token(token)
+        user_info = await verify_supabase_token(token)
     
     if not user_info:
         try:
@@ -464,7 +488,7 @@ async def update_profile(
     # 更新用户偏好
     if supabase:
         try:
-            result = supabase.table('users').update({
+            result = await supabase.table('users').update({
                 "preferences": preferences,
                 "updated_at": datetime.now().isoformat()
             }).eq('id', user_info["user_id"]).execute()
@@ -496,6 +520,6 @@ async def auth_health():
     """认证服务健康检查"""
     return {
         "status": "healthy",
-        "supabase_available": supabase is not None,
+        "supabase_available": supabase_enabled,
         "timestamp": datetime.now().isoformat()
     }
\ No newline at end of file
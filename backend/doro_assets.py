@@ -0,0 +1,117 @@
+"""
+Doro形象素材缓存
+指定doro_id生成合影时，Doro图片不再每次从磁盘读取、解码和缩放：
+预处理流水线的输出（缩放后的JPEG/WebP字节，直接作为Gemini的图片内容）按源文件版本缓存在内存中，
+总大小超过预算时按最近使用淘汰；服务启动时预加载全部预设Doro
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from doro_service import doro_service
+from doro_thumbnails import source_version
+from image_pipeline import image_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class DoroAssetCache:
+    """预处理后的Doro图片内存缓存"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 缓存图片字节的总预算
+        """
+        self.max_bytes = max_bytes
+        # (doro_id, 源文件版本) -> 预处理结果
+        self._assets: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    # ==================== 对外接口 ====================
+
+    async def get(self, doro_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取预处理后的Doro图片
+
+        Args:
+            doro_id: Doro ID（自定义Doro带custom_前缀）
+
+        Returns:
+            image_pipeline的处理结果（data、mime_type、size等），Doro不存在时返回None
+
+        Raises:
+            ImagePipelineError: Doro图片无法处理
+        """
+        path = doro_service.get_doro_by_id(doro_id)
+        if path is None:
+            return None
+
+        key = (doro_id, source_version(path))
+        with self._lock:
+            asset = self._assets.get(key)
+            if asset is not None:
+                self._assets.move_to_end(key)
+                self.counters["hits"] += 1
+                return asset
+
+        # 同一张图片的并发请求共享一次预处理
+        pending = self._pending.get(key)
+        if pending is None:
+            self.counters["misses"] += 1
+            pending = asyncio.ensure_future(self._load(key, path))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def preload(self):
+        """预加载全部预设Doro（服务启动时在后台执行）"""
+        doros = doro_service.get_all_doros()["preset"]
+        results = await asyncio.gather(*(self.get(doro["id"]) for doro in doros), return_exceptions=True)
+        failed = [doro["id"] for doro, result in zip(doros, results) if isinstance(result, Exception)]
+        if failed:
+            logger.warning(f"预加载Doro素材失败: {failed}")
+        logger.info(f"已预加载 {len(doros) - len(failed)} 个预设Doro素材，占用 {self._bytes // 1024}KB")
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            **self.counters,
+            "entries": len(self._assets),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    # ==================== 内部方法 ====================
+
+    async def _load(self, key: Tuple[str, str], path: Path) -> Dict[str, Any]:
+        data = await asyncio.to_thread(path.read_bytes)
+        asset = await image_pipeline.process(data)
+        # 只保留发送给模型需要的字段
+        asset = {field: asset[field] for field in ("data", "mime_type", "size", "original_size")}
+
+        with self._lock:
+            # 源文件已替换的旧版本不会再命中，直接移除
+            for stale in [k for k in self._assets if k[0] == key[0] and k != key]:
+                self._bytes -= len(self._assets.pop(stale)["data"])
+            self._assets[key] = asset
+            self._bytes += len(asset["data"])
+            while self._bytes > self.max_bytes and len(self._assets) > 1:
+                _, evicted = self._assets.popitem(last=False)
+                self._bytes -= len(evicted["data"])
+                self.counters["evictions"] += 1
+        return asset
+
+
+# 全局实例
+doro_assets = DoroAssetCache(max_bytes=int(float(os.getenv("DORO_ASSET_CACHE_MB", "32")) * 1024 * 1024))
@@ -6,10 +6,13 @@ Doro Service Module
 import os
 import json
 import uuid
-import shutil
+import time
+import threading
 from pathlib import Path
 from typing import List, Dict, Optional
 from fastapi import UploadFile, HTTPException
+from doro_thumbnails import source_version
+from upload_spool import spool_upload
 import logging
 from datetime import datetime
 import random
@@ -35,11 +38,19 @@ class DoroService:
         # 支持的图片格式
         self.supported_formats = {'.png', '.jpg', '.jpeg', '.webp', '.gif'}
         
-        # Doro元数据缓存
-        self._doro_cache = {}
+        # 内存中的Doro目录：ID -> {"path", "info"}，以及预先排序好的列表
+        self._catalog: Dict[str, Dict] = {}
+        self._listing: Dict[str, List[Dict]] = {"preset": [], "custom": []}
+        self._all: List[Dict] = []
+        # 目录和元数据文件的修改时间，变化时重建对应部分
+        self._signatures: Dict[str, tuple] = {}
+        self._last_check = 0.0
+        self.check_interval = float(os.getenv("DORO_CATALOG_CHECK_INTERVAL", "2"))
+        self._lock = threading.Lock()
         
         # 初始化预设Doro元数据
         self._init_preset_metadata()
+        self._refresh(force=True)
         
         logger.info(f"Doro服务初始化完成: 预设目录={self.preset_dir}, 自定义目录={self.custom_dir}")
     
@@ -73,55 +84,11 @@ class DoroService:
         Returns:
             包含预设和自定义Doro列表的字典
         """
+        self._refresh()
         result = {
-            "preset": [],
-            "custom": []
+            "preset": list(self._listing["preset"]),
+            "custom": list(self._listing["custom"])
         }
-        
-        # 获取预设Doro - 按数字顺序排序
-        preset_metadata = self._load_preset_metadata()
-        preset_files = []
-        for image_path in self.preset_dir.glob("*"):
-            if image_path.suffix.lower() in self.supported_formats:
-                preset_files.append(image_path)
-        
-        # 按文件名中的数字排序（doro1, doro2, ..., doro14）
-        preset_files.sort(key=lambda x: int(''.join(filter(str.isdigit, x.stem))) if any(c.isdigit() for c in x.stem) else 999)
-        
-        for image_path in preset_files:
-            doro_id = image_path.stem
-            metadata = preset_metadata.get(doro_id, {})
-            
-            result["preset"].append({
-                "id": doro_id,
-                "name": metadata.get("name", f"Doro {doro_id}"),
-                "description": metadata.get("description", ""),
-                "style": metadata.get("style", "default"),
-                "tags": metadata.get("tags", []),
-                "type": "preset",
-                "filename": image_path.name,
-                "url": f"https://doro.gitagent.io/api/doro/image/{doro_id}",
-                "thumbnail": f"https://doro.gitagent.io/api/doro/thumbnail/{doro_id}"
-            })
-        
-        # 获取自定义Doro
-        custom_metadata = self._load_custom_metadata()
-        for image_path in self.custom_dir.glob("*"):
-            if image_path.suffix.lower() in self.supported_formats:
-                doro_id = image_path.stem
-                metadata = custom_metadata.get(doro_id, {})
-                
-                result["custom"].append({
-                    "id": doro_id,
-                    "name": metadata.get("name", f"自定义 {doro_id[:8]}"),
-                    "description": metadata.get("description", "用户上传的自定义Doro"),
-                    "upload_time": metadata.get("upload_time", ""),
-                    "type": "custom",
-                    "filename": image_path.name,
-                    "url": f"https://doro.gitagent.io/api/doro/image/custom_{doro_id}",
-                    "thumbnail": f"https://doro.gitagent.io/api/doro/thumbnail/custom_{doro_id}"
-                })
-        
         logger.info(f"获取Doro列表: 预设={len(result['preset'])}个, 自定义={len(result['custom'])}个")
         return result
     
@@ -132,10 +99,8 @@ class DoroService:
         Returns:
             随机选择的Doro信息，如果没有可用Doro则返回None
         """
-        all_doros = self.get_all_doros()
-        
-        # 合并预设和自定义Doro
-        doro_list = all_doros["preset"] + all_doros["custom"]
+        self._refresh()
+        doro_list = self._all
         
         if not doro_list:
             logger.warning("没有可用的Doro形象")
@@ -170,26 +135,18 @@ class DoroService:
                 detail=f"不支持的文件格式。支持的格式: {', '.join(self.supported_formats)}"
             )
         
-        # 验证文件大小（最大10MB）
-        file.file.seek(0, 2)
-        file_size = file.file.tell()
-        file.file.seek(0)
-        
-        if file_size > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail="文件太大。最大支持10MB"
-            )
+        # 按块落盘，同时校验大小（最大10MB）和真实的图片类型
+        upload = await spool_upload(file, max_bytes=10 * 1024 * 1024, dir=str(self.custom_dir), label="Doro图片")
+        file_size = upload.size
         
-        # 生成唯一ID
+        # 生成唯一ID，扩展名以识别出的类型为准
         doro_id = str(uuid.uuid4())
-        filename = f"{doro_id}{file_ext}"
+        filename = f"{doro_id}{upload.extension}"
         file_path = self.custom_dir / filename
         
         # 保存文件
         try:
-            with open(file_path, "wb") as f:
-                shutil.copyfileobj(file.file, f)
+            upload.move_to(str(file_path))
             
             # 保存元数据
             metadata = {
@@ -198,10 +155,12 @@ class DoroService:
                 "description": description or "用户上传的自定义Doro形象",
                 "upload_time": datetime.now().isoformat(),
                 "original_filename": file.filename,
-                "file_size": file_size
+                "file_size": file_size,
+                "sha256": upload.sha256
             }
             
             self._save_custom_metadata(doro_id, metadata)
+            self._invalidate("custom")
             
             # 返回保存的信息
             result = {
@@ -211,7 +170,7 @@ class DoroService:
                 "type": "custom",
                 "filename": filename,
                 "url": f"https://doro.gitagent.io/api/doro/image/custom_{doro_id}",
-                "thumbnail": f"https://doro.gitagent.io/api/doro/thumbnail/custom_{doro_id}",
+                "thumbnail": f"https://doro.gitagent.io/api/doro/thumbnail/custom_{doro_id}?v={source_version(file_path)}",
                 "upload_time": metadata["upload_time"]
             }
             
@@ -220,6 +179,7 @@ class DoroService:
             
         except Exception as e:
             # 如果保存失败，清理文件
+            upload.close()
             if file_path.exists():
                 file_path.unlink()
             logger.error(f"保存自定义Doro失败: {str(e)}")
@@ -230,24 +190,14 @@ class DoroService:
         根据ID获取Doro图片路径
         
         Args:
-            doro_id: Doro的ID
-            
+            doro_id: Doro的ID（自定义Doro带custom_前缀）
+        
         Returns:
             图片文件路径，如果不存在则返回None
         """
-        # 检查是否是自定义Doro
-        if doro_id.startswith("custom_"):
-            actual_id = doro_id[7:]  # 移除 "custom_" 前缀
-            for file_path in self.custom_dir.glob(f"{actual_id}.*"):
-                if file_path.suffix.lower() in self.supported_formats:
-                    return file_path
-        else:
-            # 预设Doro
-            for file_path in self.preset_dir.glob(f"{doro_id}.*"):
-                if file_path.suffix.lower() in self.supported_formats:
-                    return file_path
-        
-        return None
+        self._refresh()
+        entry = self._catalog.get(doro_id)
+        return entry["path"] if entry else None
     
     def delete_custom_doro(self, doro_id: str) -> bool:
         """
@@ -276,9 +226,111 @@ class DoroService:
         # 删除元数据
         if deleted:
             self._delete_custom_metadata(actual_id)
+            self._invalidate("custom")
         
         return deleted
     
+    # ==================== 目录索引 ====================
+    
+    def _refresh(self, force: bool = False):
+        """
+        检查目录和元数据文件的修改时间，有变化时只重建变化的部分
+        
+        热路径上最多每check_interval秒做几次stat，不扫描目录
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return
+        
+        with self._lock:
+            if not force and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            
+            changed = False
+            for section, directory in (("preset", self.preset_dir), ("custom", self.custom_dir)):
+                signature = self._signature(directory)
+                if force or signature != self._signatures.get(section):
+                    self._rebuild(section)
+                    self._signatures[section] = signature
+                    changed = True
+            
+            if changed:
+                self._all = self._listing["preset"] + self._listing["custom"]
+    
+    def _invalidate(self, section: str):
+        """本服务修改了目录内容，立即重建（不等待下一次检查）"""
+        with self._lock:
+            self._rebuild(section)
+            directory = self.preset_dir if section == "preset" else self.custom_dir
+            self._signatures[section] = self._signature(directory)
+            self._all = self._listing["preset"] + self._listing["custom"]
+    
+    @staticmethod
+    def _signature(directory: Path) -> tuple:
+        """目录本身（增删文件）和metadata.json（名称描述等）的修改时间"""
+        signature = []
+        for path in (directory, directory / "metadata.json"):
+            try:
+                signature.append(path.stat().st_mtime_ns)
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _rebuild(self, section: str):
+        """扫描一个目录，重建该部分的索引和列表（调用方持有_lock）"""
+        if section == "preset":
+            metadata = self._load_preset_metadata()
+            files = [p for p in self.preset_dir.glob("*") if p.suffix.lower() in self.supported_formats]
+            # 按文件名中的数字排序（doro1, doro2, ..., doro14）
+            files.sort(key=lambda x: (int(''.join(filter(str.isdigit, x.stem))) if any(c.isdigit() for c in x.stem) else 999, x.name))
+        else:
+            metadata = self._load_custom_metadata()
+            files = sorted(p for p in self.custom_dir.glob("*") if p.suffix.lower() in self.supported_formats)
+        
+        catalog = {doro_id: entry for doro_id, entry in self._catalog.items() if entry["info"]["type"] != section}
+        listing = []
+        for image_path in files:
+            if section == "preset":
+                doro_id = image_path.stem
+                meta = metadata.get(doro_id, {})
+                info = {
+                    "id": doro_id,
+                    "name": meta.get("name", f"Doro {doro_id}"),
+                    "description": meta.get("description", ""),
+                    "style": meta.get("style", "default"),
+                    "tags": meta.get("tags", []),
+                    "type": "preset",
+                    "filename": image_path.name,
+                    "url": f"https://doro.gitagent.io/api/doro/image/{doro_id}",
+                    "thumbnail": f"https://doro.gitagent.io/api/doro/thumbnail/{doro_id}?v={source_version(image_path)}"
+                }
+                key = doro_id
+            else:
+                doro_id = image_path.stem
+                meta = metadata.get(doro_id, {})
+                info = {
+                    "id": doro_id,
+                    "name": meta.get("name", f"自定义 {doro_id[:8]}"),
+                    "description": meta.get("description", "用户上传的自定义Doro"),
+                    "upload_time": meta.get("upload_time", ""),
+                    "type": "custom",
+                    "filename": image_path.name,
+                    "url": f"https://doro.gitagent.io/api/doro/image/custom_{doro_id}",
+                    "thumbnail": f"https://doro.gitagent.io/api/doro/thumbnail/custom_{doro_id}?v={source_version(image_path)}"
+                }
+                key = f"custom_{doro_id}"
+            
+            # 同一ID存在多个扩展名时保留第一个
+            if key in catalog:
+                continue
+            catalog[key] = {"path": image_path, "info": info}
+            listing.append(info)
+        
+        self._catalog = catalog
+        self._listing = {**self._listing, section: listing}
+        logger.info(f"Doro目录已重建: {section}={len(listing)}个")
+    
     def _load_preset_metadata(self) -> Dict:
         """加载预设Doro元数据"""
         metadata_file = self.preset_dir / "metadata.json"
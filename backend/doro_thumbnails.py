@@ -0,0 +1,169 @@
+"""
+Doro缩略图
+按固定尺寸（128/256/512）生成WebP/AVIF缩略图并缓存在本地磁盘，缓存文件名包含源文件的修改时间，
+源图片替换后自动生成新版本；上传自定义Doro时预先生成，其余在首次请求时生成
+"""
+
+import os
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "doro_thumbnails")
+
+THUMBNAIL_SIZES = (128, 256, 512)
+DEFAULT_THUMBNAIL_SIZE = 256
+
+# 格式 -> (扩展名, MIME类型, 编码参数)
+THUMBNAIL_FORMATS = {
+    "avif": ("avif", "image/avif", {"quality": 60}),
+    "webp": ("webp", "image/webp", {"quality": 82, "method": 4}),
+    "png": ("png", "image/png", {"optimize": True})
+}
+
+
+def source_version(source: Path) -> str:
+    """源文件版本号（修改时间和大小），用于缩略图缓存键和访问地址"""
+    stat = source.stat()
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def render_thumbnail(source: str, dest: str, size: int, fmt: str):
+    """
+    生成一张缩略图（先写临时文件再原子替换，并发请求不会读到半个文件）
+
+    Args:
+        source: 源图片路径
+        dest: 缩略图路径
+        size: 最长边（像素）
+        fmt: 格式，见THUMBNAIL_FORMATS
+    """
+    _, _, options = THUMBNAIL_FORMATS[fmt]
+    with Image.open(source) as image:
+        if image.format == "JPEG":
+            image.draft("RGB", (size, size))
+        image.load()
+        # Doro形象多为透明背景PNG，保留透明通道
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+        tmp_path = f"{dest}.{os.getpid()}.tmp"
+        image.save(tmp_path, format=fmt.upper(), **options)
+        os.replace(tmp_path, dest)
+
+
+class DoroThumbnailCache:
+    """Doro缩略图磁盘缓存"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.formats = [fmt for fmt in ("avif", "webp") if features.check(fmt)] + ["png"]
+        self.counters = {"hits": 0, "generated": 0, "errors": 0}
+        # 同一缩略图只生成一次，并发请求等待同一个任务
+        self._pending: Dict[Path, asyncio.Future] = {}
+
+    # ==================== 对外接口 ====================
+
+    def negotiate(self, fmt: Optional[str], accept: Optional[str]) -> str:
+        """
+        选择缩略图格式：显式指定的格式优先，否则按Accept请求头选择AVIF > WebP > PNG
+
+        Raises:
+            ValueError: 指定的格式不支持
+        """
+        if fmt:
+            fmt = fmt.lower()
+            if fmt not in self.formats:
+                raise ValueError(f"不支持的缩略图格式: {fmt}，可选: {', '.join(self.formats)}")
+            return fmt
+
+        accept = (accept or "").lower()
+        for candidate in self.formats:
+            if candidate == "png" or f"image/{candidate}" in accept:
+                return candidate
+        return "png"
+
+    async def get(self, doro_id: str, source: Path, size: int, fmt: str) -> Tuple[Path, str, str]:
+        """
+        获取缩略图，不存在时生成
+
+        Args:
+            doro_id: Doro ID
+            source: 源图片路径
+            size: 缩略图尺寸，必须是THUMBNAIL_SIZES之一
+            fmt: 格式
+
+        Returns:
+            (缩略图路径, MIME类型, 强ETag)
+        """
+        if size not in THUMBNAIL_SIZES:
+            raise ValueError(f"不支持的缩略图尺寸: {size}，可选: {', '.join(map(str, THUMBNAIL_SIZES))}")
+
+        version = source_version(source)
+        ext, media_type, _ = THUMBNAIL_FORMATS[fmt]
+        path = self.cache_dir / f"{doro_id}_{version}_{size}.{ext}"
+        etag = f'"{doro_id}-{version}-{size}-{fmt}"'
+
+        if path.exists():
+            self.counters["hits"] += 1
+            return path, media_type, etag
+
+        pending = self._pending.get(path)
+        if pending is None:
+            pending = asyncio.ensure_future(self._generate(doro_id, source, path, size, fmt))
+            self._pending[path] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(path, None))
+        await asyncio.shield(pending)
+        return path, media_type, etag
+
+    async def warm(self, doro_id: str, source: Path, sizes: Iterable[int] = THUMBNAIL_SIZES):
+        """预先生成所有尺寸和格式的缩略图（上传自定义Doro后调用）"""
+        for size in sizes:
+            for fmt in self.formats:
+                try:
+                    await self.get(doro_id, source, size, fmt)
+                except Exception as e:
+                    logger.warning(f"预生成Doro缩略图失败 {doro_id} {size} {fmt}: {e}")
+
+    def remove(self, doro_id: str):
+        """删除某个Doro的全部缩略图"""
+        for path in self.cache_dir.glob(f"{doro_id}_*"):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        files = [p for p in self.cache_dir.iterdir() if p.is_file()]
+        return {
+            **self.counters,
+            "formats": self.formats,
+            "sizes": list(THUMBNAIL_SIZES),
+            "files": len(files),
+            "total_bytes": sum(p.stat().st_size for p in files)
+        }
+
+    # ==================== 内部方法 ====================
+
+    async def _generate(self, doro_id: str, source: Path, path: Path, size: int, fmt: str):
+        try:
+            await asyncio.to_thread(render_thumbnail, str(source), str(path), size, fmt)
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+        self.counters["generated"] += 1
+        logger.info(f"🖼️ 已生成Doro缩略图: {path.name}")
+
+        # 清理源文件替换前生成的旧版本
+        version_prefix = path.name.rsplit("_", 1)[0]
+        for old in self.cache_dir.glob(f"{doro_id}_*"):
+            if not old.name.startswith(version_prefix) and not old.name.endswith(".tmp"):
+                old.unlink(missing_ok=True)
+
+
+# 全局实例
+doro_thumbnails = DoroThumbnailCache(os.getenv("DORO_THUMBNAIL_DIR", DEFAULT_CACHE_DIR))
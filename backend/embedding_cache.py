@@ -0,0 +1,178 @@
+"""
+查询向量缓存
+相同的查询文本（按模型和规范化后的文本哈希区分）不再重复调用嵌入接口：
+向量以float16保存在内存LRU中，同时写入本地SQLite，服务重启后仍可命中；
+磁盘记录超过上限时按最近使用时间清理
+"""
+
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "embedding_cache.db")
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：全角半角统一（NFKC）并合并空白字符"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    """缓存键：模型名 + 规范化文本的SHA-256"""
+    return hashlib.sha256(f"{model}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """内存LRU + SQLite的两级向量缓存"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_entries: int = 2048, max_disk_entries: int = 100000):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite数据库路径
+            max_entries: 内存中最多缓存的向量数
+            max_disk_entries: 磁盘上最多保留的向量数，为0时不写磁盘
+        """
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stored": 0, "pruned": 0}
+
+        self._db = None
+        if max_disk_entries > 0:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    dimension INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    # ==================== 对外接口 ====================
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        查询缓存的向量
+
+        Args:
+            model: 嵌入模型名称
+            text: 原始文本
+
+        Returns:
+            向量，未命中时返回None
+        """
+        key = cache_key(model, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return vector.astype(np.float32).tolist()
+
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float16)
+                    self._db.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._remember(key, vector)
+                    self.counters["disk_hits"] += 1
+                    return vector.astype(np.float32).tolist()
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """
+        缓存一个向量（以float16保存）
+
+        Args:
+            model: 嵌入模型名称
+            text: 原始文本
+            embedding: 向量
+        """
+        key = cache_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float16)
+        try:
+            with self._lock:
+                self._remember(key, vector)
+                if self._db is not None:
+                    # 只有新插入的行计入磁盘条目数（同一文本并发未命中时会重复写入同一个键）
+                    now = time.time()
+                    inserted = self._db.execute(
+                        "INSERT OR IGNORE INTO embeddings (key, model, dimension, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                        (key, model, len(vector), vector.tobytes(), now)
+                    ).rowcount
+                    if not inserted:
+                        self._db.execute(
+                            "UPDATE embeddings SET model = ?, dimension = ?, vector = ?, last_used = ? WHERE key = ?",
+                            (model, len(vector), vector.tobytes(), now, key)
+                        )
+                    self._disk_entries += inserted
+                    if self._disk_entries > self.max_disk_entries * 1.1:
+                        self._prune()
+            self.counters["stored"] += 1
+        except Exception as e:
+            # 写缓存失败不影响查询结果
+            logger.warning(f"写入向量缓存失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_entries": self._disk_entries if self._db is not None else 0,
+            "max_disk_entries": self.max_disk_entries
+        }
+
+    # ==================== 内部方法 ====================
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self):
+        # 超过上限10%时一次性删到上限，避免每次写入都清理；按实际行数计算要删除的数量
+        self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_entries - self.max_disk_entries
+        if excess <= 0:
+            return
+        deleted = self._db.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        ).rowcount
+        self._disk_entries -= deleted
+        self.counters["pruned"] += deleted
+
+
+# 全局实例
+embedding_cache = EmbeddingCache(
+    db_path=os.getenv("EMBEDDING_CACHE_DB", DEFAULT_DB_PATH),
+    max_entries=int(os.getenv("EMBEDDING_CACHE_ENTRIES", "2048")),
+    max_disk_entries=int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", "100000"))
+)
@@ -5,7 +5,7 @@ from PIL import Image
 from io import BytesIO
 from datetime import datetime
 import logging
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, Union
 import tempfile
 from fastapi import UploadFile
 import json
@@ -13,6 +13,12 @@ import time
 import asyncio
 from google.api_core import exceptions as google_exceptions
 from prompt_generator import doro_prompt_generator
+from generation_pool import generation_pool
+from media_streaming import encode_data_url, generated_media_url
+from generation_cache import generation_cache
+from generated_manifest import generated_manifest
+from image_pipeline import image_pipeline, ImagePipelineError
+from upload_spool import SpooledUpload, image_source
 from google import genai as genai_client
 
 # 加载环境变量
@@ -42,6 +48,9 @@ class GeminiImageService:
         self.retry_delay = 2  # 秒
         self.backoff_factor = 2  # 指数退避因子
         
+        # Veo视频生成客户端（首次使用时创建）
+        self._video_client = None
+        
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
         
@@ -179,68 +188,6 @@ class GeminiImageService:
         
         return prompt
     
-    def _validate_image(self, image: Image.Image) -> bool:
-        """
-        验证图片是否符合要求
-        
-        Args:
-            image: PIL图片对象
-            
-        Returns:
-            是否通过验证
-        """
-        try:
-            # 检查图片尺寸
-            width, height = image.size
-            if width < 50 or height < 50:
-                logger.error(f"图片尺寸过小: {width}x{height}")
-                return False
-            
-            if width > 4096 or height > 4096:
-                logger.error(f"图片尺寸过大: {width}x{height}")
-                return False
-            
-            # 检查图片模式
-            if image.mode not in ['RGB', 'RGBA']:
-                logger.warning(f"图片模式不是RGB/RGBA: {image.mode}，尝试转换")
-                image = image.convert('RGB')
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"图片验证失败: {e}")
-            return False
-    
-    def _preprocess_image(self, image: Image.Image, max_size: int = 1024) -> Image.Image:
-        """
-        预处理图片，确保符合API要求
-        
-        Args:
-            image: PIL图片对象
-            max_size: 最大尺寸（像素）
-            
-        Returns:
-            处理后的图片
-        """
-        # 转换为RGB格式
-        if image.mode not in ('RGB', 'RGBA'):
-            image = image.convert('RGB')
-        
-        # 调整图片大小
-        width, height = image.size
-        if max(width, height) > max_size:
-            if width > height:
-                new_width = max_size
-                new_height = int(height * max_size / width)
-            else:
-                new_height = max_size
-                new_width = int(width * max_size / height)
-            
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            logger.info(f"📏 图片已调整大小: {width}x{height} -> {new_width}x{new_height}")
-        
-        return image
-    
     async def _call_gemini_with_retry(self, contents, attempt=1):
         """
         带重试机制的Gemini API调用
@@ -254,7 +201,8 @@ class GeminiImageService:
         """
         try:
             logger.info(f"🚀 第{attempt}次尝试调用Gemini API...")
-            response = self.model.generate_content(contents)
+            # 同步SDK调用放到生成线程池执行，避免阻塞事件循环
+            response = await generation_pool.run(self.model.generate_content, contents)
             logger.info(f"✅ Gemini API调用成功 (第{attempt}次尝试)")
             return response
             
@@ -328,9 +276,9 @@ class GeminiImageService:
     
     async def generate_attraction_photo(
         self, 
-        user_photo: UploadFile,
+        user_photo: Union[UploadFile, SpooledUpload],
         attraction_name: str,
-        style_photo: Optional[UploadFile] = None,
+        style_photo: Optional[Union[UploadFile, SpooledUpload]] = None,
         location: Optional[str] = None,
         category: Optional[str] = None,
         description: Optional[str] = None,
@@ -338,7 +286,8 @@ class GeminiImageService:
         ticket_price: Optional[str] = None,
         latitude: Optional[float] = None,
         longitude: Optional[float] = None,
-        custom_prompt: Optional[str] = None
+        custom_prompt: Optional[str] = None,
+        include_base64: bool = False
     ) -> Tuple[bool, str, Optional[str]]:
         """
         生成景点合影照片
@@ -355,27 +304,27 @@ class GeminiImageService:
             latitude: 纬度
             longitude: 经度
             custom_prompt: 自定义提示词（可选）
+            include_base64: 是否在结果中内联base64编码的图片（默认只返回访问地址）
             
         Returns:
             (成功标志, 消息, 生成的图片路径或错误信息)
         """
         try:
-            # 读取用户上传的图片
-            image_data = await user_photo.read()
-            user_image = Image.open(BytesIO(image_data))
-            
-            # 预处理用户图片
-            user_image = self._preprocess_image(user_image)
+            # 在图片处理进程池中并行预处理上传图片（已落盘的上传直接按路径读取）
+            uploads = [await image_source(user_photo)]
+            if style_photo:
+                uploads.append(await image_source(style_photo))
+            processed = await image_pipeline.process_many(uploads)
+            if isinstance(processed[0], Exception):
+                raise processed[0]
+            user_image = image_pipeline.as_content(processed[0])
             
             # 处理范例风格图片（如果有）
             style_image = None
             if style_photo:
-                style_data = await style_photo.read()
-                style_image = Image.open(BytesIO(style_data))
-                
-                # 预处理范例图片
-                style_image = self._preprocess_image(style_image)
-                
+                if isinstance(processed[1], Exception):
+                    raise processed[1]
+                style_image = image_pipeline.as_content(processed[1])
                 logger.info(f"📎 已加载范例风格图片: {style_photo.filename}")
             
             # 生成基础提示词
@@ -415,6 +364,26 @@ class GeminiImageService:
                 logger.info(f"🚀 开始调用Gemini API生成图片...")
                 logger.info(f"📝 输入内容: 提示词 + 用户图片")
             
+            # 相同输入（图片像素、提示词、模型）命中缓存时直接返回，不再消耗配额
+            cache_key = generation_cache.make_key(self.model.model_name, contents)
+            safe_attraction_name = "".join(c for c in attraction_name if c.isalnum() or c in ('_', '-'))[:30]
+            filename = f"attraction_{safe_attraction_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+            filepath = os.path.join(self.output_dir, filename)
+            if await generation_cache.restore(cache_key, filepath):
+                logger.info(f"⚡ 景点合影命中生成缓存: {filename}")
+                generated_manifest.record(filepath, "attraction_photo", attraction_name)
+                result = {
+                    "filepath": filepath,
+                    "filename": filename,
+                    "image_url": generated_media_url(filename),
+                    "attraction": attraction_name,
+                    "prompt": prompt,
+                    "cached": True
+                }
+                if include_base64:
+                    result["base64"] = encode_data_url(filepath, "image/png")
+                return True, "景点合影生成成功", result
+            
             # 生成图像 - 使用重试机制
             response = await self._call_gemini_with_retry(contents)
             
@@ -458,29 +427,25 @@ class GeminiImageService:
                         
                         # 生成带时间戳的文件名
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        safe_attraction_name = "".join(c for c in attraction_name if c.isalnum() or c in ('_', '-'))[:30]
                         filename = f"attraction_{safe_attraction_name}_{timestamp}.png"
                         filepath = os.path.join(self.output_dir, filename)
                         
                         # 保存图片
                         generated_image.save(filepath)
                         logger.info(f"✅ 景点合影已生成: {filepath}")
+                        generated_manifest.record(filepath, "attraction_photo", attraction_name)
+                        await generation_cache.store(cache_key, filepath)
                         
-                        # 同时返回base64编码的图片数据，方便前端直接显示
-                        buffered = BytesIO()
-                        generated_image.save(buffered, format="PNG")
-                        buffered.seek(0)  # 重置指针到开始位置
-                        img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                        buffered.close()  # 关闭BytesIO对象
-                        
-                        return True, "景点合影生成成功", {
+                        result = {
                             "filepath": filepath,
                             "filename": filename,
-                            "image_url": f"data:image/png;base64,{img_base64}",
-                            "base64": f"data:image/png;base64,{img_base64}",
+                            "image_url": generated_media_url(filename),
                             "attraction": attraction_name,
                             "prompt": prompt
                         }
+                        if include_base64:
+                            result["base64"] = encode_data_url(filepath, "image/png")
+                        return True, "景点合影生成成功", result
             
             logger.warning("⚠️ API响应中未找到图片数据")
             
@@ -570,59 +535,50 @@ class GeminiImageService:
                     "error_code": "UNKNOWN"
                 }
     
-    def get_generated_images(self, limit: int = 10) -> list:
+    def get_generated_images(self, limit: int = 10, before: Optional[str] = None,
+                             kind: Optional[str] = None, attraction: Optional[str] = None) -> Dict:
         """
-        获取最近生成的图片列表
+        获取最近生成的图片列表（从生成文件清单按创建时间分页查询）
         
         Args:
             limit: 返回的图片数量限制
+            before: 分页游标（上一页返回的next_cursor）
+            kind: 按类型过滤（attraction_photo / doro_selfie / doro_video），默认只返回图片
+            attraction: 按景点名称过滤
             
         Returns:
-            图片信息列表
+            {"items": 图片信息列表, "next_cursor": 下一页游标}
         """
         try:
-            images = []
-            if os.path.exists(self.output_dir):
-                files = os.listdir(self.output_dir)
-                image_files = [f for f in files if f.endswith(('.png', '.jpg', '.jpeg'))]
-                
-                # 按修改时间排序
-                image_files.sort(
-                    key=lambda x: os.path.getmtime(os.path.join(self.output_dir, x)),
-                    reverse=True
-                )
-                
-                for filename in image_files[:limit]:
-                    filepath = os.path.join(self.output_dir, filename)
-                    images.append({
-                        "filename": filename,
-                        "filepath": filepath,
-                        "created_at": datetime.fromtimestamp(
-                            os.path.getmtime(filepath)
-                        ).isoformat()
-                    })
-            
-            return images
-            
+            page = generated_manifest.list(limit=limit, before=before, kind=kind, attraction=attraction)
+            for item in page["items"]:
+                item["filepath"] = os.path.join(self.output_dir, item["filename"])
+            return page
+            
+        except ValueError:
+            # 无效的分页游标交给调用方返回400
+            raise
         except Exception as e:
             logger.error(f"获取生成的图片列表时出错: {str(e)}")
-            return []
+            return {"items": [], "next_cursor": None}
     
     async def generate_doro_selfie_with_attraction(
         self,
-        user_photo: UploadFile,
-        doro_photo: UploadFile,
-        style_photo: Optional[UploadFile],
-        attraction_info: Dict
+        user_photo: Union[UploadFile, SpooledUpload],
+        doro_photo: Union[UploadFile, SpooledUpload, Dict],
+        style_photo: Optional[Union[UploadFile, SpooledUpload]],
+        attraction_info: Dict,
+        include_base64: bool = False
     ) -> Tuple[bool, str, Optional[Dict]]:
         """
         生成包含景点背景的Doro合影
         
         Args:
             user_photo: 用户照片
-            doro_photo: Doro形象
+            doro_photo: Doro形象（上传文件，或doro_assets缓存的预处理结果）
             style_photo: 服装参考（可选）
             attraction_info: 景点信息（名称、位置、类型等）
+            include_base64: 是否在结果中内联base64编码的图片（默认只返回访问地址）
             
         Returns:
             (成功标志, 消息, 结果数据)
@@ -630,53 +586,42 @@ class GeminiImageService:
         try:
             logger.info(f"开始生成Doro合影: 景点={attraction_info.get('name', 'Unknown')}")
             
-            # 读取用户照片
-            try:
-                user_photo.file.seek(0)  # 确保文件指针在开始位置
-                user_image = Image.open(user_photo.file)
-                if user_image.mode != 'RGB':
-                    user_image = user_image.convert('RGB')
-                logger.info(f"✅ 用户照片加载成功: {user_image.size}, 模式: {user_image.mode}")
-                
-                # 验证用户照片
-                if not self._validate_image(user_image):
-                    return False, "用户照片不符合要求，请使用清晰的JPG或PNG格式图片", None
-            except Exception as e:
-                logger.error(f"❌ 用户照片加载失败: {e}")
-                return False, f"用户照片加载失败: {str(e)}", None
-            
-            # 读取Doro图片
-            try:
-                doro_photo.file.seek(0)  # 确保文件指针在开始位置
-                doro_image = Image.open(doro_photo.file)
-                if doro_image.mode != 'RGB':
-                    doro_image = doro_image.convert('RGB')
-                logger.info(f"✅ Doro图片加载成功: {doro_image.size}, 模式: {doro_image.mode}")
-                
-                # 验证Doro图片
-                if not self._validate_image(doro_image):
-                    return False, "Doro图片不符合要求，请联系管理员", None
-            except Exception as e:
-                logger.error(f"❌ Doro图片加载失败: {e}")
-                return False, f"Doro图片加载失败: {str(e)}", None
-            
-            # 读取服装风格图片（如果提供）
+            # 在图片处理进程池中并行预处理上传图片；预设Doro使用已缓存的预处理结果
+            doro_asset = doro_photo if isinstance(doro_photo, dict) else None
+            photos = [user_photo] + ([] if doro_asset else [doro_photo]) + ([style_photo] if style_photo else [])
+            uploads = [await image_source(photo) for photo in photos]
+            processed = await image_pipeline.process_many(uploads)
+            if doro_asset:
+                processed.insert(1, doro_asset)
+            
+            # 用户照片
+            if isinstance(processed[0], ImagePipelineError):
+                logger.error(f"❌ 用户照片不符合要求: {processed[0]}")
+                return False, "用户照片不符合要求，请使用清晰的JPG或PNG格式图片", None
+            if isinstance(processed[0], Exception):
+                logger.error(f"❌ 用户照片加载失败: {processed[0]}")
+                return False, f"用户照片加载失败: {str(processed[0])}", None
+            user_image = image_pipeline.as_content(processed[0])
+            logger.info(f"✅ 用户照片加载成功: {processed[0]['size']}")
+            
+            # Doro图片
+            if isinstance(processed[1], ImagePipelineError):
+                logger.error(f"❌ Doro图片不符合要求: {processed[1]}")
+                return False, "Doro图片不符合要求，请联系管理员", None
+            if isinstance(processed[1], Exception):
+                logger.error(f"❌ Doro图片加载失败: {processed[1]}")
+                return False, f"Doro图片加载失败: {str(processed[1])}", None
+            doro_image = image_pipeline.as_content(processed[1])
+            logger.info(f"✅ Doro图片加载成功: {processed[1]['size']}")
+            
+            # 服装风格图片（如果提供），处理失败时跳过
             style_image = None
             if style_photo:
-                try:
-                    style_photo.file.seek(0)  # 确保文件指针在开始位置
-                    style_image = Image.open(style_photo.file)
-                    if style_image.mode != 'RGB':
-                        style_image = style_image.convert('RGB')
-                    logger.info(f"✅ 风格图片加载成功: {style_image.size}, 模式: {style_image.mode}")
-                    
-                    # 验证风格图片
-                    if not self._validate_image(style_image):
-                        logger.warning("⚠️ 风格图片不符合要求，将跳过")
-                        style_image = None
-                except Exception as e:
-                    logger.warning(f"⚠️ 风格图片加载失败，将跳过: {e}")
-                    style_image = None
+                if isinstance(processed[2], Exception):
+                    logger.warning(f"⚠️ 风格图片加载失败，将跳过: {processed[2]}")
+                else:
+                    style_image = image_pipeline.as_content(processed[2])
+                    logger.info(f"✅ 风格图片加载成功: {processed[2]['size']}")
             
             # 生成智能提示词
             main_prompt = doro_prompt_generator.generate_attraction_doro_prompt(
@@ -717,6 +662,38 @@ class GeminiImageService:
             
             logger.info(f"使用提示词: {main_prompt[:200]}...")
             
+            # 相同输入命中缓存时直接返回，不再消耗配额；提示词中的姿势和光线是随机选取的，
+            # 因此按生成提示词的景点参数和图片计算缓存键，而不是按最终提示词
+            prompt_inputs = {
+                field: attraction_info.get(field)
+                for field in ("name", "category", "location", "city", "country", "doro_style",
+                              "user_description", "time_of_day", "weather", "season", "mood")
+            }
+            prompt_inputs["with_style"] = style_photo is not None
+            cache_key = generation_cache.make_key(
+                self.model.model_name,
+                [json.dumps(prompt_inputs, sort_keys=True, ensure_ascii=False)] + contents[1:-1]
+            )
+            safe_name = "".join(c for c in attraction_info.get('name', 'unknown') if c.isalnum() or c in ('_', '-'))[:30]
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"doro_selfie_{safe_name}_{timestamp}.png"
+            filepath = os.path.join(self.output_dir, filename)
+            if await generation_cache.restore(cache_key, filepath):
+                logger.info(f"⚡ Doro合影命中生成缓存: {filename}")
+                generated_manifest.record(filepath, "doro_selfie", attraction_info.get("name"))
+                result = {
+                    "image_url": generated_media_url(filename),
+                    "filename": filename,
+                    "filepath": filepath,
+                    "prompt_used": main_prompt,
+                    "attraction_name": attraction_info.get("name"),
+                    "timestamp": timestamp,
+                    "cached": True
+                }
+                if include_base64:
+                    result["base64"] = encode_data_url(filepath, "image/png")
+                return True, "Doro合影生成成功！", result
+            
             # 调用Gemini API生成图片
             response = await self._call_gemini_with_retry(contents)
             
@@ -809,33 +786,29 @@ class GeminiImageService:
             if generated_image:
                 # 保存生成的图片
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                safe_name = "".join(c for c in attraction_info.get('name', 'unknown') if c.isalnum() or c in ('_', '-'))[:30]
                 filename = f"doro_selfie_{safe_name}_{timestamp}.png"
                 filepath = os.path.join(self.output_dir, filename)
                 
                 try:
                     generated_image.save(filepath, 'PNG')
                     logger.info(f"Doro合影已保存: {filename}")
-                    
-                    # 转换为base64 - 修复BytesIO指针问题
-                    buffered = BytesIO()
-                    generated_image.save(buffered, format="PNG")
-                    buffered.seek(0)  # 重置指针到开始位置
-                    img_base64 = base64.b64encode(buffered.getvalue()).decode()
-                    buffered.close()  # 关闭BytesIO对象
+                    generated_manifest.record(filepath, "doro_selfie", attraction_info.get("name"))
+                    await generation_cache.store(cache_key, filepath)
                 except Exception as save_error:
                     logger.error(f"保存图片时出错: {save_error}")
                     return False, f"保存图片失败: {str(save_error)}", None
                 
-                return True, "Doro合影生成成功！", {
-                    "image": generated_image,
-                    "image_url": f"data:image/png;base64,{img_base64}",
+                result = {
+                    "image_url": generated_media_url(filename),
                     "filename": filename,
                     "filepath": filepath,
                     "prompt_used": main_prompt,
                     "attraction_name": attraction_info.get("name"),
                     "timestamp": timestamp
                 }
+                if include_base64:
+                    result["base64"] = encode_data_url(filepath, "image/png")
+                return True, "Doro合影生成成功！", result
             else:
                 logger.warning("Gemini响应中没有找到生成的图片")
                 return False, "生成失败：响应中没有图片", None
@@ -852,36 +825,33 @@ class GeminiImageService:
             logger.error(f"生成Doro合影时出错: {str(e)}")
             return False, f"生成失败: {str(e)}", None
     
-    async def generate_doro_video_with_attraction(
+    async def start_doro_video_operation(
         self,
-        user_photo: UploadFile,
-        doro_photo: UploadFile,
-        style_photo: Optional[UploadFile],
+        user_photo: Union[UploadFile, SpooledUpload],
+        doro_photo: Union[UploadFile, SpooledUpload, Dict],
+        style_photo: Optional[Union[UploadFile, SpooledUpload]],
         attraction_info: Dict
     ) -> Tuple[bool, str, Optional[Dict]]:
         """
-        生成包含景点背景的Doro合影视频
+        启动包含景点背景的Doro合影视频生成作业
         
         使用两步法：
         1. 先用当前的图片生成功能创建静态合影
-        2. 再用Veo 3将静态图片转换为动态视频
+        2. 再提交Veo 3作业将静态图片转换为动态视频（不等待作业完成）
         
         Args:
             user_photo: 用户照片
-            doro_photo: Doro形象
+            doro_photo: Doro形象（上传文件，或doro_assets缓存的预处理结果）
             style_photo: 服装参考（可选）
             attraction_info: 景点信息
             
         Returns:
-            (成功标志, 消息, 结果数据)
+            (成功标志, 消息, 包含operation_name、静态图片和提示词的结果数据)
         """
         try:
             logger.info(f"开始生成Doro合影视频: 景点={attraction_info.get('name', 'Unknown')}")
             
-            # 使用新的google.genai客户端
-            client = genai_client.Client()
-            
-            # 第一步：使用Imagen 3生成静态合影图片
+            # 第一步：使用Doro合影逻辑生成静态合影图片
             logger.info("🎨 第一步：使用Doro合影逻辑生成静态合影图片...")
             
             # 生成图片提示词
@@ -893,35 +863,27 @@ class GeminiImageService:
             )
             logger.info(f"📝 图片提示词: {image_prompt[:200]}...")
             
- 
             # 直接使用现有的Doro合影生成方法，确保完全一致的效果
             success, message, image_result = await self.generate_doro_selfie_with_attraction(
-                    user_photo=user_photo,
-                    doro_photo=doro_photo,
-                    style_photo=style_photo,
-                    attraction_info=attraction_info
-                )
-            #print("111111111111111111111111111111111111111111111111111111111")
+                user_photo=user_photo,
+                doro_photo=doro_photo,
+                style_photo=style_photo,
+                attraction_info=attraction_info
+            )
             if not success:
-                    return False, f"图片生成失败: {message}", None
-
-
-            #print("222222222222222222222222222222222222222222222222222222222")
-            image_path = image_result['filepath']
-            #image = image_result['image']
-            with open(image_path, 'rb') as f:
-                    image_bytes = f.read()
-                    print("image_bytes成功")
+                return False, f"图片生成失败: {message}", None
             
-            # 第二步：使用Veo 3生成视频
-            logger.info("🎬 第二步：使用Veo 3生成动态视频...")
+            with open(image_result['filepath'], 'rb') as f:
+                image_bytes = f.read()
+            
+            # 第二步：提交Veo 3视频生成作业
+            logger.info("🎬 第二步：提交Veo 3视频生成作业...")
             
             image_obj = {
                 "imageBytes": image_bytes,
-                #"mimeType": "image/jpeg"
                 "mimeType": "image/png"
-    }
-
+            }
+            
             # 生成视频提示词（传递图片提示词以保持一致性）
             video_prompt = self._generate_video_prompt(
                 attraction_info, 
@@ -930,101 +892,106 @@ class GeminiImageService:
             )
             logger.info(f"🎬 视频提示词: {video_prompt[:200]}...")
             
-            # 调用Veo 3生成视频，使用Imagen生成的图片
-            operation = client.models.generate_videos(
+            # 调用Veo 3生成视频，使用生成的静态合影图片
+            operation = await generation_pool.run(
+                self._get_video_client().models.generate_videos,
                 model="veo-3.0-generate-preview",
                 prompt=video_prompt,
-                image=image_obj,  # 直接使用Imagen生成的图片对象
+                image=image_obj
             )
             
             logger.info(f"🎬 视频生成作业已启动: {operation.name}")
             
-            # 使用 GenerateVideosOperation 来跟踪操作
-            from google.genai import types
-            video_operation = types.GenerateVideosOperation(name=operation.name)
-            
-            logger.info("🕐 等待视频生成完成...")
+            return True, "视频生成作业已启动", {
+                "operation_name": operation.name,
+                "static_image_filename": image_result['filename'],
+                "prompt_used": video_prompt
+            }
             
-            # 轮询操作状态
-            max_wait_time = 600  # 最多等待10分钟
-            check_interval = 10  # 每10秒检查一次
-            waited_time = 0
+        except Exception as e:
+            logger.error(f"启动Doro合影视频生成时出错: {str(e)}")
+            return False, f"视频生成失败: {str(e)}", None
+    
+    def get_video_operation(self, operation_name: str):
+        """
+        查询Veo视频生成作业的最新状态（同步阻塞调用）
+        
+        Args:
+            operation_name: start_doro_video_operation返回的作业名称
             
-            while not video_operation.done and waited_time < max_wait_time:
-                logger.info(f"⏳ 视频生成中... 已等待 {waited_time}秒")
-                await asyncio.sleep(check_interval)
-                # 刷新操作对象以获取最新状态
-                video_operation = client.operations.get(video_operation)
-                waited_time += check_interval
-                
-                # 检查是否有错误
-                if hasattr(video_operation, 'error') and video_operation.error:
-                    logger.error(f"❌ 视频生成失败: {video_operation.error}")
-                    return False, f"视频生成失败: {video_operation.error}", None
-            
-            if not video_operation.done:
-                logger.error("❌ 视频生成超时")
-                return False, "视频生成超时，请稍后重试", None
-            
-            # 确保响应存在
-            if not hasattr(video_operation, 'response') or not video_operation.response:
-                logger.error("❌ 视频生成完成但没有响应")
-                return False, "视频生成失败：没有生成结果", None
-            
-            # 获取生成的视频
-            if not video_operation.response.generated_videos:
-                logger.error("❌ 没有生成视频")
-                return False, "视频生成失败：没有视频输出", None
-                
-            generated_video = video_operation.response.generated_videos[0]
+        Returns:
+            GenerateVideosOperation对象
+        """
+        from google.genai import types
+        return self._get_video_client().operations.get(types.GenerateVideosOperation(name=operation_name))
+    
+    def save_generated_video(self, video_operation, attraction_name: Optional[str]) -> Tuple[bool, str, Optional[Dict]]:
+        """
+        下载已完成作业生成的视频并保存到输出目录（同步阻塞调用）
+        
+        Args:
+            video_operation: 已完成的GenerateVideosOperation对象
+            attraction_name: 景点名称（用于文件名）
             
-            # 保存视频文件
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_name = "".join(c for c in attraction_info.get('name', 'unknown') if c.isalnum() or c in ('_', '-'))[:30]
-            video_filename = f"doro_video_{safe_name}_{timestamp}.mp4"
-            video_filepath = os.path.join(self.output_dir, video_filename)
-            
-            # 下载并保存视频
-            try:
-                client.files.download(file=generated_video.video)
-                generated_video.video.save(video_filepath)
-            except Exception as e:
-                logger.error(f"❌ 视频下载失败: {e}")
-                # 尝试直接保存视频数据
-                if hasattr(generated_video, 'video_data'):
-                    with open(video_filepath, 'wb') as f:
-                        f.write(generated_video.video_data)
-                else:
-                    return False, f"视频下载失败: {e}", None
-            
-            logger.info(f"✅ Doro合影视频生成成功: {video_filename}")
-            
-            # 读取视频文件并转换为base64（用于前端显示）
-            with open(video_filepath, 'rb') as f:
-                video_data = f.read()
-            video_base64 = base64.b64encode(video_data).decode()
-            
-            return True, "Doro合影视频生成成功！", {
-                "video_url": f"data:video/mp4;base64,{video_base64}",
-                "filename": video_filename,
-                "filepath": video_filepath,
-                "static_image_url": image_result['image_url'],  # 也返回静态图片
-                "prompt_used": video_prompt,
-                "attraction_name": attraction_info.get("name"),
-                "timestamp": timestamp,
-                "generation_time": waited_time
-            }
+        Returns:
+            (成功标志, 消息, 包含filename和filepath的结果数据)
+        """
+        if getattr(video_operation, 'error', None):
+            logger.error(f"❌ 视频生成失败: {video_operation.error}")
+            return False, f"视频生成失败: {video_operation.error}", None
+        
+        # 确保响应存在
+        if not getattr(video_operation, 'response', None):
+            logger.error("❌ 视频生成完成但没有响应")
+            return False, "视频生成失败：没有生成结果", None
+        
+        # 获取生成的视频
+        if not video_operation.response.generated_videos:
+            logger.error("❌ 没有生成视频")
+            return False, "视频生成失败：没有视频输出", None
             
+        generated_video = video_operation.response.generated_videos[0]
+        
+        # 保存视频文件
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_name = "".join(c for c in (attraction_name or 'unknown') if c.isalnum() or c in ('_', '-'))[:30]
+        video_filename = f"doro_video_{safe_name}_{timestamp}.mp4"
+        video_filepath = os.path.join(self.output_dir, video_filename)
+        
+        # 下载并保存视频
+        try:
+            self._get_video_client().files.download(file=generated_video.video)
+            generated_video.video.save(video_filepath)
         except Exception as e:
-            logger.error(f"生成Doro合影视频时出错: {str(e)}")
-            return False, f"视频生成失败: {str(e)}", None
+            logger.error(f"❌ 视频下载失败: {e}")
+            # 尝试直接保存视频数据
+            if hasattr(generated_video, 'video_data'):
+                with open(video_filepath, 'wb') as f:
+                    f.write(generated_video.video_data)
+            else:
+                return False, f"视频下载失败: {e}", None
+        
+        logger.info(f"✅ Doro合影视频生成成功: {video_filename}")
+        generated_manifest.record(video_filepath, "doro_video", attraction_name)
+        
+        return True, "Doro合影视频生成成功！", {
+            "filename": video_filename,
+            "filepath": video_filepath,
+            "timestamp": timestamp
+        }
+    
+    def _get_video_client(self):
+        """获取（必要时创建）视频生成使用的google.genai客户端"""
+        if self._video_client is None:
+            self._video_client = genai_client.Client()
+        return self._video_client
     
     async def _generate_image_prompt_for_video(
         self, 
-        user_photo: UploadFile,
-        doro_photo: UploadFile,
+        user_photo: Union[UploadFile, SpooledUpload],
+        doro_photo: Union[UploadFile, SpooledUpload, Dict],
         attraction_info: Dict,
-        style_photo: Optional[UploadFile] = None
+        style_photo: Optional[Union[UploadFile, SpooledUpload]] = None
     ) -> str:
         """
         为视频生成创建图片提示词（使用完整的Doro合影逻辑）
@@ -0,0 +1,280 @@
+"""
+生成文件清单
+每个生成的合影图片和视频在保存时记录到SQLite（文件名、类型、景点、用户、大小、创建时间），
+列表接口按创建时间索引分页查询，不再扫描输出目录；后台保留任务定期清理
+文件已丢失的记录和超过保留期限的文件，并补登记输出目录中未登记的文件
+"""
+
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from media_streaming import generated_media_url
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "generated_manifest.db")
+
+# 文件名前缀 -> 类型（补登记历史文件时使用，前缀较长的优先匹配）
+KIND_PREFIXES = (
+    ("doro_selfie_", "doro_selfie"),
+    ("doro_video_", "doro_video"),
+    ("attraction_", "attraction_photo")
+)
+
+
+def kind_from_filename(filename: str) -> Optional[str]:
+    for prefix, kind in KIND_PREFIXES:
+        if filename.startswith(prefix):
+            return kind
+    return None
+
+
+class GeneratedManifest:
+    """生成文件的SQLite清单"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, retention_days: float = 0,
+                 backfill_grace: float = 3600, cleanup_interval: float = 6 * 3600):
+        """
+        初始化清单
+
+        Args:
+            db_path: SQLite数据库路径
+            retention_days: 生成文件的保留天数，为0时永久保留
+            backfill_grace: 未登记文件超过该时间（秒）才补登记（正在写入的文件由保存流程自己登记）
+            cleanup_interval: 保留任务的执行间隔（秒）
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS generated_files (
+                filename TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                attraction TEXT,
+                user_id TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        # 分页按(created_at, filename)排序，索引包含filename以便同一时间戳的文件也能沿索引翻页
+        self._db.execute("DROP INDEX IF EXISTS idx_generated_files_created")
+        self._db.execute("DROP INDEX IF EXISTS idx_generated_files_kind_created")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_generated_files_created_name "
+                         "ON generated_files(created_at, filename)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_generated_files_kind_created_name "
+                         "ON generated_files(kind, created_at, filename)")
+        self._lock = threading.Lock()
+
+        self.retention_days = retention_days
+        self.backfill_grace = backfill_grace
+        self.cleanup_interval = cleanup_interval
+        self.output_dir: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"recorded": 0, "missing_removed": 0, "backfilled": 0, "expired_removed": 0}
+
+    # ==================== 对外接口 ====================
+
+    async def start(self, output_dir: str):
+        """启动后台保留任务（每次运行时补登记输出目录中未登记的文件）"""
+        self.output_dir = output_dir
+        self._task = asyncio.create_task(self._cleanup_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def record(self, filepath: str, kind: str, attraction: Optional[str] = None, user_id: Optional[str] = None):
+        """
+        登记一个生成文件（保存成功后调用）
+
+        Args:
+            filepath: 文件路径
+            kind: 类型（attraction_photo / doro_selfie / doro_video）
+            attraction: 景点名称
+            user_id: 用户ID（可选）
+        """
+        try:
+            size = os.path.getsize(filepath)
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO generated_files (filename, kind, attraction, user_id, size, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (os.path.basename(filepath), kind, attraction, user_id, size, time.time())
+                )
+            self.counters["recorded"] += 1
+        except Exception as e:
+            # 登记失败不影响生成结果，保留任务会按文件修改时间补登记
+            logger.warning(f"登记生成文件失败 {filepath}: {e}")
+
+    def list(self, limit: int = 10, before: Optional[str] = None, kind: Optional[str] = None,
+             attraction: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按创建时间倒序分页查询
+
+        Args:
+            limit: 每页数量
+            before: 游标，只返回排在该位置之后的文件（上一页返回的next_cursor，格式为"创建时间|文件名"）
+            kind: 按类型过滤，默认只返回图片
+            attraction: 按景点名称过滤
+
+        Returns:
+            {"items": [...], "next_cursor": 下一页游标或None}
+        """
+        limit = max(1, min(int(limit), 100))
+        conditions, params = [], []
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        else:
+            # 用不等条件而不是IN，查询可以沿created_at索引倒序扫描，无需排序
+            conditions.append("kind != ?")
+            params.append("doro_video")
+        if attraction:
+            conditions.append("attraction = ?")
+            params.append(attraction)
+        if before is not None:
+            created_at, filename = self._parse_cursor(before)
+            if filename is None:
+                conditions.append("created_at < ?")
+                params.append(created_at)
+            else:
+                # 复合游标：创建时间相同的文件按文件名继续翻页，不会被跳过
+                conditions.append("(created_at, filename) < (?, ?)")
+                params.extend((created_at, filename))
+
+        query = (
+            "SELECT filename, kind, attraction, user_id, size, created_at FROM generated_files "
+            f"WHERE {' AND '.join(conditions)} ORDER BY created_at DESC, filename DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._db.execute(query, (*params, limit + 1)).fetchall()
+
+        items = [self._item(row) for row in rows[:limit]]
+        next_cursor = f"{rows[limit - 1][5]!r}|{rows[limit - 1][0]}" if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def stats(self) -> Dict[str, Any]:
+        """获取清单统计信息"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM generated_files GROUP BY kind"
+            ).fetchall()
+        return {
+            **self.counters,
+            "kinds": {kind: {"files": count, "bytes": size} for kind, count, size in rows},
+            "retention_days": self.retention_days
+        }
+
+    def cleanup(self) -> Dict[str, int]:
+        """
+        执行一次保留清理（在线程中调用）
+
+        Returns:
+            各类清理的数量
+        """
+        if not self.output_dir or not os.path.isdir(self.output_dir):
+            return {}
+
+        with self._lock:
+            known = {name for name, in self._db.execute("SELECT filename FROM generated_files")}
+
+        now = time.time()
+        on_disk = {}
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and kind_from_filename(entry.name):
+                    on_disk[entry.name] = entry.stat()
+
+        result = {"backfilled": 0, "missing": 0, "expired": 0}
+        missing = [name for name in known if name not in on_disk]
+        # 未登记的文件（清单启用前生成的，或登记失败的）补登记而不是删除；
+        # 刚写入的文件留给保存流程登记，避免记录到写了一半的大小
+        unknown = [name for name in on_disk
+                   if name not in known and now - on_disk[name].st_mtime > self.backfill_grace]
+
+        with self._lock:
+            if missing:
+                self._db.executemany("DELETE FROM generated_files WHERE filename = ?", [(n,) for n in missing])
+                result["missing"] = len(missing)
+
+            if unknown:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO generated_files (filename, kind, size, created_at) VALUES (?, ?, ?, ?)",
+                    [(n, kind_from_filename(n), on_disk[n].st_size, on_disk[n].st_mtime) for n in unknown]
+                )
+                result["backfilled"] = len(unknown)
+
+        if self.retention_days > 0:
+            cutoff = now - self.retention_days * 86400
+            with self._lock:
+                expired = [row[0] for row in self._db.execute(
+                    "SELECT filename FROM generated_files WHERE created_at < ?", (cutoff,)
+                )]
+                self._db.execute("DELETE FROM generated_files WHERE created_at < ?", (cutoff,))
+            for name in expired:
+                self._remove_file(name)
+            result["expired"] = len(expired)
+
+        self.counters["missing_removed"] += result["missing"]
+        self.counters["backfilled"] += result["backfilled"]
+        self.counters["expired_removed"] += result["expired"]
+        return result
+
+    # ==================== 内部方法 ====================
+
+    async def _cleanup_loop(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(self.cleanup)
+                if any(result.values()):
+                    logger.info(f"🧹 生成文件清理: {result}")
+            except Exception as e:
+                logger.warning(f"生成文件清理失败: {e}")
+            await asyncio.sleep(self.cleanup_interval)
+
+    def _remove_file(self, filename: str):
+        try:
+            os.remove(os.path.join(self.output_dir, filename))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> Tuple[float, Optional[str]]:
+        """解析分页游标，兼容只有创建时间的旧游标"""
+        created_at, sep, filename = str(cursor).partition("|")
+        try:
+            return float(created_at), (filename if sep else None)
+        except ValueError:
+            raise ValueError(f"无效的分页游标: {cursor}")
+
+    @staticmethod
+    def _item(row) -> Dict[str, Any]:
+        filename, kind, attraction, user_id, size, created_at = row
+        return {
+            "filename": filename,
+            "kind": kind,
+            "attraction": attraction,
+            "user_id": user_id,
+            "size": size,
+            "url": generated_media_url(filename),
+            "created_at": datetime.fromtimestamp(created_at).isoformat(),
+            "created_ts": created_at
+        }
+
+
+# 全局实例
+generated_manifest = GeneratedManifest(
+    db_path=os.getenv("GENERATED_MANIFEST_DB", DEFAULT_DB_PATH),
+    retention_days=float(os.getenv("GENERATED_RETENTION_DAYS", "0")),
+    backfill_grace=float(os.getenv("GENERATED_BACKFILL_GRACE", "3600")),
+    cleanup_interval=float(os.getenv("GENERATED_CLEANUP_INTERVAL", str(6 * 3600)))
+)
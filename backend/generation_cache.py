@@ -0,0 +1,202 @@
+"""
+AI生成结果缓存
+以 模型ID + 提示词 + 预处理后图片 的SHA-256作为内容地址，把生成的图片保存在本地磁盘；
+相同输入再次请求时直接复用缓存图片，不再调用Gemini。磁盘占用超过上限时按最近访问时间淘汰
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "generation_cache")
+
+
+class GenerationCache:
+    """内容寻址的生成图片缓存"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录（图片文件和SQLite索引）
+            max_bytes: 缓存图片的总大小上限，为0时禁用缓存
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+        if max_bytes > 0:
+            self._open_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    # ==================== 对外接口 ====================
+
+    @staticmethod
+    def make_key(model_id: str, contents: Iterable[Any]) -> str:
+        """
+        计算生成请求的缓存键
+
+        Args:
+            model_id: 模型ID
+            contents: 发送给模型的内容（文本、PIL图片或mime_type + data形式的编码图片，顺序有意义）
+
+        Returns:
+            十六进制SHA-256
+        """
+        digest = hashlib.sha256()
+        digest.update(f"model:{model_id}\0".encode())
+        for item in contents:
+            if isinstance(item, Image.Image):
+                # 使用解码后的像素而不是上传的原始字节，重新编码或元数据不同的同一张图片得到相同的键
+                digest.update(f"image:{item.mode}:{item.width}x{item.height}\0".encode())
+                digest.update(item.tobytes())
+            elif isinstance(item, dict) and "data" in item:
+                # 预处理流水线的输出是确定性的，同一张上传图片得到相同的编码字节
+                digest.update(f"blob:{item.get('mime_type')}:{len(item['data'])}\0".encode())
+                digest.update(item["data"])
+            else:
+                digest.update(f"text:{item}\0".encode())
+        return digest.hexdigest()
+
+    async def restore(self, key: str, dest_path: str) -> bool:
+        """
+        查询缓存，命中时把缓存图片放到dest_path
+
+        Returns:
+            是否命中
+        """
+        if not self.enabled:
+            return False
+        hit = await asyncio.to_thread(self._restore, key, dest_path)
+        self.counters["hits" if hit else "misses"] += 1
+        return hit
+
+    async def store(self, key: str, src_path: str):
+        """把生成的图片存入缓存"""
+        if self.enabled:
+            await asyncio.to_thread(self._store, key, src_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        entries, total_bytes = 0, 0
+        if self.enabled:
+            with self._lock:
+                entries, total_bytes = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generation_cache"
+                ).fetchone()
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "entries": entries,
+            "total_bytes": total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    # ==================== 内部方法 ====================
+
+    def _open_db(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            db = sqlite3.connect(os.path.join(self.cache_dir, "index.db"), timeout=5,
+                                 check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS generation_cache (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_generation_cache_accessed ON generation_cache(accessed_at)")
+            self._db = db
+        except Exception as e:
+            logger.warning(f"生成结果缓存不可用: {e}")
+            self._db = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def _restore(self, key: str, dest_path: str) -> bool:
+        path = self._path(key)
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT 1 FROM generation_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return False
+                if not os.path.exists(path):
+                    self._db.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                    return False
+                self._db.execute("UPDATE generation_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+
+            # 优先使用硬链接，避免复制文件
+            try:
+                os.link(path, dest_path)
+            except OSError:
+                shutil.copyfile(path, dest_path)
+            return True
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"读取生成结果缓存失败: {e}")
+            return False
+
+    def _store(self, key: str, src_path: str):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+
+            now = time.time()
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO generation_cache (key, size, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, os.path.getsize(path), now, now)
+                )
+                self._evict()
+            self.counters["stores"] += 1
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"写入生成结果缓存失败: {e}")
+
+    def _evict(self):
+        """总大小超出上限时按最近访问时间淘汰（调用方持有_lock）"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM generation_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute("SELECT key, size FROM generation_cache ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.counters["evictions"] += 1
+
+
+# 全局实例
+generation_cache = GenerationCache(
+    cache_dir=os.getenv("GENERATION_CACHE_DIR", DEFAULT_CACHE_DIR),
+    max_bytes=int(float(os.getenv("GENERATION_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+)
@@ -0,0 +1,135 @@
+"""
+AI生成任务线程池
+Gemini SDK的generate_content是同步阻塞调用（单次20-40秒），放到独立的有界线程池中执行，
+避免阻塞事件循环；同时对生成请求做准入控制，池满时直接返回429而不是拖慢整个API
+"""
+
+import os
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationPoolSaturated(HTTPException):
+    """生成任务池已满（HTTP 429）"""
+
+    def __init__(self, status: Dict[str, Any], retry_after: int):
+        super().__init__(
+            status_code=429,
+            detail={
+                "status": "rejected",
+                "message": "生成任务繁忙，请稍后重试",
+                "queue": status
+            },
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class GenerationPool:
+    """有界的生成任务执行池"""
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 8, retry_after: int = 30):
+        """
+        初始化执行池
+
+        Args:
+            max_workers: 同时执行的生成调用数
+            max_queue: 允许排队等待的请求数，超出后拒绝新请求
+            retry_after: 拒绝时建议客户端等待的秒数
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+
+        self._admitted = 0  # 已准入（执行中 + 排队中）的请求数
+        self._running = 0   # 正在线程中执行的调用数
+        self._lock = threading.Lock()
+        self.counters = {"admitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        为一次生成请求占用名额，池满时抛出GenerationPoolSaturated
+
+        一个请求内的多次调用（如重试）共享同一个名额
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, force: bool = False):
+        """
+        占用一个名额，需要与release成对调用（后台任务跨越请求生命周期时使用）
+
+        Args:
+            force: 为True时忽略容量限制（如服务重启后恢复已接受的任务）
+        """
+        if not force and self._admitted >= self.capacity:
+            self.counters["rejected"] += 1
+            logger.warning(f"生成任务池已满，拒绝请求: {self.status()}")
+            raise GenerationPoolSaturated(self.status(), self.retry_after)
+
+        self._admitted += 1
+        self.counters["admitted"] += 1
+        if self._admitted > self.max_workers:
+            logger.info(f"生成请求排队中，前面还有 {self._admitted - self.max_workers} 个")
+
+    def release(self):
+        """释放acquire占用的名额"""
+        self._admitted = max(self._admitted - 1, 0)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """在线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._execute, func, *args, **kwargs))
+
+    def status(self) -> Dict[str, Any]:
+        """获取执行池状态"""
+        return {
+            "running": self._running,
+            "queued": max(self._admitted - self._running, 0),
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "available": max(self.capacity - self._admitted, 0),
+            **self.counters
+        }
+
+    def shutdown(self):
+        """关闭线程池（不等待正在执行的调用）"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _execute(self, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self._running += 1
+        outcome = "failed"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "completed"
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.counters[outcome] += 1
+
+
+# 全局实例
+generation_pool = GenerationPool(
+    max_workers=int(os.getenv("GENERATION_MAX_WORKERS", "4")),
+    max_queue=int(os.getenv("GENERATION_MAX_QUEUE", "8")),
+    retry_after=int(os.getenv("GENERATION_RETRY_AFTER", "30"))
+)
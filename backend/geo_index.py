@@ -0,0 +1,222 @@
+"""
+地理空间索引服务
+为本地景点库、全球城市景点库和示例地点数据提供共享的经纬度网格索引，
+支持半径查询和K近邻查询，避免每次探索请求都遍历全部景点
+"""
+
+import math
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+from geo_math import CoordinateArray, EARTH_RADIUS_KM, one_to_many_km
+
+logger = logging.getLogger(__name__)
+
+MAX_SEARCH_RADIUS_KM = math.pi * EARTH_RADIUS_KM  # 球面上任意两点的最大距离
+
+
+class _SourceGrid:
+    """单个数据源的网格：坐标按网格单元排序存放，每个单元对应数组中的一段连续区间"""
+
+    def __init__(self, coords: CoordinateArray, cells: Dict[Tuple[int, int], Tuple[int, int]]):
+        self.coords = coords
+        self.cells = cells
+
+
+class GeoIndex:
+    """经纬度网格空间索引"""
+
+    def __init__(self, cell_size_deg: float = 0.5):
+        """
+        初始化空间索引
+
+        Args:
+            cell_size_deg: 网格单元大小（度），0.5度约等于55公里
+        """
+        self.cell_size_deg = cell_size_deg
+        self.n_rows = int(math.ceil(180 / cell_size_deg))
+        self.n_cols = int(math.ceil(360 / cell_size_deg))
+
+        # 每个数据源一个网格
+        self._grids: Dict[str, _SourceGrid] = {}
+        self._lock = threading.Lock()
+
+    # ==================== 索引构建 ====================
+
+    def load(self, source: str, items: Iterable[Dict]) -> int:
+        """
+        加载（或替换）一个数据源的全部景点
+
+        Args:
+            source: 数据源名称
+            items: 含有latitude/longitude字段的景点字典
+
+        Returns:
+            成功建立索引的景点数量
+        """
+        coords = CoordinateArray(items)
+
+        # 按网格单元排序，使同一单元的景点在数组中连续存放
+        rows, cols = self._cells_of(coords.lats, coords.lons)
+        order = np.lexsort((cols, rows))
+        coords.items = [coords.items[i] for i in order]
+        coords.lats = coords.lats[order]
+        coords.lons = coords.lons[order]
+        rows, cols = rows[order], cols[order]
+
+        cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        if len(coords):
+            boundaries = np.nonzero((np.diff(rows) != 0) | (np.diff(cols) != 0))[0] + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(coords)]))
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                cells[(int(rows[start]), int(cols[start]))] = (start, end)
+
+        # 整体替换，查询方不会看到构建到一半的网格
+        with self._lock:
+            self._grids[source] = _SourceGrid(coords, cells)
+
+        count = len(coords)
+        logger.info(f"空间索引已加载数据源 {source}: {count} 个景点, {len(cells)} 个网格单元")
+        return count
+
+    def remove(self, source: str):
+        """移除一个数据源"""
+        with self._lock:
+            self._grids.pop(source, None)
+
+    def stats(self) -> Dict[str, int]:
+        """获取各数据源的景点数量"""
+        return {source: len(grid.coords) for source, grid in self._grids.items()}
+
+    # ==================== 查询 ====================
+
+    def query_radius(self, latitude: float, longitude: float, radius_km: float,
+                     sources: Optional[Iterable[str]] = None,
+                     exact: bool = False) -> List[Tuple[Dict, float]]:
+        """
+        查询指定半径内的景点
+
+        Args:
+            latitude: 中心点纬度
+            longitude: 中心点经度
+            radius_km: 搜索半径（公里）
+            sources: 要查询的数据源，默认查询全部
+            exact: 是否使用WGS84椭球精确距离
+
+        Returns:
+            按距离升序排列的 (景点, 距离公里) 列表
+        """
+        if radius_km < 0:
+            return []
+
+        grids = self._select_grids(sources)
+        if not grids:
+            return []
+
+        # 椭球距离与球面距离最多相差约0.5%，精确模式下放宽网格范围
+        cells = self._cells_in_range(latitude, longitude, radius_km * 1.01 if exact else radius_km)
+        results = []
+
+        for grid in grids:
+            coords = grid.coords
+            if cells is None or len(cells) > len(grid.cells):
+                # 搜索范围比已占用的网格还多时，直接计算全部景点
+                indices = np.arange(len(coords))
+            else:
+                ranges = [grid.cells[cell] for cell in cells if cell in grid.cells]
+                if not ranges:
+                    continue
+                indices = np.concatenate([np.arange(start, end) for start, end in ranges])
+
+            distances = one_to_many_km(latitude, longitude, coords.lats[indices], coords.lons[indices], exact=exact)
+            mask = distances <= radius_km
+            results.extend(zip((coords.items[i] for i in indices[mask]), distances[mask].tolist()))
+
+        results.sort(key=lambda x: x[1])
+        return results
+
+    def query_nearest(self, latitude: float, longitude: float, k: int = 1,
+                      sources: Optional[Iterable[str]] = None,
+                      max_radius_km: float = MAX_SEARCH_RADIUS_KM,
+                      exact: bool = False) -> List[Tuple[Dict, float]]:
+        """
+        查询最近的K个景点
+
+        Args:
+            latitude: 中心点纬度
+            longitude: 中心点经度
+            k: 返回数量
+            sources: 要查询的数据源，默认查询全部
+            max_radius_km: 最大搜索半径（公里）
+            exact: 是否使用WGS84椭球精确距离
+
+        Returns:
+            按距离升序排列的 (景点, 距离公里) 列表
+        """
+        if k <= 0:
+            return []
+
+        # 从一个网格单元的尺度开始逐步扩大搜索半径
+        radius_km = min(self.cell_size_deg * 111.0, max_radius_km)
+        while True:
+            results = self.query_radius(latitude, longitude, radius_km, sources, exact=exact)
+            if len(results) >= k or radius_km >= max_radius_km:
+                return results[:k]
+            radius_km = min(radius_km * 2, max_radius_km)
+
+    # ==================== 内部方法 ====================
+
+    def _select_grids(self, sources: Optional[Iterable[str]]) -> List[_SourceGrid]:
+        """获取要查询的网格"""
+        grids = self._grids
+        if sources is None:
+            return list(grids.values())
+        return [grids[source] for source in sources if source in grids]
+
+    def _cells_of(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """计算坐标数组所在的网格单元"""
+        rows = np.minimum(((lats + 90) / self.cell_size_deg).astype(np.int64), self.n_rows - 1)
+        cols = ((lons + 180) / self.cell_size_deg).astype(np.int64) % self.n_cols
+        return rows, cols
+
+    def _cells_in_range(self, lat: float, lon: float, radius_km: float) -> Optional[List[Tuple[int, int]]]:
+        """
+        计算覆盖搜索圆的网格单元
+
+        Returns:
+            网格单元列表；搜索范围覆盖全球时返回None
+        """
+        if radius_km >= MAX_SEARCH_RADIUS_KM:
+            return None
+
+        angular = radius_km / EARTH_RADIUS_KM
+        dlat = math.degrees(angular)
+        lat_min = lat - dlat
+        lat_max = lat + dlat
+
+        row_min = max(int((lat_min + 90) / self.cell_size_deg), 0)
+        row_max = min(int((lat_max + 90) / self.cell_size_deg), self.n_rows - 1)
+
+        # 搜索圆包含极点或经度跨度超过半球时，需要扫描所有经度
+        cos_lat = math.cos(math.radians(lat))
+        if lat_min <= -90 or lat_max >= 90 or math.sin(angular) >= cos_lat:
+            cols = range(self.n_cols)
+        else:
+            dlon = math.degrees(math.asin(math.sin(angular) / cos_lat))
+            col_min = int(math.floor((lon - dlon + 180) / self.cell_size_deg))
+            col_max = int(math.floor((lon + dlon + 180) / self.cell_size_deg))
+            if col_max - col_min + 1 >= self.n_cols:
+                cols = range(self.n_cols)
+            else:
+                # 跨越180度经线时取模回绕
+                cols = [col % self.n_cols for col in range(col_min, col_max + 1)]
+
+        return [(row, col) for row in range(row_min, row_max + 1) for col in cols]
+
+
+# 全局实例
+geo_index = GeoIndex()
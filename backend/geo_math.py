@@ -0,0 +1,341 @@
+"""
+地理计算工具
+提供基于NumPy的向量化距离计算（球面Haversine快速模式与WGS84椭球精确模式）、
+沿方位角的目标点正算，以及数组化存储的景点坐标集合
+"""
+
+import math
+import logging
+from typing import Dict, List, Iterable, Optional, Tuple
+
+import numpy as np
+from geographiclib.geodesic import Geodesic
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0  # 地球平均半径（公里）
+
+# WGS84椭球参数（米）
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+# ==================== 单点计算 ====================
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float, exact: bool = False) -> float:
+    """
+    计算两点间距离（公里）
+
+    Args:
+        lat1, lon1: 起点坐标
+        lat2, lon2: 终点坐标
+        exact: 是否使用WGS84椭球精确计算，默认使用球面Haversine公式
+
+    Returns:
+        距离（公里）
+    """
+    if exact:
+        return Geodesic.WGS84.Inverse(lat1, lon1, lat2, lon2)['s12'] / 1000
+
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = math.radians(lon2 - lon1)
+
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, Optional[float], Optional[float]]:
+    """
+    计算覆盖搜索圆的经纬度范围
+
+    Args:
+        lat, lon: 中心点坐标
+        radius_km: 搜索半径（公里）
+
+    Returns:
+        (lat_min, lat_max, lon_min, lon_max)；搜索圆包含极点或跨越180度经线时，
+        经度无法用单个区间表示，lon_min和lon_max为None
+    """
+    # 椭球距离与球面距离最多相差约0.5%，范围适当放宽
+    angular = radius_km * 1.01 / EARTH_RADIUS_KM
+    dlat = math.degrees(angular)
+    lat_min = lat - dlat
+    lat_max = lat + dlat
+
+    cos_lat = math.cos(math.radians(lat))
+    if lat_min <= -90 or lat_max >= 90 or math.sin(angular) >= cos_lat:
+        return max(lat_min, -90.0), min(lat_max, 90.0), None, None
+
+    dlon = math.degrees(math.asin(math.sin(angular) / cos_lat))
+    lon_min = lon - dlon
+    lon_max = lon + dlon
+    if lon_min < -180 or lon_max > 180:
+        return lat_min, lat_max, None, None
+
+    return lat_min, lat_max, lon_min, lon_max
+
+
+# ==================== 向量化计算 ====================
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    向量化Haversine距离（公里），参数支持NumPy广播
+
+    Returns:
+        与广播后输入形状相同的距离数组
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty_km(lat1, lon1, lat2, lon2, max_iterations: int = 100, tolerance: float = 1e-12) -> np.ndarray:
+    """
+    向量化WGS84椭球距离（公里），使用Vincenty反算公式，参数支持NumPy广播
+
+    每轮迭代只计算尚未收敛的点；近对跖点等不收敛的情况逐个回退到geographiclib计算
+
+    Returns:
+        与广播后输入形状相同的距离数组
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (lat1, lon1, lat2, lon2))
+    )
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = (v.ravel() for v in (lat1, lon1, lat2, lon2))
+
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    n = L.size
+    sin_sigma = np.zeros(n)
+    cos_sigma = np.ones(n)
+    sigma = np.zeros(n)
+    cos2_alpha = np.ones(n)
+    cos_2sigma_m = np.zeros(n)
+    converged = np.zeros(n, dtype=bool)
+
+    lam = L.copy()
+    active = np.arange(n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            if active.size == 0:
+                break
+
+            s1, c1, s2, c2 = sin_u1[active], cos_u1[active], sin_u2[active], cos_u2[active]
+            lam_a = lam[active]
+            sin_lam, cos_lam = np.sin(lam_a), np.cos(lam_a)
+
+            sin_s = np.sqrt((c2 * sin_lam) ** 2 + (c1 * s2 - s1 * c2 * cos_lam) ** 2)
+            cos_s = s1 * s2 + c1 * c2 * cos_lam
+            sig = np.arctan2(sin_s, cos_s)
+
+            sin_alpha = np.where(sin_s == 0, 0.0, c1 * c2 * sin_lam / sin_s)
+            cos2_a = 1 - sin_alpha ** 2
+            # 赤道线上cos2_alpha为0
+            cos_2sm = np.where(cos2_a == 0, 0.0, cos_s - 2 * s1 * s2 / cos2_a)
+
+            C = WGS84_F / 16 * cos2_a * (4 + WGS84_F * (4 - 3 * cos2_a))
+            lam_new = L[active] + (1 - C) * WGS84_F * sin_alpha * (
+                sig + C * sin_s * (cos_2sm + C * cos_s * (-1 + 2 * cos_2sm ** 2))
+            )
+
+            sin_sigma[active] = sin_s
+            cos_sigma[active] = cos_s
+            sigma[active] = sig
+            cos2_alpha[active] = cos2_a
+            cos_2sigma_m[active] = cos_2sm
+            lam[active] = lam_new
+
+            done = np.abs(lam_new - lam_a) < tolerance
+            converged[active[done]] = True
+            active = active[~done]
+
+        u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+            B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        distances = WGS84_B * A * (sigma - delta_sigma) / 1000
+
+    failed = np.nonzero(~(converged & np.isfinite(distances)))[0]
+    if failed.size:
+        logger.debug(f"Vincenty公式有 {failed.size} 个点未收敛，回退到geographiclib")
+        for i in failed:
+            distances[i] = Geodesic.WGS84.Inverse(lat1[i], lon1[i], lat2[i], lon2[i])['s12'] / 1000
+
+    return distances.reshape(shape)
+
+
+def distances_km(lat1, lon1, lat2, lon2, exact: bool = False) -> np.ndarray:
+    """向量化距离计算（公里），exact为True时使用WGS84椭球精确模式"""
+    if exact:
+        return vincenty_km(lat1, lon1, lat2, lon2)
+    return haversine_km(lat1, lon1, lat2, lon2)
+
+
+def one_to_many_km(lat: float, lon: float, lats, lons, exact: bool = False) -> np.ndarray:
+    """
+    计算一个点到多个点的距离
+
+    Args:
+        lat, lon: 中心点坐标
+        lats, lons: 目标点坐标数组
+        exact: 是否使用WGS84椭球精确模式
+
+    Returns:
+        长度为len(lats)的距离数组（公里）
+    """
+    return distances_km(lat, lon, lats, lons, exact=exact)
+
+
+def many_to_many_km(lats1, lons1, lats2, lons2, exact: bool = False) -> np.ndarray:
+    """
+    计算两组点之间的距离矩阵
+
+    Args:
+        lats1, lons1: 第一组坐标（n个）
+        lats2, lons2: 第二组坐标（m个）
+        exact: 是否使用WGS84椭球精确模式
+
+    Returns:
+        形状为(n, m)的距离矩阵（公里）
+    """
+    lats1 = np.asarray(lats1, dtype=np.float64)[:, np.newaxis]
+    lons1 = np.asarray(lons1, dtype=np.float64)[:, np.newaxis]
+    lats2 = np.asarray(lats2, dtype=np.float64)[np.newaxis, :]
+    lons2 = np.asarray(lons2, dtype=np.float64)[np.newaxis, :]
+    return distances_km(lats1, lons1, lats2, lons2, exact=exact)
+
+
+def destination_points(lat: float, lon: float, heading: float, distances_km,
+                       exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    沿固定初始方位角计算多个距离处的目标点（大圆/测地线正算）
+
+    Args:
+        lat, lon: 起点坐标
+        heading: 初始方位角（度，正北为0，顺时针）
+        distances_km: 距离数组（公里）
+        exact: 是否使用WGS84椭球精确模式（Karney算法），默认使用球面公式一次性向量化计算
+
+    Returns:
+        (纬度数组, 经度数组)，经度范围为[-180, 180)
+    """
+    distances = np.asarray(distances_km, dtype=np.float64)
+
+    if exact:
+        line = Geodesic.WGS84.Line(lat, lon, heading)
+        outmask = Geodesic.LATITUDE | Geodesic.LONGITUDE
+        lats = np.empty(distances.shape)
+        lons = np.empty(distances.shape)
+        for i, d in np.ndenumerate(distances):
+            position = line.Position(d * 1000, outmask)
+            lats[i] = position['lat2']
+            lons[i] = position['lon2']
+        return lats, (lons + 180) % 360 - 180
+
+    lat1 = math.radians(lat)
+    theta = math.radians(heading)
+    delta = distances / EARTH_RADIUS_KM
+    sin_lat1, cos_lat1 = math.sin(lat1), math.cos(lat1)
+    sin_delta, cos_delta = np.sin(delta), np.cos(delta)
+
+    sin_lat2 = np.clip(sin_lat1 * cos_delta + cos_lat1 * sin_delta * math.cos(theta), -1.0, 1.0)
+    lat2 = np.arcsin(sin_lat2)
+    dlon = np.arctan2(math.sin(theta) * sin_delta * cos_lat1, cos_delta - sin_lat1 * sin_lat2)
+
+    lons = (lon + np.degrees(dlon) + 180) % 360 - 180
+    return np.degrees(lat2), lons
+
+
+# ==================== 数组化坐标集合 ====================
+
+class CoordinateArray:
+    """以NumPy数组存储坐标的景点集合"""
+
+    def __init__(self, items: Iterable[Dict], lat_key: str = 'latitude', lon_key: str = 'longitude'):
+        """
+        初始化坐标集合，坐标缺失或越界的景点会被跳过
+
+        Args:
+            items: 景点字典
+            lat_key: 纬度字段名
+            lon_key: 经度字段名
+        """
+        self.items: List[Dict] = []
+        lats, lons = [], []
+
+        for item in items:
+            try:
+                lat = float(item[lat_key])
+                lon = float(item[lon_key])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                continue
+
+            self.items.append(item)
+            lats.append(lat)
+            lons.append(lon)
+
+        self.lats = np.array(lats, dtype=np.float64)
+        self.lons = np.array(lons, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def distances_from(self, lat: float, lon: float, exact: bool = False) -> np.ndarray:
+        """计算中心点到所有景点的距离（公里）"""
+        return one_to_many_km(lat, lon, self.lats, self.lons, exact=exact)
+
+    def within_radius(self, lat: float, lon: float, radius_km: float,
+                      exact: bool = False) -> List[Tuple[Dict, float]]:
+        """
+        查询半径内的景点
+
+        Returns:
+            按距离升序排列的 (景点, 距离公里) 列表
+        """
+        if not self.items:
+            return []
+
+        distances = self.distances_from(lat, lon, exact=exact)
+        hits = np.nonzero(distances <= radius_km)[0]
+        hits = hits[np.argsort(distances[hits], kind='stable')]
+        return [(self.items[i], float(distances[i])) for i in hits]
+
+    def nearest(self, lat: float, lon: float, k: int = 1, exact: bool = False,
+                max_radius_km: Optional[float] = None) -> List[Tuple[Dict, float]]:
+        """
+        查询最近的K个景点
+
+        Returns:
+            按距离升序排列的 (景点, 距离公里) 列表
+        """
+        if not self.items or k <= 0:
+            return []
+
+        distances = self.distances_from(lat, lon, exact=exact)
+        if k < len(distances):
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(len(distances))
+        candidates = candidates[np.argsort(distances[candidates], kind='stable')]
+
+        if max_radius_km is not None:
+            candidates = candidates[distances[candidates] <= max_radius_km]
+        return [(self.items[i], float(distances[i])) for i in candidates]
@@ -0,0 +1,260 @@
+"""
+地理编码缓存服务
+内存LRU缓存（带过期时间）+ 本地SQLite持久化存储，多个uvicorn worker共享同一个SQLite文件；
+相同查询并发到达时只向上游发起一次请求（single-flight）
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "geocode_cache.db")
+
+
+class GeocodeCache:
+    """地理编码结果缓存"""
+
+    def __init__(self, db_path: Optional[str] = None, max_size: int = 1000,
+                 ttl_seconds: float = 30 * 24 * 3600, max_disk_entries: int = 100000):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite文件路径，为空字符串时只使用内存缓存
+            max_size: 内存缓存最大条目数
+            ttl_seconds: 缓存有效期（秒）
+            max_disk_entries: SQLite中保留的最大条目数
+        """
+        self.db_path = DEFAULT_DB_PATH if db_path is None else db_path
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+
+        # key -> (过期时间戳, 值)，按最近使用顺序排列
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes_since_purge = 0
+
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "disk_errors": 0
+        }
+
+        if self.db_path:
+            self._open_db()
+
+    # ==================== 对外接口 ====================
+
+    @staticmethod
+    def normalize_key(query: str) -> str:
+        """标准化查询字符串作为缓存键"""
+        return " ".join(query.lower().split())
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        查询缓存，依次查找内存和SQLite
+
+        Returns:
+            缓存值，未命中或已过期时返回None
+        """
+        value = self._memory_get(key)
+        if value is not None:
+            self.counters["memory_hits"] += 1
+            return value
+
+        if self._db is not None:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                expires_at, value = entry
+                self._memory_set(key, value, expires_at)
+                self.counters["disk_hits"] += 1
+                return value
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        """写入缓存（内存和SQLite）"""
+        expires_at = time.time() + self.ttl_seconds
+        self._memory_set(key, value, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Optional[Any]]]) -> Tuple[Optional[Any], bool]:
+        """
+        查询缓存，未命中时调用fetch获取并写入缓存；相同key的并发请求共享同一次fetch
+
+        Args:
+            key: 缓存键
+            fetch: 获取数据的协程函数，返回None表示没有结果（不会被缓存）
+
+        Returns:
+            (值, 是否来自缓存)
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(inflight), False
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+            if value is not None:
+                await self.set(key, value)
+            future.set_result(value)
+            return value, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "Future exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_size": len(self._memory),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "inflight": len(self._inflight),
+            "disk_enabled": self._db is not None
+        }
+
+    def clear_memory(self):
+        """清空内存缓存（SQLite中的数据保留）"""
+        self._memory.clear()
+
+    # ==================== 内存缓存 ====================
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._memory[key]
+            self.counters["expirations"] += 1
+            return None
+
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: Any, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    # ==================== SQLite存储 ====================
+
+    def _open_db(self):
+        """打开SQLite文件，失败时退化为纯内存缓存"""
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False, isolation_level=None)
+            # WAL模式允许多个worker进程并发读写
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_geocode_cache_accessed ON geocode_cache(accessed_at)")
+            self._db = db
+            logger.info(f"地理编码缓存已连接SQLite: {self.db_path}")
+        except Exception as e:
+            logger.warning(f"地理编码缓存SQLite不可用，仅使用内存缓存: {e}")
+            self._db = None
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM geocode_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                value, expires_at = row
+                now = time.time()
+                if expires_at <= now:
+                    self._db.execute("DELETE FROM geocode_cache WHERE key = ?", (key,))
+                    self.counters["expirations"] += 1
+                    return None
+
+                self._db.execute("UPDATE geocode_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return expires_at, json.loads(value)
+        except Exception as e:
+            self.counters["disk_errors"] += 1
+            logger.warning(f"读取地理编码缓存失败: {e}")
+            return None
+
+    def _disk_set(self, key: str, value: Any, expires_at: float):
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO geocode_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, payload, expires_at, time.time())
+                )
+                self._writes_since_purge += 1
+                if self._writes_since_purge >= 100:
+                    self._writes_since_purge = 0
+                    self._purge_disk()
+        except Exception as e:
+            self.counters["disk_errors"] += 1
+            logger.warning(f"写入地理编码缓存失败: {e}")
+
+    def _purge_disk(self):
+        """删除过期条目，超出容量时按最近访问时间淘汰（调用方持有_db_lock）"""
+        expired = self._db.execute("DELETE FROM geocode_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM geocode_cache WHERE key IN ("
+            "SELECT key FROM geocode_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        ).rowcount
+        self.counters["expirations"] += max(expired, 0)
+        self.counters["evictions"] += max(overflow, 0)
+
+
+# 全局实例
+geocode_cache = GeocodeCache(
+    db_path=os.getenv("GEOCODE_CACHE_DB", DEFAULT_DB_PATH),
+    max_size=int(os.getenv("GEOCODE_CACHE_MAX_SIZE", "1000")),
+    ttl_seconds=float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+)
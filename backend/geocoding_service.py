@@ -0,0 +1,448 @@
+"""
+地理编码服务
+按 本地快速匹配 → 高德地图 → Google Maps 的顺序查询，所有远程请求复用共享HTTP客户端中的geocoding会话；
+每个服务商有独立超时和限流，排在前面的服务商超过对冲阈值仍未返回时，并行启动下一个服务商，
+取最先成功的结果；批量接口先按缓存去重，再以有限并发请求上游，结果按完成顺序流式返回
+"""
+
+import os
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from amap_service import amap_service
+from geocode_cache import geocode_cache
+from http_client import http_clients
+
+logger = logging.getLogger(__name__)
+
+# 常用地点的本地快速匹配
+FALLBACK_LOCATIONS = {
+    "北京": {"lat": 39.9042, "lng": 116.4074, "address": "北京市"},
+    "上海": {"lat": 31.2304, "lng": 121.4737, "address": "上海市"},
+    "广州": {"lat": 23.1291, "lng": 113.2644, "address": "广州市"},
+    "深圳": {"lat": 22.5431, "lng": 114.0579, "address": "深圳市"},
+    "天安门": {"lat": 39.9042, "lng": 116.4074, "address": "北京市东城区天安门"},
+    "故宫": {"lat": 39.9163, "lng": 116.3972, "address": "北京市东城区故宫"},
+}
+
+
+# 批量接口单次请求的最大条目数和最大并发数
+MAX_BATCH_SIZE = 500
+MAX_BATCH_CONCURRENCY = 32
+
+
+class RateLimiter:
+    """令牌桶限流器"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: 每秒允许的请求数，小于等于0表示不限流
+            burst: 允许的突发请求数
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """获取一个令牌，令牌不足时等待"""
+        if self.rate <= 0:
+            return
+
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self._updated_at is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 1.0
+                self._updated_at = loop.time()
+
+            self._tokens -= 1
+
+
+class GeocodeProvider:
+    """远程地理编码服务商基类"""
+
+    name = ""
+    label = ""
+
+    def __init__(self, timeout: float, rate_limit: float = 0):
+        """
+        Args:
+            timeout: 单次请求超时时间（秒）
+            rate_limit: 每秒最多请求数，0表示不限流
+        """
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate_limit, burst=max(int(rate_limit), 1))
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    async def geocode(self, session: aiohttp.ClientSession, query: str) -> Optional[Dict]:
+        """地理编码，返回Google Geocoding格式的结果"""
+        raise NotImplementedError
+
+    async def reverse(self, session: aiohttp.ClientSession, lat: float, lng: float) -> Optional[Dict]:
+        """逆地理编码"""
+        return None
+
+
+class AmapGeocodeProvider(GeocodeProvider):
+    """高德地图地理编码，通过AmapService请求"""
+
+    name = "amap"
+    label = "高德地图"
+
+    def __init__(self, timeout: float = 3.0, rate_limit: float = 20):
+        super().__init__(timeout, rate_limit)
+        # 与原有行为一致，只有显式配置了AMAP_API_KEY时才调用高德地图
+        self.configured = bool(os.getenv("AMAP_API_KEY"))
+
+    @property
+    def enabled(self) -> bool:
+        return self.configured
+
+    async def geocode(self, session: aiohttp.ClientSession, query: str) -> Optional[Dict]:
+        geocode = await amap_service.geocode(query, session=session)
+        if not geocode:
+            return None
+
+        location = geocode['location'].split(',')
+        return {
+            "formatted_address": geocode.get('formatted_address', query),
+            "geometry": {
+                "location": {
+                    "lat": float(location[1]),
+                    "lng": float(location[0])
+                },
+                "location_type": "APPROXIMATE"
+            },
+            "place_id": f"amap_{geocode.get('adcode', 'unknown')}",
+            "address_components": [
+                {
+                    "long_name": geocode.get('district', ''),
+                    "short_name": geocode.get('district', ''),
+                    "types": ["administrative_area_level_3", "political"]
+                },
+                {
+                    "long_name": geocode.get('city', ''),
+                    "short_name": geocode.get('city', ''),
+                    "types": ["administrative_area_level_2", "political"]
+                },
+                {
+                    "long_name": geocode.get('province', ''),
+                    "short_name": geocode.get('province', ''),
+                    "types": ["administrative_area_level_1", "political"]
+                },
+                {
+                    "long_name": "中国",
+                    "short_name": "CN",
+                    "types": ["country", "political"]
+                }
+            ],
+            "types": ["geocode"]
+        }
+
+    async def reverse(self, session: aiohttp.ClientSession, lat: float, lng: float) -> Optional[Dict]:
+        return await amap_service.geocode_reverse(lat, lng, session=session)
+
+
+class GoogleGeocodeProvider(GeocodeProvider):
+    """Google Maps Geocoding API（直接调用HTTP接口）"""
+
+    name = "google"
+    label = "Google Maps"
+    url = "https://maps.googleapis.com/maps/api/geocode/json"
+
+    def __init__(self, timeout: float = 5.0, rate_limit: float = 10):
+        super().__init__(timeout, rate_limit)
+        self.api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    async def geocode(self, session: aiohttp.ClientSession, query: str) -> Optional[Dict]:
+        results = await self._request(session, {"address": query})
+        return results[0] if results else None
+
+    async def reverse(self, session: aiohttp.ClientSession, lat: float, lng: float) -> Optional[Dict]:
+        results = await self._request(session, {"latlng": f"{lat},{lng}"})
+        return results[0] if results else None
+
+    async def _request(self, session: aiohttp.ClientSession, params: Dict) -> List[Dict]:
+        async with session.get(self.url, params={**params, "key": self.api_key}) as response:
+            if response.status != 200:
+                logger.warning(f"Google Maps地理编码请求失败: HTTP {response.status}")
+                return []
+            data = await response.json()
+
+        if data.get('status') != 'OK':
+            logger.warning(f"Google Maps地理编码返回错误: {data.get('status')}")
+            return []
+        return data.get('results', [])
+
+
+class GeocodingService:
+    """地理编码服务"""
+
+    def __init__(self, providers: Optional[List[GeocodeProvider]] = None, hedge_delay: float = 1.0):
+        """
+        初始化地理编码服务
+
+        Args:
+            providers: 按优先级排列的远程服务商
+            hedge_delay: 对冲阈值（秒），当前服务商超过该时间未返回时并行启动下一个
+        """
+        self.providers = providers if providers is not None else [
+            AmapGeocodeProvider(
+                timeout=float(os.getenv("AMAP_GEOCODE_TIMEOUT", "3")),
+                rate_limit=float(os.getenv("AMAP_GEOCODE_QPS", "20"))
+            ),
+            GoogleGeocodeProvider(
+                timeout=float(os.getenv("GOOGLE_GEOCODE_TIMEOUT", "5")),
+                rate_limit=float(os.getenv("GOOGLE_GEOCODE_QPS", "10"))
+            )
+        ]
+        self.hedge_delay = hedge_delay
+
+    # ==================== 对外接口 ====================
+
+    async def geocode(self, query: str) -> Optional[Dict]:
+        """
+        地理编码
+
+        Returns:
+            {"data": 地理编码结果, "message": 提示信息}，全部失败时返回None
+        """
+        # 首先检查本地快速匹配
+        local = self._match_local(query)
+        if local:
+            return local
+
+        logger.info(f"远程地理编码查询: {query}")
+        found = await self._race(lambda provider, session: provider.geocode(session, query))
+        if found is None:
+            return None
+
+        provider, result = found
+        logger.info(f"{provider.label}成功找到位置: {result.get('formatted_address')}")
+        return {
+            "data": result,
+            "message": f"{provider.label}找到位置: {result.get('formatted_address')}"
+        }
+
+    async def reverse_geocode(self, lat: float, lng: float) -> Optional[Dict]:
+        """
+        逆地理编码
+
+        Returns:
+            {"provider": 服务商名称, "data": 地址信息}，全部失败时返回None
+        """
+        found = await self._race(lambda provider, session: provider.reverse(session, lat, lng))
+        if found is None:
+            return None
+
+        provider, result = found
+        return {"provider": provider.name, "data": result}
+
+    @staticmethod
+    def reverse_cache_key(lat: float, lng: float) -> str:
+        """逆地理编码缓存键，坐标保留5位小数（约1米）"""
+        return f"reverse:{lat:.5f},{lng:.5f}"
+
+    async def cached_geocode(self, query: str) -> Tuple[Optional[Dict], bool]:
+        """带缓存的地理编码，返回 (结果, 是否来自缓存)"""
+        return await geocode_cache.get_or_fetch(
+            geocode_cache.normalize_key(query), lambda: self.geocode(query)
+        )
+
+    async def cached_reverse_geocode(self, lat: float, lng: float) -> Tuple[Optional[Dict], bool]:
+        """带缓存的逆地理编码，返回 (结果, 是否来自缓存)"""
+        return await geocode_cache.get_or_fetch(
+            self.reverse_cache_key(lat, lng), lambda: self.reverse_geocode(lat, lng)
+        )
+
+    async def geocode_batch(self, queries: List[str], concurrency: int = 8) -> AsyncIterator[Dict]:
+        """批量地理编码，按完成顺序逐条返回"""
+        async for item in self.batch(queries, [], concurrency):
+            yield item
+
+    async def reverse_geocode_batch(self, coordinates: List[Tuple[float, float]],
+                                    concurrency: int = 8) -> AsyncIterator[Dict]:
+        """批量逆地理编码，按完成顺序逐条返回"""
+        async for item in self.batch([], coordinates, concurrency):
+            yield item
+
+    async def batch(self, queries: List[str], coordinates: List[Tuple[float, float]],
+                    concurrency: int = 8) -> AsyncIterator[Dict]:
+        """
+        批量地理编码和逆地理编码
+
+        相同的查询（按缓存键）只解析一次，缓存命中的条目不占用并发名额；
+        未命中的条目以最多concurrency个并发请求上游，并受各服务商限流约束
+
+        Args:
+            queries: 地址列表
+            coordinates: (纬度, 经度) 列表
+            concurrency: 最大并发上游请求数
+
+        Yields:
+            每个输入条目一条结果，包含type、index、success、cached和data等字段
+        """
+        semaphore = asyncio.Semaphore(max(1, min(concurrency, MAX_BATCH_CONCURRENCY)))
+
+        def bounded(fetch: Callable[[], Awaitable[Optional[Dict]]]):
+            async def run():
+                async with semaphore:
+                    return await fetch()
+            return run
+
+        # 缓存键 -> (解析协程工厂, [(输入类型, 序号, 输入值)])
+        jobs: Dict[str, Tuple[Callable, List[Tuple[str, int, object]]]] = {}
+        for index, query in enumerate(queries):
+            key = geocode_cache.normalize_key(query)
+            if key not in jobs:
+                jobs[key] = (lambda q=query, k=key: geocode_cache.get_or_fetch(k, bounded(lambda: self.geocode(q))), [])
+            jobs[key][1].append(("geocode", index, query))
+        for index, (lat, lng) in enumerate(coordinates):
+            key = self.reverse_cache_key(lat, lng)
+            if key not in jobs:
+                jobs[key] = (lambda a=lat, b=lng, k=key: geocode_cache.get_or_fetch(
+                    k, bounded(lambda: self.reverse_geocode(a, b))), [])
+            jobs[key][1].append(("reverse", index, (lat, lng)))
+
+        async def resolve(key: str):
+            factory, _ = jobs[key]
+            try:
+                entry, cached = await factory()
+                return key, entry, cached, None
+            except Exception as e:
+                return key, None, False, e
+
+        tasks = [asyncio.create_task(resolve(key)) for key in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, entry, cached, error = await next_done
+                for kind, index, value in jobs[key][1]:
+                    yield self._batch_item(kind, index, value, entry, cached, error)
+        finally:
+            # 客户端断开时取消尚未完成的请求
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _batch_item(kind: str, index: int, value, entry: Optional[Dict], cached: bool,
+                    error: Optional[Exception]) -> Dict:
+        """构建批量接口的单条结果"""
+        item = {"type": kind, "index": index, "success": entry is not None, "cached": cached}
+        if kind == "geocode":
+            item["query"] = value
+        else:
+            item["lat"], item["lng"] = value
+
+        if entry is not None:
+            item["data"] = entry["data"]
+            if kind == "reverse":
+                item["provider"] = entry["provider"]
+        elif error is not None:
+            item["message"] = f"解析失败: {error}"
+        else:
+            item["message"] = "未找到结果"
+        return item
+
+    # ==================== 内部方法 ====================
+
+    def _match_local(self, query: str) -> Optional[Dict]:
+        """快速匹配常用地点"""
+        for city, info in FALLBACK_LOCATIONS.items():
+            if city in query:
+                logger.info(f"使用本地快速匹配: {info['address']}")
+                return {
+                    "data": {
+                        "formatted_address": info["address"],
+                        "geometry": {
+                            "location": {"lat": info["lat"], "lng": info["lng"]},
+                            "location_type": "APPROXIMATE"
+                        },
+                        "place_id": f"fallback_{city}",
+                        "address_components": [],
+                        "types": ["locality", "political"]
+                    },
+                    "message": f"快速匹配找到位置: {info['address']}"
+                }
+        return None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """借用共享的HTTP会话（由http_clients统一关闭）"""
+        return http_clients.get("geocoding")
+
+    async def _call(self, provider: GeocodeProvider,
+                    request: Callable[[GeocodeProvider, aiohttp.ClientSession], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """调用单个服务商（先经过限流），超时或异常时返回None"""
+        await provider.limiter.acquire()
+        try:
+            return await asyncio.wait_for(request(provider, self._get_session()), timeout=provider.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{provider.label}地理编码超时 ({provider.timeout}s)")
+        except Exception as e:
+            logger.warning(f"{provider.label}地理编码失败: {e}")
+        return None
+
+    async def _race(self, request: Callable[[GeocodeProvider, aiohttp.ClientSession], Awaitable[Optional[Dict]]]):
+        """
+        按优先级对冲调用服务商
+
+        前一个服务商失败时立即启动下一个；超过对冲阈值仍未返回时也启动下一个，
+        同时完成的多个结果中取优先级最高的
+
+        Returns:
+            (服务商, 结果)，全部失败时返回None
+        """
+        providers = [provider for provider in self.providers if provider.enabled]
+        pending: Dict[asyncio.Task, int] = {}
+        next_index = 0
+
+        try:
+            while pending or next_index < len(providers):
+                if not pending:
+                    task = asyncio.create_task(self._call(providers[next_index], request))
+                    pending[task] = next_index
+                    next_index += 1
+
+                hedge_timeout = self.hedge_delay if next_index < len(providers) else None
+                done, _ = await asyncio.wait(pending.keys(), timeout=hedge_timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    logger.info(f"{providers[next_index - 1].label}超过 {self.hedge_delay}s 未返回，"
+                                f"并行请求{providers[next_index].label}")
+                    task = asyncio.create_task(self._call(providers[next_index], request))
+                    pending[task] = next_index
+                    next_index += 1
+                    continue
+
+                for task in sorted(done, key=lambda t: pending[t]):
+                    index = pending.pop(task)
+                    result = task.result()
+                    if result:
+                        return providers[index], result
+
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+# 全局实例
+geocoding_service = GeocodingService(hedge_delay=float(os.getenv("GEOCODE_HEDGE_DELAY", "1.0")))
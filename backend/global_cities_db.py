@@ -1,13 +1,17 @@
 # 全球城市景点数据库
 # 包含全球知名旅游城市和中国知名旅游城市的完整景点信息
 
-import math
 import random
 from typing import List, Dict, Optional
+from geo_index import geo_index
+from geo_math import distance_km
 
 class GlobalCitiesDB:
     """全球城市景点数据库"""
     
+    # 在共享空间索引中的数据源名称
+    INDEX_SOURCE = "global_cities"
+    
     def __init__(self):
         # 全球知名旅游城市景点数据
         self.global_cities = {
@@ -955,6 +959,20 @@ class GlobalCitiesDB:
                 ]
             }
         }
+        
+        # 加载到共享空间索引
+        geo_index.load(self.INDEX_SOURCE, self._iter_indexable_attractions())
+    
+    def _iter_indexable_attractions(self):
+        """遍历需要建立空间索引的景点"""
+        # 全球城市景点
+        for city_data in self.global_cities.values():
+            yield from city_data["attractions"]
+        
+        # 中国城市景点（北京使用本地数据库/Supabase数据，不纳入）
+        for city_data in self.china_cities.values():
+            if isinstance(city_data["attractions"], list):
+                yield from city_data["attractions"]
     
     def get_all_cities(self) -> List[Dict]:
         """获取所有城市列表"""
@@ -1035,54 +1053,14 @@ class GlobalCitiesDB:
         """查找指定坐标附近的景点"""
         nearby_attractions = []
         
-        # 搜索全球城市景点
-        for city_key, city_data in self.global_cities.items():
-            for attraction in city_data["attractions"]:
-                distance = self._calculate_distance(
-                    latitude, longitude,
-                    attraction["latitude"], attraction["longitude"]
-                )
-                if distance <= radius_km:
-                    attraction_copy = attraction.copy()
-                    attraction_copy["distance"] = distance
-                    nearby_attractions.append(attraction_copy)
+        # 通过共享空间索引只检查搜索范围内的网格，结果已按距离排序
+        for attraction, distance in geo_index.query_radius(latitude, longitude, radius_km, sources=[self.INDEX_SOURCE]):
+            attraction_copy = attraction.copy()
+            attraction_copy["distance"] = distance
+            nearby_attractions.append(attraction_copy)
         
-        # 搜索中国城市景点
-        for city_key, city_data in self.china_cities.items():
-            # 特殊处理北京：跳过本地数据库，让调用方使用Supabase数据
-            if city_key == "beijing" and city_data["attractions"] == "use_local_db":
-                # 跳过北京，让调用方从Supabase获取数据
-                continue
-            
-            # 处理其他城市的景点数据
-            if isinstance(city_data["attractions"], list):
-                for attraction in city_data["attractions"]:
-                    distance = self._calculate_distance(
-                        latitude, longitude,
-                        attraction["latitude"], attraction["longitude"]
-                    )
-                    if distance <= radius_km:
-                        attraction_copy = attraction.copy()
-                        attraction_copy["distance"] = distance
-                        nearby_attractions.append(attraction_copy)
-        
-        # 按距离排序
-        nearby_attractions.sort(key=lambda x: x.get("distance", 999))
         return nearby_attractions
     
     def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """计算两点之间的距离（公里）"""
-        # 使用Haversine公式计算球面距离
-        R = 6371  # 地球半径（公里）
-        
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(dlat/2) * math.sin(dlat/2) + 
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-             math.sin(dlon/2) * math.sin(dlon/2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        return distance
\ No newline at end of file
+        return distance_km(lat1, lon1, lat2, lon2)
@@ -0,0 +1,118 @@
+"""
+共享HTTP客户端
+按集成名称管理应用级的aiohttp会话，复用TCP/TLS连接（keep-alive）并缓存DNS解析结果，
+每个会话限制总连接数和单个主机的连接数；FastAPI应用在lifespan中创建和关闭这些会话
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# 各集成的连接参数，未登记的名称使用默认参数
+DEFAULT_OPTIONS: Dict[str, Any] = {
+    "limit": int(os.getenv("HTTP_POOL_LIMIT", "100")),
+    "limit_per_host": int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20")),
+    "keepalive_timeout": float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30")),
+    "ttl_dns_cache": int(os.getenv("HTTP_DNS_CACHE_TTL", "300")),
+    "timeout": float(os.getenv("HTTP_TIMEOUT", "30"))
+}
+
+INTEGRATION_OPTIONS: Dict[str, Dict[str, Any]] = {
+    "amap": {"limit_per_host": 20, "timeout": 10},
+    "geocoding": {"limit": 50, "limit_per_host": 20, "timeout": 10},
+    # Unsplash/Pexels有请求频率限制，单个主机的并发不宜过高
+    "image_search": {"limit_per_host": 8, "timeout": 15},
+    # 下载任意图片主机上的资源
+    "media": {"limit": 64, "limit_per_host": 8, "timeout": 60}
+}
+
+
+class HTTPClientRegistry:
+    """按名称复用的aiohttp会话注册表"""
+
+    def __init__(self, options: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        初始化注册表
+
+        Args:
+            options: 集成名称 -> 连接参数（limit/limit_per_host/keepalive_timeout/ttl_dns_cache/timeout）
+        """
+        self.options = dict(INTEGRATION_OPTIONS if options is None else options)
+        # 名称 -> (会话, 创建会话时的事件循环)
+        self._sessions: Dict[str, Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+
+    def configure(self, name: str, **options):
+        """登记或修改某个集成的连接参数（对之后新建的会话生效）"""
+        self.options[name] = {**self.options.get(name, {}), **options}
+
+    def get(self, name: str = "default") -> aiohttp.ClientSession:
+        """
+        获取（必要时创建）指定集成的共享会话，必须在事件循环中调用
+
+        调用方只借用会话，不应自行关闭
+        """
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(name)
+        if entry is not None:
+            session, session_loop = entry
+            if not session.closed and session_loop is loop:
+                return session
+            # 旧的事件循环已结束（如脚本多次调用asyncio.run），其连接无法在当前循环中复用
+            logger.debug(f"HTTP会话 {name} 已失效，重新创建")
+
+        session = self._create_session(name)
+        self._sessions[name] = (session, loop)
+        return session
+
+    async def close(self):
+        """关闭所有会话"""
+        sessions, self._sessions = self._sessions, {}
+        loop = asyncio.get_running_loop()
+        for name, (session, session_loop) in sessions.items():
+            if session.closed or session_loop is not loop:
+                continue
+            try:
+                await session.close()
+            except Exception as e:
+                logger.warning(f"关闭HTTP会话 {name} 失败: {e}")
+        # 给SSL连接留出关闭时间，避免 "Unclosed connection" 警告
+        if sessions:
+            await asyncio.sleep(0.25)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各会话的连接池状态"""
+        result = {}
+        for name, (session, _) in self._sessions.items():
+            connector = session.connector
+            result[name] = {
+                "closed": session.closed,
+                "limit": connector.limit if connector else None,
+                "limit_per_host": connector.limit_per_host if connector else None
+            }
+        return result
+
+    def _create_session(self, name: str) -> aiohttp.ClientSession:
+        options = {**DEFAULT_OPTIONS, **self.options.get(name, {})}
+        connector = aiohttp.TCPConnector(
+            limit=options["limit"],
+            limit_per_host=options["limit_per_host"],
+            keepalive_timeout=options["keepalive_timeout"],
+            use_dns_cache=True,
+            ttl_dns_cache=options["ttl_dns_cache"]
+        )
+        logger.info(
+            f"创建HTTP会话 {name}: limit={options['limit']}, limit_per_host={options['limit_per_host']}"
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=options["timeout"])
+        )
+
+
+# 全局实例
+http_clients = HTTPClientRegistry()
@@ -0,0 +1,256 @@
+"""
+上传图片预处理流水线
+用户照片、Doro形象和风格参考图的解码、方向校正、缩放和编码都是CPU密集操作，
+放到独立的进程池中执行，多张图片可以并行处理而不阻塞事件循环；
+JPEG使用draft模式直接按目标尺寸解码，整个流程只编码一次
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("decode", "convert", "resize", "orient", "encode")
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+# 允许解码的最大像素数：JPEG按draft缩小后的尺寸计算（大尺寸手机照片照常缩放），
+# 其他格式按原始尺寸计算，在解码像素之前拒绝，避免工作进程完整解码超大图片
+MAX_DECODE_PIXELS = int(os.getenv("IMAGE_MAX_DECODE_PIXELS", str(50_000_000)))
+
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
+
+class ImagePipelineError(ValueError):
+    """图片无法解码或不符合要求"""
+
+
+def process_image(data: Union[bytes, str], max_size: int = 1024, output_format: str = "JPEG",
+                  quality: int = 90, min_size: int = 50,
+                  max_pixels: int = MAX_DECODE_PIXELS) -> Dict[str, Any]:
+    """
+    预处理单张图片（在工作进程中执行，必须是模块级函数）
+
+    Args:
+        data: 上传图片的原始字节，或落盘后的文件路径（在工作进程中直接读取）
+        max_size: 输出图片的最长边（像素）
+        output_format: 输出格式，JPEG或WEBP
+        quality: 编码质量
+        min_size: 允许的最短边（像素）
+        max_pixels: 允许解码的最大像素数，在解码前检查（JPEG按draft缩小后的尺寸）
+
+    Returns:
+        包含编码后字节data、mime_type、尺寸和各阶段耗时（毫秒）的字典
+
+    Raises:
+        ImagePipelineError: 图片无法解码、尺寸过小或解码尺寸过大
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    def mark(stage: str):
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = round((now - started) * 1000, 2)
+        started = now
+
+    try:
+        image = Image.open(data if isinstance(data, str) else BytesIO(data))
+    except Exception as e:
+        raise ImagePipelineError(f"无法识别的图片: {e}")
+
+    # Image.open只读取文件头，此时还没有解码像素
+    original_size = image.size
+    width, height = original_size
+    try:
+        if min(width, height) < min_size:
+            raise ImagePipelineError(f"图片尺寸过小: {width}x{height}")
+
+        # JPEG在解码阶段按1/2、1/4、1/8缩小，得到不小于目标尺寸的最小图片
+        if image.format == "JPEG":
+            image.draft("RGB", (max_size, max_size))
+        decode_width, decode_height = image.size
+        if decode_width * decode_height > max_pixels:
+            raise ImagePipelineError(f"图片尺寸过大: {width}x{height}")
+
+        image.load()
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    except ImagePipelineError:
+        image.close()
+        raise
+    except Exception as e:
+        image.close()
+        raise ImagePipelineError(f"无法识别的图片: {e}")
+    mark("decode")
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # 透明背景铺白色，避免转换为RGB后变成黑色
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    mark("convert")
+
+    # 目标尺寸是正方形边界，先缩放再按方向旋转结果相同，旋转的是缩小后的图片
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    mark("resize")
+
+    # 按EXIF方向旋转（手机照片常见）
+    if orientation in ORIENTATION_TRANSPOSE:
+        image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+    mark("orient")
+
+    buffer = BytesIO()
+    image.save(buffer, format=output_format, quality=quality)
+    mark("encode")
+
+    return {
+        "data": buffer.getvalue(),
+        "mime_type": MIME_TYPES[output_format],
+        "original_size": original_size,
+        "size": image.size,
+        "timings": timings
+    }
+
+
+class ImagePipeline:
+    """基于进程池的图片预处理"""
+
+    def __init__(self, max_workers: int = 2, output_format: str = "JPEG", quality: int = 90):
+        """
+        初始化流水线
+
+        Args:
+            max_workers: 工作进程数，为0时在线程中执行（不创建子进程）
+            output_format: 输出格式，JPEG或WEBP
+            quality: 编码质量
+        """
+        output_format = output_format.upper()
+        if output_format not in ("JPEG", "WEBP"):
+            raise ValueError(f"不支持的输出格式: {output_format}")
+
+        self.max_workers = max_workers
+        self.output_format = output_format
+        self.quality = quality
+
+        # 进程池在首次使用时创建，避免导入模块时就启动子进程
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.counters = {"processed": 0, "rejected": 0, "failed": 0}
+        self.stage_totals = {stage: 0.0 for stage in STAGES}
+
+    # ==================== 对外接口 ====================
+
+    async def process(self, data: Union[bytes, str], max_size: int = 1024) -> Dict[str, Any]:
+        """
+        预处理单张图片
+
+        Returns:
+            process_image的结果，可以直接作为Gemini的图片内容（mime_type + data）
+
+        Raises:
+            ImagePipelineError: 图片无法解码、尺寸过小或解码尺寸过大
+        """
+        job = functools.partial(process_image, data, max_size, self.output_format, self.quality)
+        try:
+            result = await self._run(job)
+        except ImagePipelineError:
+            self.counters["rejected"] += 1
+            raise
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+
+        self.counters["processed"] += 1
+        for stage, elapsed in result["timings"].items():
+            self.stage_totals[stage] += elapsed
+        width, height = result["original_size"]
+        logger.info(
+            f"📏 图片预处理完成: {width}x{height} -> {result['size'][0]}x{result['size'][1]}, "
+            f"耗时 {result['timings']}ms"
+        )
+        return result
+
+    async def process_many(self, items: List[Union[bytes, str]], max_size: int = 1024) -> List[Any]:
+        """
+        并行预处理多张图片
+
+        Returns:
+            与输入顺序一致的结果列表，处理失败的位置为对应的异常对象
+        """
+        return await asyncio.gather(*(self.process(data, max_size) for data in items), return_exceptions=True)
+
+    @staticmethod
+    def as_content(result: Dict[str, Any]) -> Dict[str, Any]:
+        """转换为Gemini请求中的图片内容"""
+        return {"mime_type": result["mime_type"], "data": result["data"]}
+
+    def stats(self) -> Dict[str, Any]:
+        """获取处理统计（各阶段平均耗时，毫秒）"""
+        processed = self.counters["processed"]
+        return {
+            **self.counters,
+            "max_workers": self.max_workers,
+            "output_format": self.output_format,
+            "avg_stage_ms": {
+                stage: round(total / processed, 2) if processed else 0.0
+                for stage, total in self.stage_totals.items()
+            }
+        }
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    # ==================== 内部方法 ====================
+
+    async def _run(self, job: functools.partial) -> Dict[str, Any]:
+        if self.max_workers <= 0:
+            return await asyncio.to_thread(job)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), job)
+        except BrokenProcessPool:
+            # 工作进程异常退出（如内存不足被杀），重建进程池后重试一次
+            logger.warning("图片处理进程池已损坏，正在重建")
+            self.shutdown()
+            return await loop.run_in_executor(self._get_executor(), job)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+
+# 全局实例
+image_pipeline = ImagePipeline(
+    max_workers=int(os.getenv("IMAGE_PIPELINE_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    output_format=os.getenv("IMAGE_PIPELINE_FORMAT", "JPEG"),
+    quality=int(os.getenv("IMAGE_PIPELINE_QUALITY", "90"))
+)
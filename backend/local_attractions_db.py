@@ -1,12 +1,16 @@
 # 本地景点数据库
 # 解决网络API不稳定的问题
 
-import math
 from typing import List, Dict, Optional
+from geo_index import geo_index
+from geo_math import distance_km
 
 class LocalAttractionsDB:
     """本地景点数据库"""
     
+    # 在共享空间索引中的数据源名称
+    INDEX_SOURCE = "local_attractions"
+    
     def __init__(self):
         # 精选北京22个最具代表性的景点，使用国内可访问的图片和视频资源
         self.attractions = [
@@ -356,42 +360,26 @@ class LocalAttractionsDB:
                 "address": "北京市怀柔区渤海镇慕田峪村"
             }
         ]
+        
+        # 加载到共享空间索引
+        geo_index.load(self.INDEX_SOURCE, self.attractions)
     
     def find_nearby_attractions(self, lat: float, lon: float, radius_km: float = 50) -> List[Dict]:
         """查找附近的景点"""
         nearby = []
         
-        for attraction in self.attractions:
-            distance = self.calculate_distance(
-                lat, lon, 
-                attraction['latitude'], attraction['longitude']
-            )
-            
-            if distance <= radius_km * 1000:  # 转换为米
-                attraction_copy = attraction.copy()
-                attraction_copy['distance_to_point'] = distance / 1000  # 转换为公里
-                nearby.append(attraction_copy)
+        # 通过共享空间索引只检查搜索范围内的网格
+        for attraction, dist_km in geo_index.query_radius(lat, lon, radius_km, sources=[self.INDEX_SOURCE]):
+            attraction_copy = attraction.copy()
+            attraction_copy['distance_to_point'] = dist_km
+            nearby.append(attraction_copy)
         
-        # 按距离排序
-        nearby.sort(key=lambda x: x['distance_to_point'])
+        # 结果已按距离排序
         return nearby
     
     def calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """计算两点间距离（米）"""
-        R = 6371000  # 地球半径（米）
-        
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
+        return distance_km(lat1, lon1, lat2, lon2) * 1000
     
     def get_attraction_by_name(self, name: str) -> Optional[Dict]:
         """根据名称获取景点"""
@@ -0,0 +1,566 @@
+"""
+本地向量索引
+把spot_attraction_embeddings同步到本地：向量归一化后保存在内存映射的float32矩阵文件中，
+用IVF-flat（k-means聚类的倒排列表）做近似top-k检索，每次只扫描最接近查询的几个聚类；
+定期按updated_at增量同步新增和更新的向量，全量同步时清除已删除的记录。
+既是相似度搜索的快速路径，也是数据库不可用时的离线备用；
+精确模式按批做矩阵乘法扫描全部向量，用于校验近似检索的召回率
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geo_math import bounding_box, one_to_many_km
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vector_index")
+
+# 随向量一起保存的景点字段（检索结果与PostgreSQL查询的字段一致）
+ROW_FIELDS = (
+    "id", "attraction_id", "content_type", "language_code", "content_text",
+    "name", "category", "city", "country", "address", "main_image_url", "longitude", "latitude"
+)
+
+# 向量数少于该值时直接精确扫描，不训练聚类
+IVF_MIN_ROWS = 4096
+# 精确扫描每批的行数
+EXACT_CHUNK_ROWS = 16384
+
+# 同步数据源：since为增量同步的游标（updated_at），None表示全量；按批返回行
+RowSource = Callable[[Optional[str]], AsyncIterator[List[Dict[str, Any]]]]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化（归一化后内积即余弦相似度）"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    球面k-means训练聚类中心
+
+    Args:
+        vectors: 已归一化的向量（可以是抽样）
+        nlist: 聚类数
+        iterations: 迭代次数
+
+    Returns:
+        归一化的聚类中心 (nlist, dimension)
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=nlist)
+        # 空聚类重新取一个随机样本
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """把向量分配到最相似的聚类（分批计算，避免大矩阵）"""
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), EXACT_CHUNK_ROWS):
+        chunk = np.asarray(vectors[start:start + EXACT_CHUNK_ROWS])
+        assign[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assign
+
+
+def combined_score(similarity, distance_km, radius_km: float, similarity_weight: float):
+    """
+    相似度与距离的综合得分：similarity_weight * 相似度 + (1 - similarity_weight) * (1 - 距离/半径)
+
+    与PostgreSQL混合查询中的计算方式相同，越大越好
+    """
+    return similarity_weight * similarity + (1 - similarity_weight) * (1 - distance_km / radius_km)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回得分最高的k个位置（按得分降序）"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class _IndexData:
+    """向量矩阵文件和行元数据（行号与矩阵行一一对应，只追加不删除）"""
+
+    def __init__(self, path: str, dimension: int):
+        self.path = path
+        self.dimension = dimension
+        self.rows: List[Dict[str, Any]] = []
+        self.row_of: Dict[Any, int] = {}
+        self.languages: Dict[str, int] = {}
+        self.langs = np.empty(0, dtype=np.int16)
+        # 景点坐标（缺失为NaN），用于按距离过滤
+        self.lats = np.empty(0, dtype=np.float64)
+        self.lons = np.empty(0, dtype=np.float64)
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+
+    @classmethod
+    def load(cls, path: str, meta: Dict[str, Any]) -> "_IndexData":
+        data = cls(path, meta["dimension"])
+        data.rows = meta["rows"]
+        data.row_of = {row["id"]: i for i, row in enumerate(data.rows)}
+        data.languages = meta["languages"]
+        data.langs = np.array([data.languages[row["language_code"]] for row in data.rows], dtype=np.int16)
+        data.lats, data.lons = _coordinates(data.rows)
+        if data.rows:
+            data.vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(len(data.rows), data.dimension))
+        return data
+
+    def upsert(self, batch: List[Dict[str, Any]]) -> int:
+        """写入一批行：已有的行原地覆盖向量，新行追加到矩阵文件末尾；返回新增行数"""
+        appended_rows, appended_vectors = [], []
+        for row in batch:
+            vector = normalize_rows(row["embedding"])
+            if vector.shape != (self.dimension,):
+                logger.warning(f"跳过维度不符的向量: id={row.get('id')}, shape={vector.shape}")
+                continue
+            meta = {field: row.get(field) for field in ROW_FIELDS}
+            position = self.row_of.get(meta["id"])
+            if position is not None:
+                self.rows[position] = meta
+                self.langs[position] = self.languages.setdefault(meta["language_code"], len(self.languages))
+                self.lats[position], self.lons[position] = _coordinates([meta])
+                self.vectors[position] = vector
+            else:
+                self.row_of[meta["id"]] = len(self.rows) + len(appended_rows)
+                appended_rows.append(meta)
+                appended_vectors.append(vector)
+
+        if appended_rows:
+            with open(self.path, "ab") as f:
+                f.write(np.stack(appended_vectors).astype(np.float32).tobytes())
+            codes = [self.languages.setdefault(row["language_code"], len(self.languages)) for row in appended_rows]
+            # 先追加行和语言，最后替换矩阵：检索以矩阵行数为准，不会读到缺少元数据的行
+            self.rows.extend(appended_rows)
+            self.langs = np.concatenate([self.langs, np.array(codes, dtype=np.int16)])
+            lats, lons = _coordinates(appended_rows)
+            self.lats = np.concatenate([self.lats, lats])
+            self.lons = np.concatenate([self.lons, lons])
+            self.vectors = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(len(self.rows), self.dimension))
+        return len(appended_rows)
+
+
+def _coordinates(rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    lats = np.array([row.get("latitude") for row in rows], dtype=np.float64)
+    lons = np.array([row.get("longitude") for row in rows], dtype=np.float64)
+    return lats, lons
+
+
+class LocalVectorIndex:
+    """IVF-flat本地向量索引"""
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, dimension: int = 1536, nprobe: int = 8,
+                 sync_interval: float = 300, full_sync_interval: float = 86400, mode: str = "prefer"):
+        """
+        初始化索引（加载上次同步保存的索引文件）
+
+        Args:
+            index_dir: 索引文件目录
+            dimension: 向量维度
+            nprobe: 近似检索时扫描的聚类数，越大召回率越高、速度越慢
+            sync_interval: 增量同步间隔（秒）
+            full_sync_interval: 全量同步间隔（秒），用于清除数据库中已删除的向量
+            mode: prefer（优先使用本地索引）、fallback（仅数据库不可用时使用）或 off
+        """
+        self.index_dir = index_dir
+        self.dimension = dimension
+        self.nprobe = nprobe
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self.mode = mode
+
+        # (聚类中心, 按聚类排序的行号, 各聚类在排序数组中的起始位置, 建立倒排列表时的行数)
+        self._ivf: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, int]] = None
+        self._data = _IndexData(self._vectors_path(), dimension)
+        self._cursor: Optional[str] = None
+        self._last_full_sync = 0.0
+        self._sync_lock = asyncio.Lock()
+        self._write_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.last_sync: Optional[float] = None
+        self.counters = {"searches": 0, "ivf_searches": 0, "exact_searches": 0, "geo_searches": 0,
+                         "syncs": 0, "full_syncs": 0, "rows_synced": 0, "sync_errors": 0}
+        self._search_time = 0.0
+
+        if mode != "off":
+            os.makedirs(index_dir, exist_ok=True)
+            self._load()
+
+    # ==================== 对外接口 ====================
+
+    @property
+    def size(self) -> int:
+        return len(self._data.vectors)
+
+    def ready(self, language_code: Optional[str] = None) -> bool:
+        """索引是否可用（指定语言时要求该语言有向量）"""
+        if self.mode == "off" or self.size == 0:
+            return False
+        return language_code is None or language_code in self._data.languages
+
+    async def start(self, source: RowSource):
+        """启动后台同步任务"""
+        if self.mode != "off":
+            self._task = asyncio.create_task(self._sync_loop(source))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def sync(self, source: RowSource, full: bool = False) -> Dict[str, Any]:
+        """
+        从数据源同步向量
+
+        Args:
+            source: 数据源，见RowSource
+            full: 全量同步（重建矩阵文件和聚类，清除已删除的向量）
+
+        Returns:
+            同步结果
+        """
+        async with self._sync_lock:
+            started = time.perf_counter()
+            full = full or self._cursor is None
+            data = _IndexData(self._vectors_path() + ".tmp", self.dimension) if full else self._data
+            if full and os.path.exists(data.path):
+                os.remove(data.path)
+
+            cursor, synced, appended = self._cursor, 0, 0
+            async for batch in source(None if full else self._cursor):
+                if not batch:
+                    continue
+                appended += await asyncio.to_thread(self._upsert, data, batch)
+                synced += len(batch)
+                cursor = max([cursor or ""] + [str(row["updated_at"]) for row in batch if row.get("updated_at")])
+
+            if full:
+                await asyncio.to_thread(self._swap, data)
+            if full or appended:
+                await asyncio.to_thread(self._rebuild_ivf, full)
+            self._cursor = cursor or self._cursor
+            await asyncio.to_thread(self._save)
+
+            self.last_sync = time.time()
+            self.counters["syncs"] += 1
+            self.counters["rows_synced"] += synced
+            if full:
+                self._last_full_sync = time.monotonic()
+                self.counters["full_syncs"] += 1
+            result = {"full": full, "synced": synced, "appended": appended, "rows": self.size,
+                      "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+            if synced or full:
+                logger.info(f"本地向量索引同步完成: {result}")
+            return result
+
+    def search(self, query_embedding: List[float], language_code: str = "zh-CN", limit: int = 10,
+               threshold: float = 0.0, exact: bool = False) -> List[Dict[str, Any]]:
+        """
+        检索最相似的向量
+
+        Args:
+            query_embedding: 查询向量
+            language_code: 语言
+            limit: 返回数量
+            threshold: 最低余弦相似度
+            exact: 精确模式，扫描全部向量
+
+        Returns:
+            结果列表，字段与PostgreSQL相似度查询一致（similarity为余弦相似度，distance为余弦距离）
+        """
+        started = time.perf_counter()
+        query = normalize_rows(query_embedding)
+        data, ivf = self._data, self._ivf
+        vectors = data.vectors
+        code = data.languages.get(language_code)
+        if code is None or len(vectors) == 0:
+            return []
+
+        # 全量同步替换矩阵的瞬间，倒排列表可能已经对应新矩阵，此时改用精确扫描
+        if exact or ivf is None or ivf[3] > len(vectors):
+            positions, scores = self._scan(vectors, data.langs[:len(vectors)], code, query[None, :], limit)[0]
+            self.counters["exact_searches"] += 1
+        else:
+            positions, scores = self._probe(vectors, data.langs, ivf, code, query, limit)
+            self.counters["ivf_searches"] += 1
+
+        results = []
+        for position, score in zip(positions.tolist(), scores.tolist()):
+            if score < threshold:
+                break
+            results.append({**data.rows[position], "similarity": score, "distance": 1.0 - score})
+
+        self.counters["searches"] += 1
+        self._search_time += time.perf_counter() - started
+        return results
+
+    def search_nearby(self, query_embedding: List[float], latitude: float, longitude: float, radius_km: float,
+                      language_code: str = "zh-CN", limit: int = 10,
+                      similarity_weight: float = 0.7) -> List[Dict[str, Any]]:
+        """
+        在指定范围内检索景点：先按坐标过滤，再对范围内的全部向量计算相似度，按综合得分排序
+
+        Args:
+            query_embedding: 查询向量
+            latitude, longitude: 中心点坐标
+            radius_km: 搜索半径（公里）
+            language_code: 语言
+            limit: 返回数量（范围内的景点足够时恰好返回limit个）
+            similarity_weight: 综合得分中相似度的权重，见combined_score
+
+        Returns:
+            每个景点一条结果（取该景点得分最高的向量），附带distance_km和score
+        """
+        started = time.perf_counter()
+        query = normalize_rows(query_embedding)
+        data = self._data
+        vectors = data.vectors
+        count = len(vectors)
+        code = data.languages.get(language_code)
+        if code is None or count == 0:
+            return []
+
+        # 经纬度范围粗筛（坐标缺失的NaN比较结果为False，自动排除），再精确计算距离
+        lat_min, lat_max, lon_min, lon_max = bounding_box(latitude, longitude, radius_km)
+        lats, lons = data.lats[:count], data.lons[:count]
+        mask = (data.langs[:count] == code) & (lats >= lat_min) & (lats <= lat_max)
+        if lon_min is not None:
+            mask &= (lons >= lon_min) & (lons <= lon_max)
+        candidates = np.flatnonzero(mask)
+        distances = one_to_many_km(latitude, longitude, lats[candidates], lons[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+
+        similarities = np.empty(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), EXACT_CHUNK_ROWS):
+            chunk = candidates[start:start + EXACT_CHUNK_ROWS]
+            similarities[start:start + len(chunk)] = np.asarray(vectors[chunk]) @ query
+        scores = combined_score(similarities, distances, radius_km, similarity_weight)
+
+        results, seen = [], set()
+        for i in np.argsort(-scores, kind="stable").tolist():
+            row = data.rows[candidates[i]]
+            if row["attraction_id"] in seen:
+                continue
+            seen.add(row["attraction_id"])
+            similarity = float(similarities[i])
+            results.append({**row, "similarity": similarity, "distance": 1.0 - similarity,
+                            "distance_km": float(distances[i]), "score": float(scores[i])})
+            if len(results) == limit:
+                break
+
+        self.counters["searches"] += 1
+        self.counters["geo_searches"] += 1
+        self._search_time += time.perf_counter() - started
+        return results
+
+    def search_exact_batch(self, query_embeddings: np.ndarray, language_code: str = "zh-CN",
+                           limit: int = 10) -> List[List[Tuple[Any, float]]]:
+        """
+        精确检索一批查询：查询矩阵与向量矩阵分块相乘
+
+        Args:
+            query_embeddings: 查询向量 (Q, dimension)
+            language_code: 语言
+            limit: 每个查询返回数量
+
+        Returns:
+            每个查询的 [(向量行id, 余弦相似度), ...]
+        """
+        data = self._data
+        vectors = data.vectors
+        code = data.languages.get(language_code)
+        if code is None or len(vectors) == 0:
+            return [[] for _ in range(len(query_embeddings))]
+        results = self._scan(vectors, data.langs[:len(vectors)], code, normalize_rows(query_embeddings), limit)
+        return [[(data.rows[p]["id"], s) for p, s in zip(positions.tolist(), scores.tolist())]
+                for positions, scores in results]
+
+    def recall_at_k(self, query_embeddings: np.ndarray, language_code: str = "zh-CN", k: int = 10) -> float:
+        """近似检索相对精确检索的召回率recall@k"""
+        truth = self.search_exact_batch(query_embeddings, language_code, k)
+        hits = total = 0
+        for query, expected in zip(query_embeddings, truth):
+            found = {row["id"] for row in self.search(query, language_code, k)}
+            hits += sum(1 for row_id, _ in expected if row_id in found)
+            total += len(expected)
+        return hits / total if total else 1.0
+
+    def stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        searches = self.counters["searches"]
+        ivf = self._ivf
+        return {
+            **self.counters,
+            "mode": self.mode,
+            "rows": self.size,
+            "languages": sorted(self._data.languages),
+            "lists": len(ivf[0]) if ivf else 0,
+            "nprobe": self.nprobe,
+            "unindexed_rows": self.size - ivf[3] if ivf else self.size,
+            "cursor": self._cursor,
+            "last_sync": self.last_sync,
+            "avg_search_ms": round(self._search_time / searches * 1000, 2) if searches else 0.0
+        }
+
+    # ==================== 内部方法 ====================
+
+    def _vectors_path(self) -> str:
+        return os.path.join(self.index_dir, "vectors.f32")
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.index_dir, "index.json")
+
+    def _ivf_path(self) -> str:
+        return os.path.join(self.index_dir, "ivf.npz")
+
+    def _upsert(self, data: _IndexData, batch: List[Dict[str, Any]]) -> int:
+        with self._write_lock:
+            return data.upsert(batch)
+
+    def _swap(self, data: _IndexData):
+        # 旧的内存映射仍指向被替换的文件，正在进行的检索不受影响
+        with self._write_lock:
+            if not data.rows:
+                open(data.path, "wb").close()
+            os.replace(data.path, self._vectors_path())
+            data.path = self._vectors_path()
+            self._data = data
+            self._ivf = None
+
+    def _rebuild_ivf(self, retrain: bool):
+        data = self._data
+        vectors = data.vectors
+        count = len(vectors)
+        if count < IVF_MIN_ROWS:
+            self._ivf = None
+            return
+
+        centroids = None if retrain or self._ivf is None else self._ivf[0]
+        # 向量数增长到聚类数应当翻倍（约为训练时的4倍）时重新训练
+        if centroids is not None and count > 4 * len(centroids) ** 2:
+            centroids = None
+        if centroids is None:
+            nlist = int(np.sqrt(count))
+            rng = np.random.default_rng(0)
+            sample = np.asarray(vectors[np.sort(rng.choice(count, min(count, nlist * 64), replace=False))])
+            centroids = train_centroids(sample, nlist)
+
+        assign = assign_lists(vectors, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1)).astype(np.int64)
+        self._ivf = (centroids, order, offsets, count)
+
+    def _probe(self, vectors: np.ndarray, langs: np.ndarray, ivf, code: int, query: np.ndarray,
+               limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        centroids, order, offsets, indexed = ivf
+        probes = top_k(centroids @ query, min(self.nprobe, len(centroids)))
+        # 建立倒排列表之后追加的行还不在任何聚类中，直接扫描
+        candidates = np.concatenate(
+            [order[offsets[p]:offsets[p + 1]] for p in probes] + [np.arange(indexed, len(vectors), dtype=np.int32)]
+        )
+        candidates = np.sort(candidates[langs[candidates] == code])
+        scores = np.asarray(vectors[candidates]) @ query
+        best = top_k(scores, limit)
+        return candidates[best], scores[best]
+
+    @staticmethod
+    def _scan(vectors: np.ndarray, langs: np.ndarray, code: int, queries: np.ndarray,
+              limit: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        # 分块计算 查询 × 向量 的相似度矩阵，每块只保留各查询的前limit个
+        best_positions = [np.empty(0, dtype=np.int64) for _ in queries]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in queries]
+        for start in range(0, len(vectors), EXACT_CHUNK_ROWS):
+            mask = langs[start:start + EXACT_CHUNK_ROWS] == code
+            if not mask.any():
+                continue
+            positions = start + np.flatnonzero(mask)
+            scores = queries @ np.asarray(vectors[start:start + EXACT_CHUNK_ROWS])[mask].T
+            for i, row in enumerate(scores):
+                merged_positions = np.concatenate([best_positions[i], positions])
+                merged_scores = np.concatenate([best_scores[i], row])
+                keep = top_k(merged_scores, limit)
+                best_positions[i], best_scores[i] = merged_positions[keep], merged_scores[keep]
+        return list(zip(best_positions, best_scores))
+
+    def _load(self):
+        try:
+            if not os.path.exists(self._meta_path()):
+                return
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dimension"] != self.dimension:
+                logger.warning("本地向量索引维度不一致，等待全量同步重建")
+                return
+            self._data = _IndexData.load(self._vectors_path(), meta)
+            self._cursor = meta.get("cursor")
+            if os.path.exists(self._ivf_path()):
+                with np.load(self._ivf_path()) as ivf:
+                    self._ivf = (ivf["centroids"], ivf["order"], ivf["offsets"], int(ivf["count"]))
+            logger.info(f"已加载本地向量索引: {self.size} 个向量")
+        except Exception as e:
+            logger.warning(f"加载本地向量索引失败，等待全量同步重建: {e}")
+            self._data = _IndexData(self._vectors_path(), self.dimension)
+            self._ivf = None
+            self._cursor = None
+
+    def _save(self):
+        data, ivf = self._data, self._ivf
+        if isinstance(data.vectors, np.memmap):
+            data.vectors.flush()
+        meta = {"dimension": self.dimension, "cursor": self._cursor, "languages": data.languages, "rows": data.rows}
+        tmp_path = f"{self._meta_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self._meta_path())
+
+        if ivf is None:
+            if os.path.exists(self._ivf_path()):
+                os.remove(self._ivf_path())
+            return
+        centroids, order, offsets, count = ivf
+        tmp_path = f"{self._ivf_path()}.tmp.npz"
+        np.savez(tmp_path, centroids=centroids, order=order, offsets=offsets, count=count)
+        os.replace(tmp_path, self._ivf_path())
+
+    async def _sync_loop(self, source: RowSource):
+        while True:
+            try:
+                full = time.monotonic() - self._last_full_sync > self.full_sync_interval
+                await self.sync(source, full=full)
+            except Exception as e:
+                self.counters["sync_errors"] += 1
+                logger.warning(f"本地向量索引同步失败: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+
+# 全局实例
+local_vector_index = LocalVectorIndex(
+    index_dir=os.getenv("LOCAL_VECTOR_INDEX_DIR", DEFAULT_INDEX_DIR),
+    nprobe=int(os.getenv("LOCAL_VECTOR_INDEX_NPROBE", "8")),
+    sync_interval=float(os.getenv("LOCAL_VECTOR_INDEX_SYNC_INTERVAL", "300")),
+    full_sync_interval=float(os.getenv("LOCAL_VECTOR_INDEX_FULL_SYNC_INTERVAL", "86400")),
+    mode=os.getenv("LOCAL_VECTOR_INDEX", "prefer")
+)
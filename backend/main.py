@@ -2,7 +2,7 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
@@ -14,20 +14,37 @@ import asyncio
 import logging
 import requests
 import time
+from contextlib import ExitStack, asynccontextmanager
 from real_data_service import real_data_service
 from local_attractions_db import local_attractions_db
 from global_cities_db import GlobalCitiesDB
+from geo_index import geo_index
+from geocode_cache import geocode_cache
+from geocoding_service import geocoding_service, MAX_BATCH_SIZE
+from http_client import http_clients
+from route_engine import route_engine, MAX_WAYPOINTS
 from gemini_service import gemini_service
+from generation_pool import generation_pool
+from generation_cache import generation_cache
+from generated_manifest import generated_manifest
+from image_pipeline import image_pipeline
+from video_jobs import video_job_manager
+from media_streaming import GENERATED_MEDIA_ROUTE, IMMUTABLE_CACHE_CONTROL, encode_data_url, stream_file
 from doro_service import doro_service
+from doro_assets import doro_assets
+from upload_spool import MAX_UPLOAD_BYTES, spool_upload
+from doro_thumbnails import doro_thumbnails, source_version, DEFAULT_THUMBNAIL_SIZE
 from spot_api_service import spot_api_service
-from supabase_client import supabase_client
+from supabase_client import async_supabase_client
 from album_orchestrator import get_album_orchestrator
-from vector_database import get_vector_database
+from vector_database import get_vector_database, close_vector_database, start_local_vector_index
+from local_vector_index import local_vector_index
+from embedding_cache import embedding_cache
 from fastapi import File, UploadFile, Form
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 import tempfile
 import shutil
-from auth import router as auth_router
+from auth import router as auth_router, close_supabase as close_auth_supabase
 
 # 配置日志
 logging.basicConfig(
@@ -40,7 +57,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="方向探索派对API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时加载数据，关闭时释放HTTP会话和数据库连接池"""
+    load_places_data()
+    print("地点数据加载完成")
+    await video_job_manager.start()
+    await generated_manifest.start(gemini_service.output_dir)
+    await start_local_vector_index()
+    # 后台预加载预设Doro素材，不阻塞启动
+    doro_preload = asyncio.create_task(doro_assets.preload())
+    try:
+        yield
+    finally:
+        doro_preload.cancel()
+        await video_job_manager.stop()
+        await generated_manifest.stop()
+        await async_supabase_client.close()
+        await close_auth_supabase()
+        await close_vector_database()
+        await http_clients.close()
+        generation_pool.shutdown()
+        image_pipeline.shutdown()
+
+app = FastAPI(title="方向探索派对API", version="1.0.0", lifespan=lifespan)
+
+# 请求体超过上限时在解析multipart之前直接拒绝（单个文件的大小在落盘时校验）；
+# 在CORS中间件之前注册，413响应同样带有CORS响应头
+MAX_REQUEST_BYTES = MAX_UPLOAD_BYTES * 3 + 1024 * 1024
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_REQUEST_BYTES:
+        return JSONResponse(status_code=413, content={"detail": "上传内容太大"})
+    return await call_next(request)
 
 # 添加CORS中间件
 app.add_middleware(
@@ -59,6 +110,15 @@ class ExploreRequest(BaseModel):
     segment_distance: int = 100  # 默认100km
     time_mode: str = "present"  # present, past, future
     speed: int = 120  # 默认120km/h
+    exact: bool = False  # 是否使用WGS84椭球精确计算目标点
+
+class ExploreRouteRequest(BaseModel):
+    latitude: float
+    longitude: float
+    heading: float
+    segment_distance: float = 100  # 相邻航点间距（km）
+    waypoints: int = 20  # 航点数量
+    exact: bool = False
 
 class PlaceInfo(BaseModel):
     name: str
@@ -103,10 +163,6 @@ global_cities_db = GlobalCitiesDB()
 active_journeys = {}  # 存储活跃的旅程
 journey_counter = 0   # 旅程ID计数器
 
-# 地理编码缓存
-geocode_cache = {}  # 缓存地理编码结果
-cache_max_size = 1000  # 最大缓存条目数
-
 def load_places_data():
     """加载地点数据"""
     global places_data
@@ -336,34 +392,21 @@ def load_places_data():
             }
         ]
     }
-
-def calculate_great_circle_points(start_lat, start_lon, heading, max_distance, segment_distance):
-    """计算大圆航线上的点"""
-    points = []
-    current_distance = 0
-    
-    while current_distance <= max_distance:
-        # 使用大圆航线计算
-        result = geod.Direct(start_lat, start_lon, heading, current_distance * 1000)  # 转换为米
-        
-        points.append({
-            'latitude': result['lat2'],
-            'longitude': result['lon2'],
-            'distance': current_distance
-        })
-        
-        current_distance += segment_distance
-        
-        # 最多计算20个点，避免过多数据
-        if len(points) >= 20:
-            break
     
-    return points
+    # 按时间模式加载到共享空间索引
+    for time_mode, places in places_data.items():
+        geo_index.load(f"places_{time_mode}", places)
+
+def calculate_great_circle_points(start_lat, start_lon, heading, max_distance, segment_distance,
+                                  max_points=20, exact=False):
+    """计算大圆航线上的点（从起点开始，每隔segment_distance公里一个点）"""
+    count = min(int(max_distance // segment_distance) + 1, max_points)
+    return route_engine.waypoints(start_lat, start_lon, heading, segment_distance, count, exact=exact)
 
 def find_nearby_attractions(points, time_mode, search_radius_km=5):
     """在目标点周围搜索景点"""
     places = []
-    available_places = places_data.get(time_mode, places_data["present"])
+    index_source = f"places_{time_mode if time_mode in places_data else 'present'}"
     
     for point in points:
         target_lat = point['latitude']
@@ -373,22 +416,14 @@ def find_nearby_attractions(points, time_mode, search_radius_km=5):
         # 在目标点周围搜索景点
         nearby_places = []
         
-        for place_data in available_places:
-            # 计算到目标点的距离
-            distance_result = geod.Inverse(
-                target_lat, target_lon,
-                place_data['latitude'], place_data['longitude']
-            )
-            distance_km = distance_result['s12'] / 1000  # 转换为公里
-            
-            # 如果在搜索半径内，添加到候选列表
-            if distance_km <= search_radius_km:
-                place_copy = place_data.copy()
-                place_copy['distance_to_target'] = distance_km
-                nearby_places.append(place_copy)
-        
-        # 按距离排序，选择最近的几个
-        nearby_places.sort(key=lambda x: x['distance_to_target'])
+        # 通过空间索引搜索，使用WGS84椭球精确距离，结果已按距离排序
+        candidates = geo_index.query_radius(
+            target_lat, target_lon, search_radius_km, sources=[index_source], exact=True
+        )
+        for place_data, distance_km in candidates:
+            place_copy = place_data.copy()
+            place_copy['distance_to_target'] = distance_km
+            nearby_places.append(place_copy)
         
         # 如果找到了真实景点，使用它们
         if nearby_places:
@@ -701,12 +736,6 @@ def get_region_info(lat, lon):
     else:
         return {"name": "海洋", "country": "海洋", "city": "海域"}
 
-@app.on_event("startup")
-async def startup_event():
-    """应用启动时加载数据"""
-    load_places_data()
-    print("地点数据加载完成")
-
 @app.get("/")
 async def root():
     return {"message": "方向探索派对API服务正在运行"}
@@ -732,17 +761,18 @@ async def explore_direction(request: ExploreRequest):
         target_distance = request.segment_distance
         
         # 计算目标距离点的坐标
-        target_point = geod.Direct(
-            request.latitude, 
-            request.longitude, 
-            request.heading, 
-            target_distance * 1000  # 转换为米
+        target_lat, target_lon = route_engine.destination(
+            request.latitude,
+            request.longitude,
+            request.heading,
+            target_distance,
+            exact=request.exact
         )
         
         # 创建目标点
         points = [{
-            'latitude': target_point['lat2'],
-            'longitude': target_point['lon2'],
+            'latitude': target_lat,
+            'longitude': target_lon,
             'distance': target_distance
         }]
         
@@ -784,31 +814,28 @@ async def explore_direction_real(request: ExploreRequest):
         target_distance = request.segment_distance
         
         # 计算目标距离点的坐标
-        target_point = geod.Direct(
-            request.latitude, 
-            request.longitude, 
-            request.heading, 
-            target_distance * 1000  # 转换为米
+        target_lat, target_lon = route_engine.destination(
+            request.latitude,
+            request.longitude,
+            request.heading,
+            target_distance,
+            exact=request.exact
         )
         
         # 创建目标点
         points = [{
-            'latitude': target_point['lat2'],
-            'longitude': target_point['lon2'],
+            'latitude': target_lat,
+            'longitude': target_lon,
             'distance': target_distance
         }]
         
         # 使用本地数据库获取附近景点信息
-        target_lat = target_point['lat2']
-        target_lon = target_point['lon2']
-        
         # 从本地数据库中获取附近景点，搜索半径50km
         places_data_list = local_attractions_db.find_nearby_attractions(target_lat, target_lon, radius_km=50)
         
         # 🆕 如果本地数据库没有找到景点，尝试从全球城市数据库搜索
         if len(places_data_list) == 0:
             logger.info("本地数据库未找到景点，尝试从全球城市数据库搜索...")
-            global_cities_db = GlobalCitiesDB()
             places_data_list = global_cities_db.find_nearby_attractions(target_lat, target_lon, radius_km=50)
             logger.info(f"从全球城市数据库中找到 {len(places_data_list)} 个景点，距离目标点 ({target_lat:.4f}, {target_lon:.4f}) 50km 以内")
         else:
@@ -854,6 +881,43 @@ async def explore_direction_real(request: ExploreRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"真实数据获取错误: {str(e)}")
 
+@app.post("/api/explore-route")
+async def explore_route(request: ExploreRouteRequest):
+    """沿指定方向的大圆航线计算多个等距航点"""
+    start_time = time.time()
+    
+    if not (-90 <= request.latitude <= 90):
+        raise HTTPException(status_code=400, detail="纬度必须在-90到90之间")
+    if not (-180 <= request.longitude <= 180):
+        raise HTTPException(status_code=400, detail="经度必须在-180到180之间")
+    if not (0 <= request.heading < 360):
+        raise HTTPException(status_code=400, detail="方向必须在0到360度之间")
+    if request.segment_distance <= 0:
+        raise HTTPException(status_code=400, detail="分段距离必须大于0")
+    if not (1 <= request.waypoints <= MAX_WAYPOINTS):
+        raise HTTPException(status_code=400, detail=f"航点数量必须在1到{MAX_WAYPOINTS}之间")
+    
+    waypoints = route_engine.waypoints(
+        request.latitude,
+        request.longitude,
+        request.heading,
+        request.segment_distance,
+        request.waypoints,
+        include_start=False,
+        exact=request.exact
+    )
+    
+    return {
+        "waypoints": waypoints,
+        "total_distance": waypoints[-1]['distance'],
+        "calculation_time": time.time() - start_time
+    }
+
+@app.get("/api/route/cache/stats")
+async def route_cache_stats():
+    """获取航线缓存统计信息"""
+    return route_engine.stats()
+
 @app.get("/api/places/{time_mode}")
 async def get_places(time_mode: str):
     """获取指定时间模式的所有地点"""
@@ -880,160 +944,25 @@ class PlaceDetailsRequest(BaseModel):
 async def geocode_location(request: GeocodeRequest):
     """地理编码服务 - 优先使用高德地图，备用Google Maps"""
     try:
-        # 检查缓存
-        cache_key = request.query.lower().strip()
-        if cache_key in geocode_cache:
+        # 检查缓存，相同查询的并发请求只会调用一次上游服务
+        cache_key = geocode_cache.normalize_key(request.query)
+        entry, cached = await geocoding_service.cached_geocode(request.query)
+        
+        if entry is None:
+            return GeocodeResponse(
+                success=False,
+                message=f"无法找到位置: {request.query}"
+            )
+        
+        if cached:
             logger.info(f"从缓存返回地理编码结果: {cache_key}")
             return GeocodeResponse(
                 success=True,
-                data=geocode_cache[cache_key],
+                data=entry["data"],
                 message=f"缓存命中: {cache_key}"
             )
         
-        # 导入必要的库
-        import googlemaps
-        import requests
-        from dotenv import load_dotenv
-        
-        load_dotenv()
-        
-        # 首先检查本地快速匹配
-        fallback_locations = {
-            "北京": {"lat": 39.9042, "lng": 116.4074, "address": "北京市"},
-            "上海": {"lat": 31.2304, "lng": 121.4737, "address": "上海市"},
-            "广州": {"lat": 23.1291, "lng": 113.2644, "address": "广州市"},
-            "深圳": {"lat": 22.5431, "lng": 114.0579, "address": "深圳市"},
-            "天安门": {"lat": 39.9042, "lng": 116.4074, "address": "北京市东城区天安门"},
-            "故宫": {"lat": 39.9163, "lng": 116.3972, "address": "北京市东城区故宫"},
-        }
-        
-        # 快速匹配常用地点
-        for city, info in fallback_locations.items():
-            if city in request.query:
-                result = {
-                    "formatted_address": info["address"],
-                    "geometry": {
-                        "location": {"lat": info["lat"], "lng": info["lng"]},
-                        "location_type": "APPROXIMATE"
-                    },
-                    "place_id": f"fallback_{city}",
-                    "address_components": [],
-                    "types": ["locality", "political"]
-                }
-                logger.info(f"使用本地快速匹配: {info['address']}")
-                
-                # 添加到缓存
-                geocode_cache[cache_key] = result
-                if len(geocode_cache) > cache_max_size:
-                    # 删除最旧的缓存条目
-                    oldest_key = next(iter(geocode_cache))
-                    del geocode_cache[oldest_key]
-                
-                return GeocodeResponse(
-                    success=True,
-                    data=result,
-                    message=f"快速匹配找到位置: {info['address']}"
-                )
-        
-        # 然后尝试高德地图API
-        amap_key = os.getenv("AMAP_API_KEY")
-        if amap_key:
-            try:
-                logger.info(f"调用高德地图API查询: {request.query}")
-                url = "https://restapi.amap.com/v3/geocode/geo"
-                params = {
-                    'key': amap_key,
-                    'address': request.query,
-                    'output': 'json'
-                }
-                
-                response = requests.get(url, params=params, timeout=10)  # 增加超时时间到10秒
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info(f"高德地图API响应: {data}")
-                    if data.get('status') == '1' and data.get('geocodes'):
-                        geocode = data['geocodes'][0]
-                        location = geocode['location'].split(',')
-                        
-                        result = {
-                            "formatted_address": geocode.get('formatted_address', request.query),
-                            "geometry": {
-                                "location": {
-                                    "lat": float(location[1]),
-                                    "lng": float(location[0])
-                                },
-                                "location_type": "APPROXIMATE"
-                            },
-                            "place_id": f"amap_{geocode.get('adcode', 'unknown')}",
-                            "address_components": [
-                                {
-                                    "long_name": geocode.get('district', ''),
-                                    "short_name": geocode.get('district', ''),
-                                    "types": ["administrative_area_level_3", "political"]
-                                },
-                                {
-                                    "long_name": geocode.get('city', ''),
-                                    "short_name": geocode.get('city', ''),
-                                    "types": ["administrative_area_level_2", "political"]
-                                },
-                                {
-                                    "long_name": geocode.get('province', ''),
-                                    "short_name": geocode.get('province', ''),
-                                    "types": ["administrative_area_level_1", "political"]
-                                },
-                                {
-                                    "long_name": "中国",
-                                    "short_name": "CN",
-                                    "types": ["country", "political"]
-                                }
-                            ],
-                            "types": ["geocode"]
-                        }
-                        
-                        logger.info(f"高德地图成功找到位置: {result['formatted_address']}")
-                        
-                        # 添加到缓存
-                        geocode_cache[cache_key] = result
-                        if len(geocode_cache) > cache_max_size:
-                            # 删除最旧的缓存条目
-                            oldest_key = next(iter(geocode_cache))
-                            del geocode_cache[oldest_key]
-                        
-                        return GeocodeResponse(
-                            success=True,
-                            data=result,
-                            message=f"高德地图找到位置: {result['formatted_address']}"
-                        )
-                    else:
-                        logger.warning(f"高德地图API返回错误: {data.get('info', 'Unknown error')}")
-                else:
-                    logger.warning(f"高德地图API请求失败: HTTP {response.status_code}")
-            except Exception as e:
-                logger.warning(f"高德地图地理编码失败: {e}")
-        
-        # 备用Google Maps API
-        google_key = os.getenv("GOOGLE_MAPS_API_KEY")
-        if google_key:
-            try:
-                gmaps = googlemaps.Client(key=google_key)
-                geocode_result = gmaps.geocode(request.query)
-                
-                if geocode_result:
-                    result = geocode_result[0]
-                    return GeocodeResponse(
-                        success=True,
-                        data=result,
-                        message=f"Google Maps找到位置: {result['formatted_address']}"
-                    )
-            except Exception as e:
-                logger.warning(f"Google Maps地理编码失败: {e}")
-        
-        # 如果前面的快速匹配和高德地图都失败了，返回错误
-        
-        return GeocodeResponse(
-            success=False,
-            message=f"无法找到位置: {request.query}"
-        )
+        return GeocodeResponse(success=True, data=entry["data"], message=entry["message"])
         
     except Exception as e:
         logger.error(f"地理编码服务错误: {e}")
@@ -1042,37 +971,81 @@ async def geocode_location(request: GeocodeRequest):
             message=f"地理编码服务错误: {str(e)}"
         )
 
+@app.get("/api/geocode/cache/stats")
+async def geocode_cache_stats():
+    """地理编码缓存命中/未命中/淘汰统计"""
+    return {"success": True, "data": geocode_cache.stats()}
+
+class ReverseGeocodeRequest(BaseModel):
+    lat: float
+    lng: float
+
+@app.post("/api/reverse-geocode")
+async def reverse_geocode_location(request: ReverseGeocodeRequest):
+    """逆地理编码服务 - 优先使用高德地图，备用Google Maps"""
+    result, cached = await geocoding_service.cached_reverse_geocode(request.lat, request.lng)
+    if result is None:
+        return {"success": False, "message": f"无法解析坐标: ({request.lat}, {request.lng})"}
+    return {"success": True, "data": result["data"], "provider": result["provider"], "cached": cached}
+
+class GeocodeBatchRequest(BaseModel):
+    queries: List[str] = []
+    coordinates: List[ReverseGeocodeRequest] = []
+    concurrency: int = 8
+
+@app.post("/api/geocode/batch")
+async def geocode_batch(request: GeocodeBatchRequest):
+    """
+    批量地理编码/逆地理编码
+    
+    相同查询只解析一次，缓存命中的条目立即返回，其余条目以有限并发请求上游；
+    以NDJSON格式按完成顺序流式返回，每行一条结果，index对应输入列表中的位置
+    """
+    total = len(request.queries) + len(request.coordinates)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="queries和coordinates不能同时为空")
+    if total > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"单次批量请求最多 {MAX_BATCH_SIZE} 条")
+    
+    async def stream():
+        async for item in geocoding_service.batch(
+            request.queries,
+            [(c.lat, c.lng) for c in request.coordinates],
+            concurrency=request.concurrency
+        ):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/api/place-details")
 async def get_place_details(request: PlaceDetailsRequest):
     """获取地点详细信息"""
     try:
-        # 从本地数据库查找匹配的景点
-        for attraction in local_attractions_db.attractions:
-            # 计算距离，如果很近就认为是同一个地点
-            distance = local_attractions_db.calculate_distance(
-                request.lat, request.lng,
-                attraction['latitude'], attraction['longitude']
-            )
-            
-            if distance < 1000:  # 1公里内认为是同一地点
-                return {
-                    "success": True,
-                    "data": {
-                        "name": attraction['name'],
-                        "formatted_address": attraction.get('address', f"{attraction['city']}{attraction['name']}"),
-                        "photos": [{"photo_reference": attraction.get('image', '')}] if attraction.get('image') else [],
-                        "rating": 4.5,
-                        "user_ratings_total": 1000,
-                        "opening_hours": {"weekday_text": [attraction.get('opening_hours', '详询景点')]},
-                        "geometry": {
-                            "location": {
-                                "lat": attraction['latitude'],
-                                "lng": attraction['longitude']
-                            }
+        # 从本地数据库查找最近的景点，1公里内认为是同一地点
+        nearest = geo_index.query_nearest(
+            request.lat, request.lng, k=1,
+            sources=[local_attractions_db.INDEX_SOURCE], max_radius_km=1.0
+        )
+        if nearest:
+            attraction = nearest[0][0]
+            return {
+                "success": True,
+                "data": {
+                    "name": attraction['name'],
+                    "formatted_address": attraction.get('address', f"{attraction['city']}{attraction['name']}"),
+                    "photos": [{"photo_reference": attraction.get('image', '')}] if attraction.get('image') else [],
+                    "rating": 4.5,
+                    "user_ratings_total": 1000,
+                    "opening_hours": {"weekday_text": [attraction.get('opening_hours', '详询景点')]},
+                    "geometry": {
+                        "location": {
+                            "lat": attraction['latitude'],
+                            "lng": attraction['longitude']
                         }
-                    },
-                    "message": f"找到地点详情: {attraction['name']}"
-                }
+                    }
+                },
+                "message": f"找到地点详情: {attraction['name']}"
+            }
         
         # 如果本地没找到，返回基本信息
         return {
@@ -1282,7 +1255,8 @@ async def get_city_attractions(city_key: str):
             country = city_to_country[city_key]
             if country == "罗马":  # 特殊处理意大利
                 # 尝试按城市查询
-                attractions_result = supabase_client.client.table('spot_attractions')\
+                client = await async_supabase_client.get_client()
+                attractions_result = await client.table('spot_attractions')\
                     .select('*')\
                     .eq('city', '罗马')\
                     .execute()
@@ -1449,7 +1423,8 @@ async def generate_attraction_photo(
     ticket_price: Optional[str] = Form(None),
     latitude: Optional[str] = Form(None),
     longitude: Optional[str] = Form(None),
-    custom_prompt: Optional[str] = Form(None)
+    custom_prompt: Optional[str] = Form(None),
+    include_base64: bool = Form(False)
 ):
     """
     生成景点合影照片
@@ -1466,6 +1441,7 @@ async def generate_attraction_photo(
         latitude: 纬度（可选）
         longitude: 经度（可选）
         custom_prompt: 自定义提示词（可选）
+        include_base64: 是否在响应中内联base64图片（默认只返回图片地址）
         
     Returns:
         生成的合影照片信息
@@ -1473,10 +1449,6 @@ async def generate_attraction_photo(
     try:
         logger.info(f"收到景点合影生成请求: {attraction_name}")
         
-        # 验证文件类型
-        if not user_photo.content_type.startswith("image/"):
-            raise HTTPException(status_code=400, detail="请上传有效的图片文件")
-        
         # 转换坐标参数
         lat_float = None
         lng_float = None
@@ -1491,31 +1463,39 @@ async def generate_attraction_photo(
             except ValueError:
                 pass
         
-        # 调用Gemini服务生成合影
-        success, message, result = await gemini_service.generate_attraction_photo(
-            user_photo=user_photo,
-            attraction_name=attraction_name,
-            style_photo=style_photo,
-            location=location,
-            category=category,
-            description=description,
-            opening_hours=opening_hours,
-            ticket_price=ticket_price,
-            latitude=lat_float,
-            longitude=lng_float,
-            custom_prompt=custom_prompt
-        )
+        # 调用Gemini服务生成合影（上传图片按块落盘并校验大小和文件类型）
+        async with generation_pool.slot():
+            with ExitStack() as spooled:
+                user_upload = spooled.enter_context(await spool_upload(user_photo, label="用户照片"))
+                style_upload = spooled.enter_context(await spool_upload(style_photo, label="范例图片")) if style_photo else None
+                success, message, result = await gemini_service.generate_attraction_photo(
+                    user_photo=user_upload,
+                    attraction_name=attraction_name,
+                    style_photo=style_upload,
+                    location=location,
+                    category=category,
+                    description=description,
+                    opening_hours=opening_hours,
+                    ticket_price=ticket_price,
+                    latitude=lat_float,
+                    longitude=lng_float,
+                    custom_prompt=custom_prompt,
+                    include_base64=include_base64
+                )
         
         if success and result:
+            data = {
+                "image_url": result["image_url"],
+                "filename": result["filename"],
+                "attraction": result["attraction"],
+                "prompt": result["prompt"]
+            }
+            if "base64" in result:
+                data["base64"] = result["base64"]
             return {
                 "success": True,
                 "message": message,
-                "data": {
-                    "image_url": result["base64"],  # 返回base64编码的图片
-                    "filename": result["filename"],
-                    "attraction": result["attraction"],
-                    "prompt": result["prompt"]
-                }
+                "data": data
             }
         else:
             # 如果result包含错误详情，返回详细信息而不是抛出异常
@@ -1534,27 +1514,87 @@ async def generate_attraction_photo(
         logger.error(f"生成景点合影时出错: {e}")
         raise HTTPException(status_code=500, detail=f"生成景点合影失败: {str(e)}")
 
+@app.get("/api/generation/status")
+async def generation_status():
+    """获取AI生成任务池状态"""
+    return generation_pool.status()
+
+@app.get("/api/generation/cache/stats")
+async def generation_cache_stats():
+    """获取AI生成结果缓存统计信息"""
+    return generation_cache.stats()
+
+@app.get("/api/image-pipeline/stats")
+async def image_pipeline_stats():
+    """获取上传图片预处理流水线统计信息"""
+    return image_pipeline.stats()
+
+@app.get("/api/vector-db/pool/stats")
+async def vector_db_pool_stats():
+    """获取向量数据库连接池状态"""
+    return get_vector_database().pool_stats()
+
+@app.get("/api/vector-db/local-index/stats")
+async def local_vector_index_stats():
+    """获取本地向量索引统计信息"""
+    return local_vector_index.stats()
+
+@app.post("/api/vector-db/local-index/sync")
+async def sync_local_vector_index(full: bool = False):
+    """立即同步本地向量索引（管理员功能）"""
+    try:
+        return await local_vector_index.sync(get_vector_database().fetch_embedding_rows, full=full)
+    except Exception as e:
+        logger.error(f"本地向量索引同步失败: {e}")
+        raise HTTPException(status_code=500, detail=f"同步失败: {str(e)}")
+
+@app.get("/api/vector-db/embedding-cache/stats")
+async def embedding_cache_stats():
+    """获取查询向量缓存统计信息"""
+    return embedding_cache.stats()
+
+@app.get("/api/doro/assets/stats")
+async def doro_asset_stats():
+    """获取Doro素材缓存统计信息"""
+    return doro_assets.stats()
+
 @app.get("/api/generated-images")
-async def get_generated_images(limit: int = 10):
+async def get_generated_images(
+    limit: int = 10,
+    before: Optional[str] = None,
+    kind: Optional[str] = None,
+    attraction: Optional[str] = None
+):
     """
     获取最近生成的合影照片列表
     
     Args:
-        limit: 返回的图片数量限制
+        limit: 返回的图片数量限制（最多100）
+        before: 分页游标，传入上一页返回的next_cursor（"创建时间|文件名"）
+        kind: 按类型过滤（attraction_photo / doro_selfie / doro_video）
+        attraction: 按景点名称过滤
         
     Returns:
         生成的图片列表
     """
     try:
-        images = gemini_service.get_generated_images(limit=limit)
+        page = gemini_service.get_generated_images(limit=limit, before=before, kind=kind, attraction=attraction)
         return {
             "success": True,
-            "data": images
+            "data": page["items"],
+            "next_cursor": page["next_cursor"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取生成的图片列表时出错: {e}")
         raise HTTPException(status_code=500, detail=f"获取图片列表失败: {str(e)}")
 
+@app.get("/api/generated-images/stats")
+async def generated_images_stats():
+    """获取生成文件清单统计信息"""
+    return generated_manifest.stats()
+
 # ================== Doro合影相关端点 ==================
 
 @app.get("/api/doro/list")
@@ -1600,6 +1640,7 @@ async def get_random_doro():
 
 @app.post("/api/doro/upload")
 async def upload_custom_doro(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     name: Optional[str] = Form(None),
     description: Optional[str] = Form(None)
@@ -1617,6 +1658,10 @@ async def upload_custom_doro(
     """
     try:
         doro_info = await doro_service.save_custom_doro(file, name, description)
+        
+        # 响应返回后预先生成缩略图，选择器首次加载时不必等待生成
+        doro_id = f"custom_{doro_info['id']}"
+        background_tasks.add_task(doro_thumbnails.warm, doro_id, doro_service.get_doro_by_id(doro_id))
         return {
             "success": True,
             "data": doro_info
@@ -1653,32 +1698,49 @@ async def get_doro_image(doro_id: str):
         logger.error(f"获取Doro图片失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取图片失败: {str(e)}")
 
-@app.get("/api/doro/thumbnail/{doro_id}")
-async def get_doro_thumbnail(doro_id: str):
+@app.api_route("/api/doro/thumbnail/{doro_id}", methods=["GET", "HEAD"])
+async def get_doro_thumbnail(
+    request: Request,
+    doro_id: str,
+    size: int = DEFAULT_THUMBNAIL_SIZE,
+    format: Optional[str] = None,
+    v: Optional[str] = None
+):
     """
     获取Doro缩略图
     
     Args:
         doro_id: Doro的ID
+        size: 缩略图尺寸（128/256/512）
+        format: 缩略图格式（avif/webp/png），默认按Accept请求头协商
+        v: 源图片版本号（列表接口返回的地址中包含），与当前版本一致时按immutable缓存
         
     Returns:
         缩略图文件
     """
+    image_path = doro_service.get_doro_by_id(doro_id)
+    if not image_path:
+        raise HTTPException(status_code=404, detail="Doro图片不存在")
+    
     try:
-        # 暂时返回原图，后续可以实现真正的缩略图生成
-        image_path = doro_service.get_doro_by_id(doro_id)
-        if not image_path:
-            raise HTTPException(status_code=404, detail="Doro图片不存在")
-        
-        return FileResponse(
-            path=str(image_path),
-            media_type="image/png"
-        )
-    except HTTPException:
-        raise
+        fmt = doro_thumbnails.negotiate(format, request.headers.get("accept"))
+        thumbnail_path, media_type, etag = await doro_thumbnails.get(doro_id, image_path, size, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取Doro缩略图失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取缩略图失败: {str(e)}")
+    
+    # 带版本号的地址内容不会变化；不带版本号时需要重新验证，源图片替换后能及时更新
+    versioned = v is not None and v == source_version(image_path)
+    return stream_file(
+        request,
+        str(thumbnail_path),
+        media_type=media_type,
+        cache_control=IMMUTABLE_CACHE_CONTROL if versioned else "public, max-age=0, must-revalidate",
+        etag=etag,
+        headers=None if format else {"Vary": "Accept"}
+    )
 
 @app.post("/api/doro/generate")
 async def generate_doro_selfie(
@@ -1694,7 +1756,8 @@ async def generate_doro_selfie(
     time_of_day: Optional[str] = Form(None),
     weather: Optional[str] = Form(None),
     season: Optional[str] = Form(None),
-    mood: Optional[str] = Form(None)
+    mood: Optional[str] = Form(None),
+    include_base64: bool = Form(False)
 ):
     """
     生成Doro合影
@@ -1713,6 +1776,7 @@ async def generate_doro_selfie(
         weather: 天气
         season: 季节
         mood: 情绪氛围
+        include_base64: 是否在响应中内联base64图片（默认只返回图片地址）
         
     Returns:
         生成的合影信息
@@ -1723,23 +1787,10 @@ async def generate_doro_selfie(
             # 使用上传的Doro图片
             doro_photo = doro_image
         elif doro_id:
-            # 使用预设或已保存的Doro
-            doro_path = doro_service.get_doro_by_id(doro_id)
-            if not doro_path:
+            # 使用预设或已保存的Doro（内存中缓存的预处理结果）
+            doro_photo = await doro_assets.get(doro_id)
+            if not doro_photo:
                 raise HTTPException(status_code=404, detail="指定的Doro不存在")
-            
-            # 创建临时文件对象
-            with open(doro_path, 'rb') as f:
-                doro_content = f.read()
-            
-            # 创建UploadFile对象 - 修复BytesIO指针问题
-            import io
-            doro_file = io.BytesIO(doro_content)
-            doro_file.seek(0)  # 确保指针在开始位置
-            doro_photo = UploadFile(
-                filename=doro_path.name,
-                file=doro_file
-            )
         else:
             raise HTTPException(status_code=400, detail="必须提供Doro图片或Doro ID")
         
@@ -1756,13 +1807,20 @@ async def generate_doro_selfie(
             "mood": mood
         }
         
-        # 调用Gemini服务生成合影
-        success, message, result = await gemini_service.generate_doro_selfie_with_attraction(
-            user_photo=user_photo,
-            doro_photo=doro_photo,
-            style_photo=style_photo,
-            attraction_info=attraction_info
-        )
+        # 调用Gemini服务生成合影（上传图片按块落盘并校验大小和文件类型）
+        async with generation_pool.slot():
+            with ExitStack() as spooled:
+                user_upload = spooled.enter_context(await spool_upload(user_photo, label="用户照片"))
+                if doro_image:
+                    doro_photo = spooled.enter_context(await spool_upload(doro_image, label="Doro图片"))
+                style_upload = spooled.enter_context(await spool_upload(style_photo, label="风格图片")) if style_photo else None
+                success, message, result = await gemini_service.generate_doro_selfie_with_attraction(
+                    user_photo=user_upload,
+                    doro_photo=doro_photo,
+                    style_photo=style_upload,
+                    attraction_info=attraction_info,
+                    include_base64=include_base64
+                )
         
         if success:
             return {
@@ -1797,32 +1855,25 @@ async def generate_doro_video(
     mood: Optional[str] = Form(None)
 ):
     """
-    生成Doro合影视频
+    提交Doro合影视频生成任务
     
-    使用Imagen生成静态合影图片，然后用Veo 3生成动态视频
+    先生成静态合影图片，再用Veo 3生成动态视频；接口立即返回任务ID，
+    客户端通过 /api/doro/jobs/{job_id} 查询进度和最终的视频地址
     """
+    spooled = ExitStack()
     try:
-        # 获取Doro图片
-        if doro_image:
-            doro_photo = doro_image
-        elif doro_id:
-            doro_path = doro_service.get_doro_by_id(doro_id)
-            if not doro_path:
-                raise HTTPException(status_code=404, detail="指定的Doro不存在")
-            
-            # 创建UploadFile对象
-            with open(doro_path, 'rb') as f:
-                doro_content = f.read()
-            
-            import io
-            doro_file = io.BytesIO(doro_content)
-            doro_file.seek(0)
-            doro_photo = UploadFile(
-                filename=doro_path.name,
-                file=doro_file
-            )
-        else:
+        if not doro_image and not doro_id:
             raise HTTPException(status_code=400, detail="必须提供Doro图片或Doro ID")
+        # 预设或已保存的Doro只记录ID，任务执行时从内存素材缓存读取
+        if not doro_image and not doro_service.get_doro_by_id(doro_id):
+            raise HTTPException(status_code=404, detail="指定的Doro不存在")
+        
+        # 上传图片按块落盘并校验，提交任务时移动到任务目录
+        inputs = {"user_photo": spooled.enter_context(await spool_upload(user_photo, label="用户照片"))}
+        if doro_image:
+            inputs["doro_photo"] = spooled.enter_context(await spool_upload(doro_image, label="Doro图片"))
+        if style_photo:
+            inputs["style_photo"] = spooled.enter_context(await spool_upload(style_photo, label="风格图片"))
         
         # 准备景点信息
         attraction_info = {
@@ -1837,28 +1888,62 @@ async def generate_doro_video(
             "mood": mood
         }
         
-        # 调用Gemini服务生成视频
-        success, message, result = await gemini_service.generate_doro_video_with_attraction(
-            user_photo=user_photo,
-            doro_photo=doro_photo,
-            style_photo=style_photo,
-            attraction_info=attraction_info
-        )
+        # 提交后台任务（生成任务池已满时返回429）
+        job = await video_job_manager.submit(inputs, attraction_info, doro_id=None if doro_image else doro_id)
         
-        if success:
-            return {
-                "success": True,
-                "message": message,
-                "data": result
-            }
-        else:
-            raise HTTPException(status_code=500, detail=message)
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "message": "视频生成任务已提交",
+            "data": job
+        })
             
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"生成Doro合影视频失败: {e}")
-        raise HTTPException(status_code=500, detail=f"生成Doro合影视频失败: {str(e)}")
+        logger.error(f"提交Doro合影视频任务失败: {e}")
+        raise HTTPException(status_code=500, detail=f"提交Doro合影视频任务失败: {str(e)}")
+    finally:
+        spooled.close()
+
+
+@app.get("/api/doro/jobs/{job_id}")
+async def get_doro_video_job(job_id: str, include_base64: bool = False):
+    """
+    查询Doro合影视频任务状态
+    
+    Args:
+        job_id: 提交任务时返回的任务ID
+        include_base64: 任务完成时是否在响应中内联base64视频（默认只返回视频地址）
+        
+    Returns:
+        任务状态；status为succeeded时包含video_url
+    """
+    job = video_job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    if include_base64 and job["status"] == "succeeded":
+        filepath = os.path.join(gemini_service.output_dir, job["filename"])
+        job["base64"] = await asyncio.to_thread(encode_data_url, filepath, "video/mp4")
+    
+    return {
+        "success": True,
+        "data": job
+    }
+
+
+@app.api_route(GENERATED_MEDIA_ROUTE + "/{filename}", methods=["GET", "HEAD"])
+async def get_generated_media(filename: str, request: Request):
+    """
+    获取生成的合影图片或视频（流式响应，支持Range、ETag和长期缓存）
+    
+    Args:
+        filename: 生成文件名
+    """
+    if ".." in filename or "/" in filename or "\\" in filename:
+        raise HTTPException(status_code=400, detail="无效的文件名")
+    
+    return stream_file(request, os.path.join(gemini_service.output_dir, filename))
 
 
 @app.delete("/api/doro/{doro_id}")
@@ -1878,6 +1963,7 @@ async def delete_custom_doro(doro_id: str):
         
         success = doro_service.delete_custom_doro(doro_id)
         if success:
+            doro_thumbnails.remove(doro_id)
             return {
                 "success": True,
                 "message": "Doro删除成功"
@@ -2124,16 +2210,14 @@ async def explore_direction_supabase(request: ExploreRequest):
         
         # 计算目标距离点的坐标
         target_distance = request.segment_distance
-        target_point = geod.Direct(
-            request.latitude, 
-            request.longitude, 
-            request.heading, 
-            target_distance * 1000  # 转换为米
+        target_lat, target_lon = route_engine.destination(
+            request.latitude,
+            request.longitude,
+            request.heading,
+            target_distance,
+            exact=request.exact
         )
         
-        target_lat = target_point['lat2']
-        target_lon = target_point['lon2']
-        
         # 使用新的Supabase API获取附近景点
         attractions_data = await spot_api_service.get_nearby_attractions(
             target_lat, target_lon, radius_km=50
@@ -2306,12 +2390,16 @@ async def vector_similarity_search(
     longitude: Optional[float] = None,
     radius_km: float = 50,
     limit: int = 10,
-    threshold: float = 0.7
+    threshold: float = 0.7,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    similarity_weight: Optional[float] = None
 ):
     """
     向量相似度搜索景点
     
-    使用语义搜索找到与查询最相关的景点
+    使用语义搜索找到与查询最相关的景点；probes/ef_search调整向量索引的精度与速度；
+    指定位置时在半径范围内检索，similarity_weight为综合排序中相似度的权重（其余为距离）
     """
     try:
         logger.info(f"向量搜索请求: {query}")
@@ -2325,13 +2413,18 @@ async def vector_similarity_search(
                 query=query,
                 location=(latitude, longitude),
                 radius_km=radius_km,
-                limit=limit
+                limit=limit,
+                similarity_weight=similarity_weight,
+                probes=probes,
+                ef_search=ef_search
             )
         else:
             results = await vector_db.similarity_search(
                 query=query,
                 limit=limit,
-                threshold=threshold
+                threshold=threshold,
+                probes=probes,
+                ef_search=ef_search
             )
         
         return {
@@ -2379,6 +2472,57 @@ async def batch_process_attraction_vectors(batch_size: int = 10):
             "error": f"批量处理失败: {str(e)}"
         }
 
+@app.post("/api/vector-db/index")
+async def create_vector_index(
+    index_type: str = "hnsw",
+    lists: int = 100,
+    m: int = 16,
+    ef_construction: int = 64
+):
+    """
+    创建或重建向量索引（管理员功能）
+    
+    index_type为ivfflat时使用lists，为hnsw时使用m和ef_construction
+    """
+    try:
+        return await get_vector_database().create_vector_index(
+            index_type=index_type, lists=lists, m=m, ef_construction=ef_construction
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"创建向量索引失败: {e}")
+        raise HTTPException(status_code=500, detail=f"创建向量索引失败: {str(e)}")
+
+@app.get("/api/vector-db/benchmark")
+async def benchmark_vector_index(
+    k: int = 10,
+    samples: int = 50,
+    language_code: str = "zh-CN",
+    probes: str = "1,5,10,20",
+    ef_search: str = "40,100,200"
+):
+    """
+    向量索引召回率基准测试（管理员功能）
+    
+    对每个probes/ef_search取值报告相对精确搜索的recall@k和平均耗时，参数用逗号分隔
+    """
+    try:
+        return await get_vector_database().benchmark_recall(
+            k=k,
+            samples=samples,
+            language_code=language_code,
+            probes=[int(p) for p in probes.split(",") if p.strip()],
+            ef_search=[int(e) for e in ef_search.split(",") if e.strip()]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"向量索引基准测试失败: {e}")
+        raise HTTPException(status_code=500, detail=f"基准测试失败: {str(e)}")
+
 # ================== 相册管理端点 ==================
 
 class SaveAlbumRequest(BaseModel):
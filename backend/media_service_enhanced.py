@@ -9,7 +9,6 @@ import os
 import json
 import logging
 import asyncio
-import aiohttp
 import hashlib
 from typing import List, Dict, Optional, Tuple, Any
 from datetime import datetime
@@ -19,6 +18,8 @@ import io
 import base64
 from dotenv import load_dotenv
 
+from http_client import http_clients
+
 # 加载环境变量
 load_dotenv()
 
@@ -72,26 +73,26 @@ class ImageSearchService:
                 "orientation": "landscape"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        images = []
-                        
-                        for photo in data.get("results", []):
-                            image_info = {
-                                "url": photo["urls"]["regular"],
-                                "thumbnail": photo["urls"]["small"],
-                                "description": photo.get("alt_description", query),
-                                "photographer": photo["user"]["name"],
-                                "source": "Unsplash",
-                                "width": photo["width"],
-                                "height": photo["height"],
-                                "quality": "high"
-                            }
-                            images.append(image_info)
-                        
-                        return images
+            session = http_clients.get("image_search")
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    images = []
+                    
+                    for photo in data.get("results", []):
+                        image_info = {
+                            "url": photo["urls"]["regular"],
+                            "thumbnail": photo["urls"]["small"],
+                            "description": photo.get("alt_description", query),
+                            "photographer": photo["user"]["name"],
+                            "source": "Unsplash",
+                            "width": photo["width"],
+                            "height": photo["height"],
+                            "quality": "high"
+                        }
+                        images.append(image_info)
+                    
+                    return images
             
             return []
             
@@ -112,26 +113,26 @@ class ImageSearchService:
                 "orientation": "landscape"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        images = []
-                        
-                        for photo in data.get("photos", []):
-                            image_info = {
-                                "url": photo["src"]["large"],
-                                "thumbnail": photo["src"]["medium"],
-                                "description": photo.get("alt", query),
-                                "photographer": photo["photographer"],
-                                "source": "Pexels",
-                                "width": photo["width"],
-                                "height": photo["height"],
-                                "quality": "high"
-                            }
-                            images.append(image_info)
-                        
-                        return images
+            session = http_clients.get("image_search")
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    images = []
+                    
+                    for photo in data.get("photos", []):
+                        image_info = {
+                            "url": photo["src"]["large"],
+                            "thumbnail": photo["src"]["medium"],
+                            "description": photo.get("alt", query),
+                            "photographer": photo["photographer"],
+                            "source": "Pexels",
+                            "width": photo["width"],
+                            "height": photo["height"],
+                            "quality": "high"
+                        }
+                        images.append(image_info)
+                    
+                    return images
             
             return []
             
@@ -288,21 +289,21 @@ class CloudStorageService:
     async def download_and_store_image(self, image_url: str, filename: str = None) -> Optional[str]:
         """下载并存储图片"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    if response.status == 200:
-                        image_data = await response.read()
-                        
-                        # 生成文件名
-                        if not filename:
-                            filename = f"image_{hashlib.md5(image_url.encode()).hexdigest()[:8]}.jpg"
-                        
-                        # 优化图片
-                        optimized_data = await self._optimize_image(image_data)
-                        
-                        # 上传到存储
-                        stored_url = await self.upload_media(optimized_data, filename, "image/jpeg")
-                        return stored_url
+            session = http_clients.get("media")
+            async with session.get(image_url) as response:
+                if response.status == 200:
+                    image_data = await response.read()
+                    
+                    # 生成文件名
+                    if not filename:
+                        filename = f"image_{hashlib.md5(image_url.encode()).hexdigest()[:8]}.jpg"
+                    
+                    # 优化图片
+                    optimized_data = await self._optimize_image(image_data)
+                    
+                    # 上传到存储
+                    stored_url = await self.upload_media(optimized_data, filename, "image/jpeg")
+                    return stored_url
             
             return None
             
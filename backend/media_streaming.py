@@ -0,0 +1,155 @@
+"""
+生成媒体文件的流式响应
+按块读取文件返回，支持Range分段请求（视频拖动播放）、ETag条件请求和长期缓存；
+生成的文件名带时间戳且内容不再变化，可以按immutable缓存
+"""
+
+import os
+import base64
+import mimetypes
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+CHUNK_SIZE = 256 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+GENERATED_MEDIA_ROUTE = "/api/generated"
+
+
+def generated_media_url(filename: str) -> str:
+    """生成文件对应的访问地址"""
+    return f"{GENERATED_MEDIA_ROUTE}/{quote(filename)}"
+
+
+def encode_data_url(path: str, media_type: Optional[str] = None) -> str:
+    """读取文件并编码为data URL（仅在客户端显式要求内联base64时使用）"""
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    with open(path, "rb") as f:
+        return f"data:{media_type};base64,{base64.b64encode(f.read()).decode()}"
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """由文件大小和修改时间构造强ETag"""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段Range请求头
+
+    Args:
+        header: Range请求头，如 "bytes=0-1023"、"bytes=1024-"、"bytes=-500"
+        size: 文件大小
+
+    Returns:
+        (起始字节, 结束字节)（包含两端）；格式无法识别或包含多段时返回None（按完整文件响应）
+
+    Raises:
+        HTTPException: 范围超出文件大小时返回416
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_text, sep, end_text = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # 后缀形式：最后N个字节
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError
+            start = max(size - length, 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="请求的范围无效",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+
+def iter_file(path: str, start: int, length: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """按块读取文件的指定区间"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def stream_file(request: Request, path: str, media_type: Optional[str] = None,
+                cache_control: str = IMMUTABLE_CACHE_CONTROL, etag: Optional[str] = None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    以流式响应返回文件
+
+    Args:
+        request: 当前请求（读取Range、If-None-Match、If-Range请求头）
+        path: 文件路径
+        media_type: MIME类型，默认根据扩展名推断
+        cache_control: Cache-Control响应头
+        etag: 强ETag，默认由文件大小和修改时间构造
+        headers: 额外的响应头（如Vary）
+
+    Returns:
+        200完整响应、206分段响应、304未修改响应，HEAD请求只返回响应头
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    etag = etag or file_etag(stat)
+    headers = {
+        **(headers or {}),
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes"
+    }
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+
+    size = stat.st_size
+    start, end = 0, size - 1
+    status_code = 200
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and size > 0 and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1 if size else 0
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    return StreamingResponse(
+        iter_file(path, start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
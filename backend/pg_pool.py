@@ -0,0 +1,239 @@
+"""
+PostgreSQL异步连接池
+基于asyncpg的连接池，查询不再阻塞事件循环，并发请求使用各自的连接；
+连接初始化时注册pgvector类型，后台定期做健康检查，连接失效时自动重建
+"""
+
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+logger = logging.getLogger(__name__)
+
+VECTOR_SCHEMAS = ("public", "extensions")
+
+# 连接断开类错误：丢弃连接后重试一次
+RETRYABLE_ERRORS = (
+    asyncpg.exceptions.ConnectionDoesNotExistError,
+    asyncpg.exceptions.InterfaceError,
+    asyncpg.exceptions.CannotConnectNowError,
+    ConnectionError,
+    OSError
+)
+
+
+class PostgresPool:
+    """带健康检查和指标的asyncpg连接池"""
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10, command_timeout: float = 30,
+                 statement_cache_size: int = 100, health_interval: float = 30, retry_backoff: float = 30):
+        """
+        初始化连接池配置（首次使用时才建立连接）
+
+        Args:
+            dsn: 数据库连接URL
+            min_size: 最少保持的连接数
+            max_size: 最多连接数
+            command_timeout: 单条语句超时（秒）
+            statement_cache_size: 每个连接缓存的预备语句数；经过PgBouncer事务模式连接时需设为0
+            health_interval: 健康检查间隔（秒）
+            retry_backoff: 建池失败后再次尝试前的等待时间（秒）
+        """
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.command_timeout = command_timeout
+        self.statement_cache_size = statement_cache_size
+        self.health_interval = health_interval
+        self.retry_backoff = retry_backoff
+
+        self._pool: Optional[asyncpg.Pool] = None
+        self._create_lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._failed_at = 0.0
+
+        self.healthy: Optional[bool] = None
+        self.last_health_check: Optional[float] = None
+        self.counters = {"queries": 0, "errors": 0, "retries": 0, "reconnects": 0, "health_failures": 0}
+        self._query_time = 0.0
+
+    # ==================== 对外接口 ====================
+
+    async def get_pool(self) -> asyncpg.Pool:
+        """
+        获取连接池，首次调用时创建
+
+        Raises:
+            ConnectionError: 建池失败，或最近一次建池失败后仍在退避期内
+        """
+        if self._pool is not None:
+            return self._pool
+
+        if self._create_lock is None:
+            self._create_lock = asyncio.Lock()
+        async with self._create_lock:
+            if self._pool is not None:
+                return self._pool
+            if self._failed_at and time.monotonic() - self._failed_at < self.retry_backoff:
+                raise ConnectionError("PostgreSQL连接池不可用，稍后重试")
+
+            try:
+                self._pool = await asyncpg.create_pool(
+                    self.dsn,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    command_timeout=self.command_timeout,
+                    statement_cache_size=self.statement_cache_size,
+                    max_inactive_connection_lifetime=300,
+                    init=self._init_connection
+                )
+            except Exception as e:
+                # 建池失败（网络、认证或连接初始化错误）统一视为连接不可用，调用方据此走降级路径
+                self._failed_at = time.monotonic()
+                self.healthy = False
+                raise ConnectionError(f"创建PostgreSQL连接池失败: {e}") from e
+
+            self._failed_at = 0.0
+            self.healthy = True
+            self._health_task = asyncio.create_task(self._health_loop())
+            logger.info(f"PostgreSQL连接池已创建: min={self.min_size}, max={self.max_size}")
+            return self._pool
+
+    @asynccontextmanager
+    async def acquire(self):
+        """从连接池借出一个连接"""
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            yield conn
+
+    async def fetch(self, query: str, *args, settings: Optional[Dict[str, Any]] = None) -> List[asyncpg.Record]:
+        """
+        执行查询并返回全部行
+
+        Args:
+            query: SQL
+            settings: 只对本次查询生效的参数（如ivfflat.probes），在事务内用set_config设置
+        """
+        return await self._run("fetch", query, *args, settings=settings)
+
+    async def fetchval(self, query: str, *args, settings: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._run("fetchval", query, *args, settings=settings)
+
+    async def execute(self, query: str, *args) -> str:
+        return await self._run("execute", query, *args)
+
+    def expire_connections(self):
+        """让现有连接在下次借出前重建（如创建扩展后需要重新注册类型）"""
+        if self._pool is not None:
+            self._pool.expire_connections()
+
+    async def health_check(self) -> bool:
+        """执行一次健康检查，失败时让连接池丢弃现有连接"""
+        self.last_health_check = time.time()
+        try:
+            pool = await self.get_pool()
+            async with pool.acquire(timeout=5) as conn:
+                await conn.fetchval("SELECT 1", timeout=5)
+            self.healthy = True
+        except Exception as e:
+            self.healthy = False
+            self.counters["health_failures"] += 1
+            logger.warning(f"PostgreSQL健康检查失败: {e}")
+            if self._pool is not None:
+                self._pool.expire_connections()
+        return self.healthy
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接池指标"""
+        queries = self.counters["queries"]
+        pool = self._pool
+        return {
+            "created": pool is not None,
+            "healthy": self.healthy,
+            "last_health_check": self.last_health_check,
+            "size": pool.get_size() if pool else 0,
+            "idle": pool.get_idle_size() if pool else 0,
+            "in_use": pool.get_size() - pool.get_idle_size() if pool else 0,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "avg_query_ms": round(self._query_time / queries * 1000, 2) if queries else 0.0,
+            **self.counters
+        }
+
+    async def close(self):
+        """关闭连接池"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    # ==================== 内部方法 ====================
+
+    @staticmethod
+    async def _init_connection(conn: asyncpg.Connection):
+        # vector类型与Python列表/numpy数组之间的二进制编解码；
+        # Supabase把扩展安装在extensions模式下，扩展尚未创建时跳过（建表后调用expire_connections重新初始化）
+        for schema in VECTOR_SCHEMAS:
+            try:
+                await register_vector(conn, schema=schema)
+                return
+            except ValueError:
+                continue
+        logger.warning("数据库中没有vector类型，未注册pgvector编解码")
+
+    async def _run(self, method: str, query: str, *args, settings: Optional[Dict[str, Any]] = None) -> Any:
+        # 相同的SQL文本在每个连接上只解析和规划一次（asyncpg按连接缓存预备语句）
+        for attempt in (1, 2):
+            started = time.perf_counter()
+            try:
+                async with self.acquire() as conn:
+                    if settings:
+                        # set_config(..., true)等同于SET LOCAL，事务结束后恢复，不影响连接的下一个使用者
+                        async with conn.transaction():
+                            for name, value in settings.items():
+                                await conn.execute("SELECT set_config($1, $2, true)", name, str(value))
+                            result = await getattr(conn, method)(query, *args)
+                    else:
+                        result = await getattr(conn, method)(query, *args)
+                self.counters["queries"] += 1
+                self._query_time += time.perf_counter() - started
+                return result
+            except RETRYABLE_ERRORS as e:
+                if attempt == 2 or self._pool is None:
+                    self.counters["errors"] += 1
+                    raise
+                logger.warning(f"PostgreSQL连接已断开，重试: {e}")
+                self.counters["retries"] += 1
+                self.counters["reconnects"] += 1
+                self._pool.expire_connections()
+            except Exception:
+                self.counters["errors"] += 1
+                raise
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.health_check()
+
+
+def create_pool_from_env(dsn: Optional[str]) -> Optional[PostgresPool]:
+    """按环境变量配置创建连接池，未配置数据库URL时返回None"""
+    if not dsn:
+        return None
+    return PostgresPool(
+        dsn,
+        min_size=int(os.getenv("PG_POOL_MIN_SIZE", "1")),
+        max_size=int(os.getenv("PG_POOL_MAX_SIZE", "10")),
+        command_timeout=float(os.getenv("PG_COMMAND_TIMEOUT", "30")),
+        statement_cache_size=int(os.getenv("PG_STATEMENT_CACHE_SIZE", "100")),
+        health_interval=float(os.getenv("PG_HEALTH_INTERVAL", "30"))
+    )
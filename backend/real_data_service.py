@@ -10,6 +10,8 @@ from typing import List, Dict, Optional
 import json
 from local_attractions_db import local_attractions_db
 from amap_service import amap_service
+from geo_math import distance_km
+from http_client import http_clients
 import os
 from datetime import datetime
 
@@ -64,11 +66,11 @@ class RealDataService:
         """获取目标点周围的真实地点信息"""
         places = []
         
-        async with aiohttp.ClientSession() as session:
-            for point in points:
-                # 获取目标点周围5km内的多个景点
-                nearby_places = await self.get_nearby_attractions(session, point, time_mode, radius_km=5)
-                places.extend(nearby_places)
+        session = http_clients.get()
+        for point in points:
+            # 获取目标点周围5km内的多个景点
+            nearby_places = await self.get_nearby_attractions(session, point, time_mode, radius_km=5)
+            places.extend(nearby_places)
         
         self.save_cache()  # 保存缓存
         return places
@@ -179,8 +181,8 @@ class RealDataService:
         search_points = []
         # 在8个方向上生成搜索点
         for bearing in [0, 45, 90, 135, 180, 225, 270, 315]:
-            for distance_km in [1, 2.5, 4]:  # 不同距离
-                point = geod.Direct(center_lat, center_lon, bearing, distance_km * 1000)
+            for dist_km in [1, 2.5, 4]:  # 不同距离
+                point = geod.Direct(center_lat, center_lon, bearing, dist_km * 1000)
                 search_points.append({
                     'lat': point['lat2'],
                     'lon': point['lon2']
@@ -702,22 +704,7 @@ class RealDataService:
     
     def calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """计算两点间距离（米）"""
-        from math import radians, sin, cos, sqrt, atan2
-        
-        R = 6371000  # 地球半径（米）
-        
-        lat1_rad = radians(lat1)
-        lon1_rad = radians(lon1)
-        lat2_rad = radians(lat2)
-        lon2_rad = radians(lon2)
-        
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        a = sin(dlat/2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        
-        return R * c
+        return distance_km(lat1, lon1, lat2, lon2) * 1000
     
     async def get_place_description(self, session: aiohttp.ClientSession, place_name: str, time_mode: str) -> str:
         """获取地点描述"""
@@ -0,0 +1,142 @@
+"""
+大圆航线计算引擎
+对起点坐标、方位角和分段距离进行量化，沿航线的目标点一次性向量化计算后存入LRU缓存，
+客户端反复点击同一方向时直接返回缓存结果
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from geo_math import destination_points
+
+MAX_WAYPOINTS = 200  # 单条航线最多计算的航点数
+
+
+class RouteEngine:
+    """带缓存的大圆航线计算"""
+
+    def __init__(self, max_size: int = 4096, coord_precision: int = 5, heading_precision: int = 2,
+                 distance_precision: int = 3):
+        """
+        初始化航线引擎
+
+        Args:
+            max_size: LRU缓存最大条目数
+            coord_precision: 起点经纬度量化的小数位数（5位约1米）
+            heading_precision: 方位角量化的小数位数
+            distance_precision: 距离（公里）量化的小数位数
+        """
+        self.max_size = max_size
+        self.coord_precision = coord_precision
+        self.heading_precision = heading_precision
+        self.distance_precision = distance_precision
+
+        # 量化后的参数 -> (纬度数组, 经度数组)，数组只读
+        self._cache: "OrderedDict[Tuple, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    # ==================== 对外接口 ====================
+
+    def destination(self, lat: float, lon: float, heading: float, distance_km: float,
+                    exact: bool = False) -> Tuple[float, float]:
+        """
+        计算沿方位角前进指定距离后的目标点
+
+        Returns:
+            (纬度, 经度)
+        """
+        lats, lons = self._route(lat, lon, heading, distance_km, 1, False, exact)
+        return float(lats[0]), float(lons[0])
+
+    def waypoints(self, lat: float, lon: float, heading: float, segment_km: float, count: int,
+                  include_start: bool = True, exact: bool = False) -> List[Dict]:
+        """
+        计算沿方位角等距分布的航点
+
+        Args:
+            lat, lon: 起点坐标
+            heading: 初始方位角（度）
+            segment_km: 相邻航点间距（公里）
+            count: 航点数量，最多MAX_WAYPOINTS个
+            include_start: 第一个航点是否为起点（距离0），否则从segment_km开始
+            exact: 是否使用WGS84椭球精确模式
+
+        Returns:
+            航点列表，每个航点包含latitude、longitude和distance（公里）
+        """
+        count = max(0, min(int(count), MAX_WAYPOINTS))
+        if count == 0:
+            return []
+
+        lats, lons = self._route(lat, lon, heading, segment_km, count, include_start, exact)
+        segment_km = round(segment_km, self.distance_precision)
+        offset = 0 if include_start else 1
+        return [
+            {
+                'latitude': float(lats[i]),
+                'longitude': float(lons[i]),
+                'distance': (i + offset) * segment_km
+            }
+            for i in range(count)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "size": len(self._cache),
+            "max_size": self.max_size
+        }
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    # ==================== 内部方法 ====================
+
+    def _route(self, lat: float, lon: float, heading: float, segment_km: float, count: int,
+               include_start: bool, exact: bool) -> Tuple[np.ndarray, np.ndarray]:
+        key = (
+            round(lat, self.coord_precision),
+            round(lon, self.coord_precision),
+            round(heading % 360, self.heading_precision),
+            round(segment_km, self.distance_precision),
+            count,
+            include_start,
+            exact
+        )
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry
+
+        q_lat, q_lon, q_heading, q_segment = key[:4]
+        offset = 0 if include_start else 1
+        distances = (np.arange(count) + offset) * q_segment
+        lats, lons = destination_points(q_lat, q_lon, q_heading, distances, exact=exact)
+        lats.setflags(write=False)
+        lons.setflags(write=False)
+
+        with self._lock:
+            self.counters["misses"] += 1
+            self._cache[key] = (lats, lons)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.counters["evictions"] += 1
+        return lats, lons
+
+
+# 全局实例
+route_engine = RouteEngine(max_size=int(os.getenv("ROUTE_CACHE_MAX_SIZE", "4096")))
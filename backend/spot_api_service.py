@@ -4,7 +4,7 @@
 import logging
 from typing import List, Dict, Optional, Any
 from fastapi import HTTPException
-from supabase_client import supabase_client
+from supabase_client import async_supabase_client
 import asyncio
 
 logger = logging.getLogger(__name__)
@@ -14,7 +14,8 @@ class SpotAPIService:
     
     def __init__(self):
         """初始化API服务"""
-        self.supabase = supabase_client
+        # 使用异步客户端，数据库请求不阻塞事件循环
+        self.supabase = async_supabase_client
         logger.info("SpotAPIService初始化完成")
     
     async def health_check(self) -> Dict[str, Any]:
@@ -51,7 +52,7 @@ class SpotAPIService:
             
             logger.info(f"查询附近景点: ({latitude:.4f}, {longitude:.4f}), 半径: {radius_km}km")
             
-            attractions = self.supabase.get_attractions_near_location(
+            attractions = await self.supabase.get_attractions_near_location(
                 latitude, longitude, radius_km
             )
             
@@ -69,7 +70,7 @@ class SpotAPIService:
         """获取所有景点"""
         try:
             logger.info("获取所有景点")
-            attractions = self.supabase.get_all_attractions()
+            attractions = await self.supabase.get_all_attractions()
             logger.info(f"获取到 {len(attractions)} 个景点")
             return attractions
             
@@ -84,7 +85,7 @@ class SpotAPIService:
                 raise ValueError("类别不能为空")
             
             logger.info(f"根据类别获取景点: {category}")
-            attractions = self.supabase.get_attractions_by_category(category)
+            attractions = await self.supabase.get_attractions_by_category(category)
             logger.info(f"找到 {len(attractions)} 个 {category} 类景点")
             return attractions
             
@@ -102,7 +103,7 @@ class SpotAPIService:
                 raise ValueError("城市不能为空")
             
             logger.info(f"根据城市获取景点: {city}")
-            attractions = self.supabase.get_attractions_by_city(city)
+            attractions = await self.supabase.get_attractions_by_city(city)
             logger.info(f"找到 {len(attractions)} 个 {city} 的景点")
             return attractions
             
@@ -120,7 +121,7 @@ class SpotAPIService:
                 raise ValueError("国家不能为空")
             
             logger.info(f"根据国家获取景点: {country}")
-            attractions = self.supabase.get_attractions_by_country(country)
+            attractions = await self.supabase.get_attractions_by_country(country)
             logger.info(f"找到 {len(attractions)} 个 {country} 的景点")
             return attractions
             
@@ -139,7 +140,7 @@ class SpotAPIService:
             
             query = query.strip()
             logger.info(f"搜索景点: {query}")
-            attractions = self.supabase.search_attractions(query)
+            attractions = await self.supabase.search_attractions(query)
             logger.info(f"搜索到 {len(attractions)} 个相关景点")
             return attractions
             
@@ -164,7 +165,7 @@ class SpotAPIService:
                 raise ValueError("访问级别必须是 public 或 private")
             
             logger.info(f"创建相册: {title} (创建者: {creator_id})")
-            album = self.supabase.create_album(creator_id, title.strip(), description, access_level)
+            album = await self.supabase.create_album(creator_id, title.strip(), description, access_level)
             
             if album:
                 logger.info(f"相册创建成功: {album['id']}")
@@ -188,7 +189,7 @@ class SpotAPIService:
                 raise ValueError("偏移量不能为负数")
             
             logger.info(f"获取公开相册: limit={limit}, offset={offset}")
-            albums = self.supabase.get_public_albums(limit, offset)
+            albums = await self.supabase.get_public_albums(limit, offset)
             logger.info(f"获取到 {len(albums)} 个公开相册")
             return albums
             
@@ -206,7 +207,7 @@ class SpotAPIService:
                 raise ValueError("用户ID不能为空")
             
             logger.info(f"获取用户相册: {user_id}")
-            albums = self.supabase.get_user_albums(user_id)
+            albums = await self.supabase.get_user_albums(user_id)
             logger.info(f"用户 {user_id} 有 {len(albums)} 个相册")
             return albums
             
@@ -223,7 +224,7 @@ class SpotAPIService:
         """获取统计信息"""
         try:
             logger.info("获取系统统计信息")
-            stats = self.supabase.get_statistics()
+            stats = await self.supabase.get_statistics()
             logger.info("统计信息获取成功")
             return stats
             
@@ -2,20 +2,195 @@
 # Supabase Client Configuration
 
 import os
+import time
 import logging
-from typing import List, Dict, Optional, Any
-from supabase import create_client, Client
+from typing import List, Dict, Optional, Any, Callable, Tuple
+from supabase import create_client, Client, acreate_client, AsyncClient
 from dotenv import load_dotenv
 import asyncio
 import json
 from datetime import datetime
 import uuid
+from geo_math import CoordinateArray, bounding_box, distance_km
 
 # 加载环境变量
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 批量in_()查询每批的ID数量，避免请求URL超出长度限制
+IN_QUERY_BATCH_SIZE = 100
+
+# 备用附近查询：分页大小、经纬度范围查询的行数上限、全表快照的行数上限
+FALLBACK_PAGE_SIZE = 1000
+FALLBACK_MAX_ROWS = 5000
+SNAPSHOT_MAX_ROWS = 20000
+# 记录总数（count='exact'要数全表）的复用时间：最新updated_at不变时在该时间内不重新计数，
+# 过期后重新计数以发现删除
+SNAPSHOT_COUNT_TTL = float(os.getenv("SUPABASE_SNAPSHOT_COUNT_TTL", "300"))
+
+
+# ==================== 查询与数据转换辅助函数 ====================
+
+def _near_location_query(latitude: float, longitude: float, radius_km: float) -> str:
+    """构建PostGIS附近景点查询SQL（地理坐标系，单位是米）"""
+    radius_meters = radius_km * 1000
+    return f"""
+            SELECT
+                a.*,
+                ST_X(a.location) as longitude,
+                ST_Y(a.location) as latitude,
+                ST_Distance(
+                    a.location::geography,
+                    ST_SetSRID(ST_MakePoint({longitude}, {latitude}), 4326)::geography
+                ) as distance_meters
+            FROM spot_attractions a
+            WHERE ST_DWithin(
+                a.location::geography,
+                ST_SetSRID(ST_MakePoint({longitude}, {latitude}), 4326)::geography,
+                {radius_meters}
+            )
+            ORDER BY distance_meters
+            """
+
+
+def _attraction_from_row(row: Dict) -> Dict:
+    """将spot_attractions表记录转换为景点字典"""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'latitude': row['latitude'],
+        'longitude': row['longitude'],
+        'category': row['category'],
+        'country': row['country'],
+        'city': row['city'],
+        'address': row['address'],
+        'opening_hours': row['opening_hours'],
+        'ticket_price': row['ticket_price'],
+        'booking_method': row['booking_method'],
+        'description': '',
+        'image': row['main_image_url'],
+        'video': row['video_url']
+    }
+
+
+def _apply_content(attraction: Dict, content: Optional[Dict], full: bool = True):
+    """
+    将多语言内容合并到景点字典
+    
+    Args:
+        attraction: 景点字典
+        content: spot_attraction_contents表记录
+        full: 是否同时合并景点介绍和导游解说
+    """
+    if not content:
+        return
+    attraction['description'] = content.get('description', '')
+    if full:
+        attraction['attraction_introduction'] = content.get('attraction_introduction', '')
+        attraction['guide_commentary'] = content.get('guide_commentary', '')
+
+
+def _apply_media(attraction: Dict, media_list: Optional[List[Dict]]):
+    """将媒体资源合并到景点字典，没有主图片时使用第一个图片"""
+    if not media_list:
+        return
+    attraction['media'] = media_list
+    if not attraction['image']:
+        for media in media_list:
+            if media['media_type'] == 'image':
+                attraction['image'] = media['url']
+                break
+
+
+def _chunk_ids(ids: List[str], size: int = IN_QUERY_BATCH_SIZE):
+    """将ID列表去重后分批，避免in_()查询的URL过长"""
+    unique_ids = list(dict.fromkeys(ids))
+    for i in range(0, len(unique_ids), size):
+        yield unique_ids[i:i + size]
+
+
+def _apply_bounding_box(query, box: Tuple[float, float, Optional[float], Optional[float]]):
+    """将经纬度范围过滤下推到PostgREST（依赖spot_attractions的latitude/longitude索引列）"""
+    lat_min, lat_max, lon_min, lon_max = box
+    query = query.gte('latitude', lat_min).lte('latitude', lat_max)
+    if lon_min is not None:
+        query = query.gte('longitude', lon_min).lte('longitude', lon_max)
+    return query
+
+
+def _page_range(fetched: int, max_rows: int) -> Optional[Tuple[int, int]]:
+    """计算下一页的range()区间，达到行数上限时返回None"""
+    if fetched >= max_rows:
+        return None
+    return fetched, min(fetched + FALLBACK_PAGE_SIZE, max_rows) - 1
+
+
+def _watermark_query(client, with_count: bool = False):
+    """构建景点表水位线查询：最新的updated_at，with_count时同时统计记录总数"""
+    return client.table('spot_attractions')\
+        .select('updated_at', count='exact' if with_count else None)\
+        .order('updated_at', desc=True)\
+        .limit(1)
+
+
+def _latest_of(result) -> Optional[str]:
+    """从水位线查询结果中取出最新的updated_at"""
+    return result.data[0]['updated_at'] if result.data else None
+
+
+def _watermark_of(result) -> Tuple[Optional[str], Optional[int]]:
+    """从水位线查询结果中取出 (最新updated_at, 记录总数)，记录数可识别删除"""
+    return _latest_of(result), result.count
+
+
+class _AttractionSnapshot:
+    """spot_attractions全表快照，水位线变化时失效"""
+
+    def __init__(self):
+        # (水位线, 坐标集合) 作为一个整体替换，读取时不会看到不一致的状态
+        self._state: Tuple[Optional[Tuple], Optional[CoordinateArray]] = (None, None)
+        # 最近一次计数得到的水位线和计数时间（表太大不建快照时也复用，避免每次都数全表）
+        self._counted: Tuple[Optional[Tuple], float] = (None, 0.0)
+
+    def counted_watermark(self, latest: Optional[str]) -> Optional[Tuple]:
+        """最新updated_at未变且计数未过期时返回上次计数的水位线，否则返回None（需要重新计数）"""
+        watermark, counted_at = self._counted
+        if watermark is not None and watermark[0] == latest and time.monotonic() - counted_at < SNAPSHOT_COUNT_TTL:
+            return watermark
+        return None
+
+    def remember_watermark(self, watermark: Tuple):
+        self._counted = (watermark, time.monotonic())
+
+    def get(self, watermark: Tuple) -> Optional[CoordinateArray]:
+        """水位线一致时返回快照"""
+        current_watermark, coords = self._state
+        if coords is not None and current_watermark == watermark:
+            return coords
+        return None
+
+    def set(self, rows: List[Dict], watermark: Tuple) -> CoordinateArray:
+        """用新数据替换快照"""
+        coords = CoordinateArray(rows)
+        self._state = (watermark, coords)
+        logger.info(f"景点快照已更新: {len(coords)} 个景点, 水位线 {watermark}")
+        return coords
+
+
+# 同步和异步客户端共享的景点快照
+_attraction_snapshot = _AttractionSnapshot()
+
+
+def _count_by(rows: Optional[List[Dict]], field: str) -> Dict[str, int]:
+    """按字段统计记录数量"""
+    counts = {}
+    for row in rows or []:
+        value = row[field]
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
 class SupabaseClient:
     """Supabase数据库客户端"""
     
@@ -56,165 +231,145 @@ class SupabaseClient:
         """获取指定位置附近的景点"""
         try:
             # 使用PostGIS的ST_DWithin函数查询附近景点
-            # 注意：这里使用地理坐标系，单位是米
-            radius_meters = radius_km * 1000
-            
-            # 构建查询
-            query = f"""
-            SELECT 
-                a.*,
-                ST_X(a.location) as longitude,
-                ST_Y(a.location) as latitude,
-                ST_Distance(
-                    a.location::geography, 
-                    ST_SetSRID(ST_MakePoint({longitude}, {latitude}), 4326)::geography
-                ) as distance_meters
-            FROM spot_attractions a
-            WHERE ST_DWithin(
-                a.location::geography,
-                ST_SetSRID(ST_MakePoint({longitude}, {latitude}), 4326)::geography,
-                {radius_meters}
-            )
-            ORDER BY distance_meters
-            """
-            
+            query = _near_location_query(latitude, longitude, radius_km)
             result = self.client.rpc('execute_sql', {'query': query}).execute()
             
             if result.data:
+                # 批量获取所有景点的多语言内容和媒体资源，避免逐个景点查询
+                attraction_ids = [row['id'] for row in result.data]
+                contents = self._get_contents_by_attraction_ids(attraction_ids)
+                media_map = self._get_media_by_attraction_ids(attraction_ids)
+                
                 attractions = []
                 for row in result.data:
-                    # 获取多语言内容
-                    content_result = self.client.table('spot_attraction_contents')\
-                        .select('*')\
-                        .eq('attraction_id', row['id'])\
-                        .eq('language_code', 'zh-CN')\
-                        .execute()
-                    
-                    # 获取媒体资源
-                    media_result = self.client.table('spot_attraction_media')\
-                        .select('*')\
-                        .eq('attraction_id', row['id'])\
-                        .order('order_index')\
-                        .execute()
-                    
-                    attraction = {
-                        'id': row['id'],
-                        'name': row['name'],
-                        'latitude': row['latitude'],
-                        'longitude': row['longitude'],
-                        'category': row['category'],
-                        'country': row['country'],
-                        'city': row['city'],
-                        'address': row['address'],
-                        'opening_hours': row['opening_hours'],
-                        'ticket_price': row['ticket_price'],
-                        'booking_method': row['booking_method'],
-                        'distance': round(row['distance_meters'] / 1000, 2),  # 转换为公里
-                        'description': '',
-                        'image': row['main_image_url'],
-                        'video': row['video_url']
-                    }
-                    
-                    # 添加多语言内容
-                    if content_result.data:
-                        content = content_result.data[0]
-                        attraction['description'] = content.get('description', '')
-                        attraction['attraction_introduction'] = content.get('attraction_introduction', '')
-                        attraction['guide_commentary'] = content.get('guide_commentary', '')
-                    
-                    # 添加媒体资源
-                    if media_result.data:
-                        attraction['media'] = media_result.data
-                        # 如果没有主图片，使用第一个图片
-                        if not attraction['image'] and media_result.data:
-                            for media in media_result.data:
-                                if media['media_type'] == 'image':
-                                    attraction['image'] = media['url']
-                                    break
-                    
+                    attraction = _attraction_from_row(row)
+                    attraction['distance'] = round(row['distance_meters'] / 1000, 2)  # 转换为公里
+                    _apply_content(attraction, contents.get(row['id']))
+                    _apply_media(attraction, media_map.get(row['id']))
                     attractions.append(attraction)
                 
                 return attractions
             
             return []
-            
+        
         except Exception as e:
             logger.error(f"查询附近景点失败: {e}")
             # 如果RPC调用失败，尝试使用基本查询
             return self._get_attractions_near_location_fallback(latitude, longitude, radius_km)
     
     def _get_attractions_near_location_fallback(self, latitude: float, longitude: float, radius_km: float) -> List[Dict]:
-        """备用的附近景点查询方法"""
+        """
+        备用的附近景点查询方法
+        
+        全表快照未过期时直接在内存中筛选；表较小时分页加载全表并缓存快照；
+        否则将经纬度范围过滤下推到数据库，分页读取且有行数上限
+        """
         try:
-            # 简单的边界框查询作为备用方案
-            lat_range = radius_km / 111.0  # 大约每度111公里
-            lng_range = radius_km / (111.0 * abs(latitude * 3.14159 / 180))  # 考虑纬度影响
-            
-            result = self.client.table('spot_attractions')\
-                .select('*, ST_X(location) as longitude, ST_Y(location) as latitude')\
-                .execute()
-            
-            if result.data:
-                attractions = []
-                for row in result.data:
-                    # 简单距离计算
-                    lat_diff = abs(row['latitude'] - latitude)
-                    lng_diff = abs(row['longitude'] - longitude)
-                    
-                    if lat_diff <= lat_range and lng_diff <= lng_range:
-                        # 计算更精确的距离
-                        distance = self._calculate_distance(
-                            latitude, longitude, 
-                            row['latitude'], row['longitude']
-                        )
-                        
-                        if distance <= radius_km:
-                            attraction = {
-                                'id': row['id'],
-                                'name': row['name'],
-                                'latitude': row['latitude'],
-                                'longitude': row['longitude'],
-                                'category': row['category'],
-                                'country': row['country'],
-                                'city': row['city'],
-                                'address': row['address'],
-                                'opening_hours': row['opening_hours'],
-                                'ticket_price': row['ticket_price'],
-                                'booking_method': row['booking_method'],
-                                'distance': distance,
-                                'description': '',
-                                'image': row['main_image_url'],
-                                'video': row['video_url']
-                            }
-                            attractions.append(attraction)
-                
-                # 按距离排序
-                attractions.sort(key=lambda x: x['distance'])
-                return attractions
-            
-            return []
-            
+            watermark = self._snapshot_watermark()
+            
+            coords = _attraction_snapshot.get(watermark)
+            if coords is None and watermark[1] is not None and watermark[1] <= SNAPSHOT_MAX_ROWS:
+                rows = self._fetch_pages(lambda: self.client.table('spot_attractions').select('*'), SNAPSHOT_MAX_ROWS)
+                coords = _attraction_snapshot.set(rows, watermark)
+            
+            if coords is None:
+                box = bounding_box(latitude, longitude, radius_km)
+                rows = self._fetch_pages(
+                    lambda: _apply_bounding_box(self.client.table('spot_attractions').select('*'), box),
+                    FALLBACK_MAX_ROWS
+                )
+                coords = CoordinateArray(rows)
+            
+            return self._filter_by_radius(coords, latitude, longitude, radius_km)
+        
         except Exception as e:
             logger.error(f"备用查询附近景点也失败: {e}")
             return []
     
+    def _snapshot_watermark(self) -> Tuple[Optional[str], Optional[int]]:
+        """获取景点表水位线：每次只查最新的updated_at，记录总数按SNAPSHOT_COUNT_TTL复用"""
+        watermark = _attraction_snapshot.counted_watermark(_latest_of(_watermark_query(self.client).execute()))
+        if watermark is None:
+            watermark = _watermark_of(_watermark_query(self.client, with_count=True).execute())
+            _attraction_snapshot.remember_watermark(watermark)
+        return watermark
+    
+    def _fetch_pages(self, build_query: Callable, max_rows: int) -> List[Dict]:
+        """
+        分页读取查询结果
+        
+        Args:
+            build_query: 返回新查询构建器的函数（构建器不能重复追加range）
+            max_rows: 最多读取的行数
+        """
+        rows: List[Dict] = []
+        while True:
+            page_range = _page_range(len(rows), max_rows)
+            if page_range is None:
+                logger.warning(f"分页读取达到 {max_rows} 行上限，结果已截断")
+                return rows
+            page = build_query().order('id').range(*page_range).execute().data or []
+            rows.extend(page)
+            if len(page) < page_range[1] - page_range[0] + 1:
+                return rows
+    
+    @staticmethod
+    def _filter_by_radius(coords: CoordinateArray, latitude: float, longitude: float, radius_km: float) -> List[Dict]:
+        """在内存中筛选半径内的景点，结果按距离排序"""
+        attractions = []
+        # 向量化计算所有景点到中心点的距离
+        for row, distance in coords.within_radius(latitude, longitude, radius_km):
+            attraction = _attraction_from_row(row)
+            attraction['distance'] = distance
+            attractions.append(attraction)
+        return attractions
+    
     def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """使用Haversine公式计算两点间距离（公里）"""
-        import math
-        
-        R = 6371  # 地球半径（公里）
+        return distance_km(lat1, lon1, lat2, lon2)
+    
+    def _get_contents_by_attraction_ids(self, attraction_ids: List[str], language_code: str = 'zh-CN') -> Dict[str, Dict]:
+        """
+        批量获取景点的多语言内容
         
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
+        Args:
+            attraction_ids: 景点ID列表
+            language_code: 语言代码
         
-        a = (math.sin(dlat/2) * math.sin(dlat/2) + 
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-             math.sin(dlon/2) * math.sin(dlon/2))
+        Returns:
+            景点ID到内容记录的映射，每个景点取第一条记录
+        """
+        contents = {}
+        for chunk in _chunk_ids(attraction_ids):
+            result = self.client.table('spot_attraction_contents')\
+                .select('*')\
+                .in_('attraction_id', chunk)\
+                .eq('language_code', language_code)\
+                .execute()
+            for row in result.data or []:
+                contents.setdefault(row['attraction_id'], row)
+        return contents
+    
+    def _get_media_by_attraction_ids(self, attraction_ids: List[str]) -> Dict[str, List[Dict]]:
+        """
+        批量获取景点的媒体资源
         
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
+        Args:
+            attraction_ids: 景点ID列表
         
-        return distance
+        Returns:
+            景点ID到媒体列表（按order_index排序）的映射
+        """
+        media_map: Dict[str, List[Dict]] = {}
+        for chunk in _chunk_ids(attraction_ids):
+            result = self.client.table('spot_attraction_media')\
+                .select('*')\
+                .in_('attraction_id', chunk)\
+                .order('order_index')\
+                .execute()
+            for row in result.data or []:
+                media_map.setdefault(row['attraction_id'], []).append(row)
+        return media_map
     
     def get_all_attractions(self) -> List[Dict]:
         """获取所有景点"""
@@ -224,45 +379,19 @@ class SupabaseClient:
                 .execute()
             
             if result.data:
+                # 批量获取多语言内容
+                contents = self._get_contents_by_attraction_ids([row['id'] for row in result.data])
+                
                 attractions = []
                 for row in result.data:
-                    # 获取多语言内容
-                    content_result = self.client.table('spot_attraction_contents')\
-                        .select('*')\
-                        .eq('attraction_id', row['id'])\
-                        .eq('language_code', 'zh-CN')\
-                        .execute()
-                    
-                    attraction = {
-                        'id': row['id'],
-                        'name': row['name'],
-                        'latitude': row['latitude'],
-                        'longitude': row['longitude'],
-                        'category': row['category'],
-                        'country': row['country'],
-                        'city': row['city'],
-                        'address': row['address'],
-                        'opening_hours': row['opening_hours'],
-                        'ticket_price': row['ticket_price'],
-                        'booking_method': row['booking_method'],
-                        'description': '',
-                        'image': row['main_image_url'],
-                        'video': row['video_url']
-                    }
-                    
-                    # 添加多语言内容
-                    if content_result.data:
-                        content = content_result.data[0]
-                        attraction['description'] = content.get('description', '')
-                        attraction['attraction_introduction'] = content.get('attraction_introduction', '')
-                        attraction['guide_commentary'] = content.get('guide_commentary', '')
-                    
+                    attraction = _attraction_from_row(row)
+                    _apply_content(attraction, contents.get(row['id']))
                     attractions.append(attraction)
                 
                 return attractions
             
             return []
-            
+        
         except Exception as e:
             logger.error(f"获取所有景点失败: {e}")
             return []
@@ -276,30 +405,10 @@ class SupabaseClient:
                 .execute()
             
             if result.data:
-                attractions = []
-                for row in result.data:
-                    attraction = {
-                        'id': row['id'],
-                        'name': row['name'],
-                        'latitude': row['latitude'],
-                        'longitude': row['longitude'],
-                        'category': row['category'],
-                        'country': row['country'],
-                        'city': row['city'],
-                        'address': row['address'],
-                        'opening_hours': row['opening_hours'],
-                        'ticket_price': row['ticket_price'],
-                        'booking_method': row['booking_method'],
-                        'description': '',
-                        'image': row['main_image_url'],
-                        'video': row['video_url']
-                    }
-                    attractions.append(attraction)
-                
-                return attractions
+                return [_attraction_from_row(row) for row in result.data]
             
             return []
-            
+        
         except Exception as e:
             logger.error(f"根据类别获取景点失败: {e}")
             return []
@@ -313,43 +422,19 @@ class SupabaseClient:
                 .execute()
             
             if result.data:
+                # 批量获取多语言内容
+                contents = self._get_contents_by_attraction_ids([row['id'] for row in result.data])
+                
                 attractions = []
                 for row in result.data:
-                    # 获取多语言内容
-                    content_result = self.client.table('spot_attraction_contents')\
-                        .select('*')\
-                        .eq('attraction_id', row['id'])\
-                        .eq('language_code', 'zh-CN')\
-                        .execute()
-                    
-                    attraction = {
-                        'id': row['id'],
-                        'name': row['name'],
-                        'latitude': row['latitude'],
-                        'longitude': row['longitude'],
-                        'category': row['category'],
-                        'country': row['country'],
-                        'city': row['city'],
-                        'address': row['address'],
-                        'opening_hours': row['opening_hours'],
-                        'ticket_price': row['ticket_price'],
-                        'booking_method': row['booking_method'],
-                        'description': '',
-                        'image': row['main_image_url'],
-                        'video': row['video_url']
-                    }
-                    
-                    # 添加多语言内容
-                    if content_result.data:
-                        content = content_result.data[0]
-                        attraction['description'] = content.get('description', '')
-                    
+                    attraction = _attraction_from_row(row)
+                    _apply_content(attraction, contents.get(row['id']), full=False)
                     attractions.append(attraction)
                 
                 return attractions
             
             return []
-            
+        
         except Exception as e:
             logger.error(f"根据城市获取景点失败: {e}")
             return []
@@ -363,51 +448,32 @@ class SupabaseClient:
                 .execute()
             
             if result.data:
+                # 批量获取多语言内容
+                contents = self._get_contents_by_attraction_ids([row['id'] for row in result.data])
+                
                 attractions = []
                 for row in result.data:
-                    # 获取多语言内容
-                    content_result = self.client.table('spot_attraction_contents')\
-                        .select('*')\
-                        .eq('attraction_id', row['id'])\
-                        .eq('language_code', 'zh-CN')\
-                        .execute()
-                    
-                    # 从数据库字段获取经纬度
-                    latitude = row.get('latitude', 39.9042)  # 默认北京纬度
-                    longitude = row.get('longitude', 116.4074)  # 默认北京经度
-                    
-                    attraction = {
-                        'id': row['id'],
-                        'name': row['name'],
-                        'latitude': latitude,
-                        'longitude': longitude,
-                        'category': row['category'],
-                        'country': row['country'],
-                        'city': row['city'],
-                        'address': row['address'],
-                        'opening_hours': row['opening_hours'],
-                        'ticket_price': row['ticket_price'],
-                        'booking_method': row['booking_method'],
-                        'description': '',
-                        'image': row['main_image_url'],
-                        'video': row['video_url']
-                    }
-                    
-                    # 添加多语言内容
-                    if content_result.data:
-                        content = content_result.data[0]
-                        attraction['description'] = content.get('description', '')
-                    
+                    attraction = self._country_attraction_from_row(row)
+                    _apply_content(attraction, contents.get(row['id']), full=False)
                     attractions.append(attraction)
                 
                 return attractions
             
             return []
-            
+        
         except Exception as e:
             logger.error(f"根据国家获取景点失败: {e}")
             return []
     
+    @staticmethod
+    def _country_attraction_from_row(row: Dict) -> Dict:
+        """按国家查询时不含ST_X/ST_Y，经纬度缺失时默认使用北京坐标"""
+        return _attraction_from_row({
+            **row,
+            'latitude': row.get('latitude', 39.9042),
+            'longitude': row.get('longitude', 116.4074)
+        })
+    
     def search_attractions(self, query: str) -> List[Dict]:
         """搜索景点"""
         try:
@@ -417,67 +483,37 @@ class SupabaseClient:
                 .or_(f'name.ilike.%{query}%,address.ilike.%{query}%,city.ilike.%{query}%')\
                 .execute()
             
-            attractions = []
-            if result.data:
-                for row in result.data:
-                    attraction = {
-                        'id': row['id'],
-                        'name': row['name'],
-                        'latitude': row['latitude'],
-                        'longitude': row['longitude'],
-                        'category': row['category'],
-                        'country': row['country'],
-                        'city': row['city'],
-                        'address': row['address'],
-                        'opening_hours': row['opening_hours'],
-                        'ticket_price': row['ticket_price'],
-                        'booking_method': row['booking_method'],
-                        'description': '',
-                        'image': row['main_image_url'],
-                        'video': row['video_url']
-                    }
-                    attractions.append(attraction)
-            
             # 同时在多语言内容中搜索
             content_result = self.client.table('spot_attraction_contents')\
                 .select('*, spot_attractions(*, ST_X(location) as longitude, ST_Y(location) as latitude)')\
                 .or_(f'description.ilike.%{query}%,attraction_introduction.ilike.%{query}%')\
                 .execute()
             
-            if content_result.data:
-                for row in content_result.data:
-                    if row['spot_attractions']:
-                        attraction_data = row['spot_attractions']
-                        attraction = {
-                            'id': attraction_data['id'],
-                            'name': attraction_data['name'],
-                            'latitude': attraction_data['latitude'],
-                            'longitude': attraction_data['longitude'],
-                            'category': attraction_data['category'],
-                            'country': attraction_data['country'],
-                            'city': attraction_data['city'],
-                            'address': attraction_data['address'],
-                            'opening_hours': attraction_data['opening_hours'],
-                            'ticket_price': attraction_data['ticket_price'],
-                            'booking_method': attraction_data['booking_method'],
-                            'description': row.get('description', ''),
-                            'image': attraction_data['main_image_url'],
-                            'video': attraction_data['video_url']
-                        }
-                        
-                        # 避免重复
-                        if not any(a['id'] == attraction['id'] for a in attractions):
-                            attractions.append(attraction)
-            
-            return attractions
-            
+            return self._merge_search_results(result.data, content_result.data)
+        
         except Exception as e:
             logger.error(f"搜索景点失败: {e}")
             return []
     
+    @staticmethod
+    def _merge_search_results(attraction_rows: Optional[List[Dict]], content_rows: Optional[List[Dict]]) -> List[Dict]:
+        """合并景点表和多语言内容表的搜索结果"""
+        attractions = [_attraction_from_row(row) for row in attraction_rows or []]
+        
+        for row in content_rows or []:
+            if row['spot_attractions']:
+                attraction = _attraction_from_row(row['spot_attractions'])
+                attraction['description'] = row.get('description', '')
+                
+                # 避免重复
+                if not any(a['id'] == attraction['id'] for a in attractions):
+                    attractions.append(attraction)
+        
+        return attractions
+    
     # ==================== 相册相关方法 ====================
     
-    def create_album(self, creator_id: str, title: str, description: str = None, 
+    def create_album(self, creator_id: str, title: str, description: str = None,
                     access_level: str = 'public') -> Optional[Dict]:
         """创建新相册"""
         try:
@@ -491,7 +527,7 @@ class SupabaseClient:
             if result.data:
                 return result.data[0]
             return None
-            
+        
         except Exception as e:
             logger.error(f"创建相册失败: {e}")
             return None
@@ -508,7 +544,7 @@ class SupabaseClient:
                 .execute()
             
             return result.data if result.data else []
-            
+        
         except Exception as e:
             logger.error(f"获取公开相册失败: {e}")
             return []
@@ -523,7 +559,7 @@ class SupabaseClient:
                 .execute()
             
             return result.data if result.data else []
-            
+        
         except Exception as e:
             logger.error(f"获取用户相册失败: {e}")
             return []
@@ -549,11 +585,7 @@ class SupabaseClient:
                 .execute()
             
             if categories_result.data:
-                category_counts = {}
-                for row in categories_result.data:
-                    category = row['category']
-                    category_counts[category] = category_counts.get(category, 0) + 1
-                stats['attractions_by_category'] = category_counts
+                stats['attractions_by_category'] = _count_by(categories_result.data, 'category')
             
             # 按国家统计景点
             countries_result = self.client.table('spot_attractions')\
@@ -561,17 +593,384 @@ class SupabaseClient:
                 .execute()
             
             if countries_result.data:
-                country_counts = {}
-                for row in countries_result.data:
-                    country = row['country']
-                    country_counts[country] = country_counts.get(country, 0) + 1
-                stats['attractions_by_country'] = country_counts
+                stats['attractions_by_country'] = _count_by(countries_result.data, 'country')
             
             return stats
+        
+        except Exception as e:
+            logger.error(f"获取统计信息失败: {e}")
+            return {}
+
+
+class AsyncSupabaseClient:
+    """
+    异步Supabase数据库客户端
+    
+    与SupabaseClient提供相同的查询方法，但基于supabase的AsyncClient，
+    所有PostgREST请求复用同一个httpx异步连接池（keep-alive），不会阻塞事件循环
+    """
+    
+    def __init__(self, url: str, key: str):
+        """
+        初始化异步客户端配置，实际连接在第一次查询时创建
+        
+        Args:
+            url: Supabase项目URL
+            key: API Key
+        """
+        self.url = url
+        self.key = key
+        self._client: Optional[AsyncClient] = None
+        self._client_lock = asyncio.Lock()
+    
+    async def get_client(self) -> AsyncClient:
+        """获取（必要时创建）共享的AsyncClient"""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    self._client = await acreate_client(self.url, self.key)
+                    logger.info("Supabase异步客户端初始化成功")
+        return self._client
+    
+    async def close(self):
+        """关闭连接池"""
+        client, self._client = self._client, None
+        if client is None:
+            return
+        try:
+            await client.postgrest.aclose()
+        except Exception as e:
+            logger.warning(f"关闭Supabase异步客户端失败: {e}")
+    
+    async def test_connection(self) -> bool:
+        """测试数据库连接"""
+        try:
+            client = await self.get_client()
+            await client.table('spot_attractions').select('count').execute()
+            logger.info("Supabase连接测试成功")
+            return True
+        except Exception as e:
+            logger.error(f"Supabase连接测试失败: {e}")
+            return False
+    
+    # ==================== 景点相关方法 ====================
+    
+    async def get_attractions_near_location(self, latitude: float, longitude: float, radius_km: float = 50) -> List[Dict]:
+        """获取指定位置附近的景点"""
+        try:
+            client = await self.get_client()
+            query = _near_location_query(latitude, longitude, radius_km)
+            result = await client.rpc('execute_sql', {'query': query}).execute()
+            
+            if result.data:
+                # 并发批量获取多语言内容和媒体资源
+                attraction_ids = [row['id'] for row in result.data]
+                contents, media_map = await asyncio.gather(
+                    self._get_contents_by_attraction_ids(attraction_ids),
+                    self._get_media_by_attraction_ids(attraction_ids)
+                )
+                
+                attractions = []
+                for row in result.data:
+                    attraction = _attraction_from_row(row)
+                    attraction['distance'] = round(row['distance_meters'] / 1000, 2)  # 转换为公里
+                    _apply_content(attraction, contents.get(row['id']))
+                    _apply_media(attraction, media_map.get(row['id']))
+                    attractions.append(attraction)
+                
+                return attractions
+            
+            return []
+        
+        except Exception as e:
+            logger.error(f"查询附近景点失败: {e}")
+            # 如果RPC调用失败，尝试使用基本查询
+            return await self._get_attractions_near_location_fallback(latitude, longitude, radius_km)
+    
+    async def _get_attractions_near_location_fallback(self, latitude: float, longitude: float, radius_km: float) -> List[Dict]:
+        """备用的附近景点查询方法，策略与SupabaseClient相同，共享全表快照"""
+        try:
+            client = await self.get_client()
+            watermark = await self._snapshot_watermark(client)
+            
+            coords = _attraction_snapshot.get(watermark)
+            if coords is None and watermark[1] is not None and watermark[1] <= SNAPSHOT_MAX_ROWS:
+                rows = await self._fetch_pages(lambda: client.table('spot_attractions').select('*'), SNAPSHOT_MAX_ROWS)
+                coords = _attraction_snapshot.set(rows, watermark)
+            
+            if coords is None:
+                box = bounding_box(latitude, longitude, radius_km)
+                rows = await self._fetch_pages(
+                    lambda: _apply_bounding_box(client.table('spot_attractions').select('*'), box),
+                    FALLBACK_MAX_ROWS
+                )
+                coords = CoordinateArray(rows)
+            
+            return SupabaseClient._filter_by_radius(coords, latitude, longitude, radius_km)
+        
+        except Exception as e:
+            logger.error(f"备用查询附近景点也失败: {e}")
+            return []
+    
+    @staticmethod
+    async def _snapshot_watermark(client: AsyncClient) -> Tuple[Optional[str], Optional[int]]:
+        """获取景点表水位线，与SupabaseClient._snapshot_watermark相同"""
+        watermark = _attraction_snapshot.counted_watermark(_latest_of(await _watermark_query(client).execute()))
+        if watermark is None:
+            watermark = _watermark_of(await _watermark_query(client, with_count=True).execute())
+            _attraction_snapshot.remember_watermark(watermark)
+        return watermark
+    
+    async def _fetch_pages(self, build_query: Callable, max_rows: int) -> List[Dict]:
+        """分页读取查询结果，最多读取max_rows行"""
+        rows: List[Dict] = []
+        while True:
+            page_range = _page_range(len(rows), max_rows)
+            if page_range is None:
+                logger.warning(f"分页读取达到 {max_rows} 行上限，结果已截断")
+                return rows
+            page = (await build_query().order('id').range(*page_range).execute()).data or []
+            rows.extend(page)
+            if len(page) < page_range[1] - page_range[0] + 1:
+                return rows
+    
+    async def _get_contents_by_attraction_ids(self, attraction_ids: List[str], language_code: str = 'zh-CN') -> Dict[str, Dict]:
+        """批量获取景点的多语言内容，各批次并发请求"""
+        client = await self.get_client()
+        results = await asyncio.gather(*(
+            client.table('spot_attraction_contents')
+                .select('*')
+                .in_('attraction_id', chunk)
+                .eq('language_code', language_code)
+                .execute()
+            for chunk in _chunk_ids(attraction_ids)
+        ))
+        
+        contents = {}
+        for result in results:
+            for row in result.data or []:
+                contents.setdefault(row['attraction_id'], row)
+        return contents
+    
+    async def _get_media_by_attraction_ids(self, attraction_ids: List[str]) -> Dict[str, List[Dict]]:
+        """批量获取景点的媒体资源，各批次并发请求"""
+        client = await self.get_client()
+        results = await asyncio.gather(*(
+            client.table('spot_attraction_media')
+                .select('*')
+                .in_('attraction_id', chunk)
+                .order('order_index')
+                .execute()
+            for chunk in _chunk_ids(attraction_ids)
+        ))
+        
+        media_map: Dict[str, List[Dict]] = {}
+        for result in results:
+            for row in result.data or []:
+                media_map.setdefault(row['attraction_id'], []).append(row)
+        return media_map
+    
+    async def get_all_attractions(self) -> List[Dict]:
+        """获取所有景点"""
+        try:
+            client = await self.get_client()
+            result = await client.table('spot_attractions')\
+                .select('*, ST_X(location) as longitude, ST_Y(location) as latitude')\
+                .execute()
+            
+            if result.data:
+                contents = await self._get_contents_by_attraction_ids([row['id'] for row in result.data])
+                
+                attractions = []
+                for row in result.data:
+                    attraction = _attraction_from_row(row)
+                    _apply_content(attraction, contents.get(row['id']))
+                    attractions.append(attraction)
+                
+                return attractions
+            
+            return []
+        
+        except Exception as e:
+            logger.error(f"获取所有景点失败: {e}")
+            return []
+    
+    async def get_attractions_by_category(self, category: str) -> List[Dict]:
+        """根据类别获取景点"""
+        try:
+            client = await self.get_client()
+            result = await client.table('spot_attractions')\
+                .select('*, ST_X(location) as longitude, ST_Y(location) as latitude')\
+                .eq('category', category)\
+                .execute()
+            
+            if result.data:
+                return [_attraction_from_row(row) for row in result.data]
+            
+            return []
+        
+        except Exception as e:
+            logger.error(f"根据类别获取景点失败: {e}")
+            return []
+    
+    async def get_attractions_by_city(self, city: str) -> List[Dict]:
+        """根据城市获取景点"""
+        try:
+            client = await self.get_client()
+            result = await client.table('spot_attractions')\
+                .select('*, ST_X(location) as longitude, ST_Y(location) as latitude')\
+                .eq('city', city)\
+                .execute()
+            
+            if result.data:
+                contents = await self._get_contents_by_attraction_ids([row['id'] for row in result.data])
+                
+                attractions = []
+                for row in result.data:
+                    attraction = _attraction_from_row(row)
+                    _apply_content(attraction, contents.get(row['id']), full=False)
+                    attractions.append(attraction)
+                
+                return attractions
+            
+            return []
+        
+        except Exception as e:
+            logger.error(f"根据城市获取景点失败: {e}")
+            return []
+    
+    async def get_attractions_by_country(self, country: str) -> List[Dict]:
+        """根据国家获取景点"""
+        try:
+            client = await self.get_client()
+            result = await client.table('spot_attractions')\
+                .select('*')\
+                .eq('country', country)\
+                .execute()
             
+            if result.data:
+                contents = await self._get_contents_by_attraction_ids([row['id'] for row in result.data])
+                
+                attractions = []
+                for row in result.data:
+                    attraction = SupabaseClient._country_attraction_from_row(row)
+                    _apply_content(attraction, contents.get(row['id']), full=False)
+                    attractions.append(attraction)
+                
+                return attractions
+            
+            return []
+        
+        except Exception as e:
+            logger.error(f"根据国家获取景点失败: {e}")
+            return []
+    
+    async def search_attractions(self, query: str) -> List[Dict]:
+        """搜索景点"""
+        try:
+            client = await self.get_client()
+            # 景点表和多语言内容表的搜索并发执行
+            result, content_result = await asyncio.gather(
+                client.table('spot_attractions')
+                    .select('*, ST_X(location) as longitude, ST_Y(location) as latitude')
+                    .or_(f'name.ilike.%{query}%,address.ilike.%{query}%,city.ilike.%{query}%')
+                    .execute(),
+                client.table('spot_attraction_contents')
+                    .select('*, spot_attractions(*, ST_X(location) as longitude, ST_Y(location) as latitude)')
+                    .or_(f'description.ilike.%{query}%,attraction_introduction.ilike.%{query}%')
+                    .execute()
+            )
+            
+            return SupabaseClient._merge_search_results(result.data, content_result.data)
+        
+        except Exception as e:
+            logger.error(f"搜索景点失败: {e}")
+            return []
+    
+    # ==================== 相册相关方法 ====================
+    
+    async def create_album(self, creator_id: str, title: str, description: str = None,
+                          access_level: str = 'public') -> Optional[Dict]:
+        """创建新相册"""
+        try:
+            client = await self.get_client()
+            result = await client.table('spot_map_albums').insert({
+                'creator_id': creator_id,
+                'title': title,
+                'description': description,
+                'access_level': access_level
+            }).execute()
+            
+            if result.data:
+                return result.data[0]
+            return None
+        
+        except Exception as e:
+            logger.error(f"创建相册失败: {e}")
+            return None
+    
+    async def get_public_albums(self, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """获取公开相册"""
+        try:
+            client = await self.get_client()
+            result = await client.table('spot_map_albums')\
+                .select('*')\
+                .eq('access_level', 'public')\
+                .order('created_at', desc=True)\
+                .limit(limit)\
+                .offset(offset)\
+                .execute()
+            
+            return result.data if result.data else []
+        
+        except Exception as e:
+            logger.error(f"获取公开相册失败: {e}")
+            return []
+    
+    async def get_user_albums(self, user_id: str) -> List[Dict]:
+        """获取用户的相册"""
+        try:
+            client = await self.get_client()
+            result = await client.table('spot_map_albums')\
+                .select('*')\
+                .eq('creator_id', user_id)\
+                .order('created_at', desc=True)\
+                .execute()
+            
+            return result.data if result.data else []
+        
+        except Exception as e:
+            logger.error(f"获取用户相册失败: {e}")
+            return []
+    
+    # ==================== 统计方法 ====================
+    
+    async def get_statistics(self) -> Dict:
+        """获取数据库统计信息"""
+        try:
+            client = await self.get_client()
+            attractions_result, albums_result, categories_result, countries_result = await asyncio.gather(
+                client.table('spot_attractions').select('count').execute(),
+                client.table('spot_map_albums').select('count').execute(),
+                client.table('spot_attractions').select('category').execute(),
+                client.table('spot_attractions').select('country').execute()
+            )
+            
+            stats = {
+                'total_attractions': len(attractions_result.data) if attractions_result.data else 0,
+                'total_albums': len(albums_result.data) if albums_result.data else 0
+            }
+            if categories_result.data:
+                stats['attractions_by_category'] = _count_by(categories_result.data, 'category')
+            if countries_result.data:
+                stats['attractions_by_country'] = _count_by(countries_result.data, 'country')
+            
+            return stats
+        
         except Exception as e:
             logger.error(f"获取统计信息失败: {e}")
             return {}
 
 # 全局实例
-supabase_client = SupabaseClient()
\ No newline at end of file
+supabase_client = SupabaseClient()
+async_supabase_client = AsyncSupabaseClient(supabase_client.url, supabase_client.key)
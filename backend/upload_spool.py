@@ -0,0 +1,149 @@
+"""
+上传文件的流式落盘
+上传图片按块写入临时文件，同时累计大小（超过上限立即中止）、计算SHA-256并根据文件头识别类型；
+之后的解码直接从临时文件读取（图片处理进程按路径打开），单个请求占用的内存与图片大小无关
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+from typing import Optional, Union
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", "20")) * 1024 * 1024)
+
+# 允许的图片类型（按文件头识别，不信任扩展名和Content-Type）
+IMAGE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif"
+}
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """根据文件头识别图片类型，无法识别时返回None"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return None
+
+
+class SpooledUpload:
+    """已落盘并校验过的上传文件"""
+
+    def __init__(self, filename: Optional[str], path: str, size: int, sha256: Optional[str],
+                 mime_type: Optional[str], temporary: bool = True):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.mime_type = mime_type
+        self._temporary = temporary
+
+    @classmethod
+    def from_file(cls, path: str, filename: Optional[str] = None) -> "SpooledUpload":
+        """包装已经校验并保存过的文件（close时不删除）"""
+        with open(path, "rb") as f:
+            mime_type = sniff_image_type(f.read(16))
+        return cls(filename, path, os.path.getsize(path), None, mime_type, temporary=False)
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_EXTENSIONS[self.mime_type]
+
+    def move_to(self, dest: str):
+        """把临时文件移动到最终位置"""
+        shutil.move(self.path, dest)
+        self.path = dest
+        self._temporary = False
+
+    def close(self):
+        """删除临时文件（已经move_to的文件不受影响）"""
+        if self._temporary:
+            self._temporary = False
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES,
+                       dir: Optional[str] = None, label: str = "图片") -> SpooledUpload:
+    """
+    把上传文件按块写入临时文件并校验
+
+    Args:
+        upload: 上传文件
+        max_bytes: 大小上限
+        dir: 临时文件目录（需要移动到最终位置时放在同一文件系统）
+        label: 错误信息中的文件说明
+
+    Returns:
+        SpooledUpload，调用方负责close
+
+    Raises:
+        HTTPException: 超过大小上限（413）、不是支持的图片类型（415）
+    """
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=".tmp", dir=dir)
+    digest = hashlib.sha256()
+    size = 0
+    mime_type = None
+    try:
+        await upload.seek(0)
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if mime_type is None:
+                    mime_type = sniff_image_type(chunk[:16])
+                    if mime_type is None:
+                        raise HTTPException(
+                            status_code=415,
+                            detail=f"{label}格式不支持，支持的格式: JPG、PNG、WEBP、GIF"
+                        )
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"{label}太大，最大支持{max_bytes // (1024 * 1024)}MB"
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail=f"{label}为空")
+    except BaseException:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return SpooledUpload(upload.filename, path, size, digest.hexdigest(), mime_type)
+
+
+async def image_source(photo: Union[SpooledUpload, UploadFile]) -> Union[str, bytes]:
+    """图片处理的输入：已落盘的上传文件返回路径，否则读取全部内容"""
+    if isinstance(photo, SpooledUpload):
+        return photo.path
+    await photo.seek(0)
+    return await photo.read()
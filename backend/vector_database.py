@@ -10,20 +10,158 @@ import json
 import logging
 import asyncio
 import numpy as np
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, AsyncIterator
 from datetime import datetime
 import openai
 from dotenv import load_dotenv
 from supabase import create_client, Client
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import hashlib
+from geo_math import bounding_box, distance_km, one_to_many_km
+from pg_pool import create_pool_from_env
+from embedding_cache import embedding_cache, normalize_text
+from local_vector_index import local_vector_index, combined_score
 
 # 加载环境变量
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 相似度查询（常量SQL，每个连接上只准备一次）
+# <=>是余弦距离，与索引的vector_cosine_ops一致，ORDER BY ... LIMIT才能走向量索引；
+# 相似度阈值在取出最近的limit个之后再过滤，避免阈值条件让查询退化为全表扫描
+SIMILARITY_SQL = """
+    WITH nearest AS (
+        SELECT 
+            e.attraction_id,
+            e.content_type,
+            e.content_text,
+            e.embedding <=> $1 as distance
+        FROM spot_attraction_embeddings e
+        WHERE e.language_code = $2
+        ORDER BY e.embedding <=> $1
+        LIMIT $4
+    )
+    SELECT 
+        n.attraction_id,
+        n.content_type,
+        n.content_text,
+        n.distance,
+        1 - n.distance as similarity,
+        a.name,
+        a.category,
+        a.city,
+        a.country,
+        a.address,
+        a.main_image_url,
+        ST_X(a.location) as longitude,
+        ST_Y(a.location) as latitude
+    FROM nearest n
+    JOIN spot_attractions a ON n.attraction_id = a.id
+    WHERE 1 - n.distance >= $3
+    ORDER BY n.distance
+"""
+
+# 按位置过滤的混合查询：ST_DWithin和向量排序在同一个查询中完成，范围外的向量不参与排序；
+# location是geometry列，先用&&和经纬度范围走location的GiST索引粗筛，再用geography的ST_DWithin精确过滤；
+# 取范围内最相似的候选向量，每个景点保留最相似的一条，再按综合得分（与combined_score相同）排序
+HYBRID_SQL = """
+    WITH nearest AS (
+        SELECT 
+            e.attraction_id,
+            e.content_type,
+            e.content_text,
+            e.embedding <=> $1 as distance
+        FROM spot_attraction_embeddings e
+        JOIN spot_attractions a ON e.attraction_id = a.id
+        WHERE e.language_code = $2
+        AND a.location && ST_MakeEnvelope($9, $10, $11, $12, 4326)
+        AND ST_DWithin(a.location::geography, ST_SetSRID(ST_MakePoint($3, $4), 4326)::geography, $5)
+        ORDER BY e.embedding <=> $1
+        LIMIT $6
+    ),
+    best AS (
+        SELECT DISTINCT ON (attraction_id) *
+        FROM nearest
+        ORDER BY attraction_id, distance
+    ),
+    scored AS (
+        SELECT 
+            b.attraction_id,
+            b.content_type,
+            b.content_text,
+            b.distance,
+            1 - b.distance as similarity,
+            a.name,
+            a.category,
+            a.city,
+            a.country,
+            a.address,
+            a.main_image_url,
+            ST_X(a.location) as longitude,
+            ST_Y(a.location) as latitude,
+            ST_Distance(a.location::geography, ST_SetSRID(ST_MakePoint($3, $4), 4326)::geography) / 1000 as distance_km
+        FROM best b
+        JOIN spot_attractions a ON b.attraction_id = a.id
+    )
+    SELECT *, $7 * similarity + (1 - $7) * (1 - distance_km * 1000 / $5) as score
+    FROM scored
+    ORDER BY score DESC
+    LIMIT $8
+"""
+
+# 混合查询的默认相似度权重和候选向量数
+HYBRID_SIMILARITY_WEIGHT = float(os.getenv("HYBRID_SIMILARITY_WEIGHT", "0.7"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "200"))
+
+# 召回率基准测试：最近邻id查询（排除查询向量自身所在的行）和随机抽取的查询向量
+NEAREST_IDS_SQL = """
+    SELECT id FROM spot_attraction_embeddings
+    WHERE language_code = $2 AND id <> $4
+    ORDER BY embedding <=> $1
+    LIMIT $3
+"""
+
+SAMPLE_EMBEDDINGS_SQL = """
+    SELECT id, embedding FROM spot_attraction_embeddings
+    WHERE language_code = $1
+    ORDER BY random()
+    LIMIT $2
+"""
+
+# 在线建索引（及相关的删除、ANALYZE）的单条语句超时（秒），大表上HNSW/ivfflat构建可能需要数小时
+VECTOR_INDEX_TIMEOUT = float(os.getenv("PGVECTOR_INDEX_TIMEOUT", str(6 * 3600)))
+
+# 向量索引类型 -> 索引名
+VECTOR_INDEX_NAMES = {
+    "ivfflat": "spot_attraction_embeddings_vector_idx",
+    "hnsw": "spot_attraction_embeddings_hnsw_idx"
+}
+
+# 本地索引同步查询（按updated_at和id翻页）
+SYNC_ROWS_SQL = """
+    SELECT 
+        e.id,
+        e.attraction_id::text as attraction_id,
+        e.content_type,
+        e.language_code,
+        e.content_text,
+        e.embedding,
+        e.updated_at,
+        a.name,
+        a.category,
+        a.city,
+        a.country,
+        a.address,
+        a.main_image_url,
+        ST_X(a.location) as longitude,
+        ST_Y(a.location) as latitude
+    FROM spot_attraction_embeddings e
+    JOIN spot_attractions a ON e.attraction_id = a.id
+    WHERE (e.updated_at, e.id) > ($1, $2)
+    ORDER BY e.updated_at, e.id
+    LIMIT $3
+"""
+
 
 class EmbeddingService:
     """文本向量化服务"""
@@ -35,8 +173,15 @@ class EmbeddingService:
         self.model = "text-embedding-3-small"  # 使用最新的嵌入模型
         self.dimension = 1536  # text-embedding-3-small的维度
     
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """生成文本向量"""
+    async def generate_embeddings(self, texts: List[str], use_cache: bool = False) -> List[List[float]]:
+        """
+        生成文本向量
+        
+        Args:
+            texts: 文本列表
+            use_cache: 是否使用查询向量缓存（只用于搜索查询；写入数据库的文档向量不经过缓存，
+                       避免批量处理挤掉查询缓存，也避免把float16精度的缓存向量写入pgvector）
+        """
         try:
             if not texts:
                 return []
@@ -47,25 +192,41 @@ class EmbeddingService:
             if not cleaned_texts:
                 return []
             
+            # 先查缓存，只为未命中的文本（去重后）调用API
+            embeddings = [embedding_cache.get(self.model, text) if use_cache else None for text in cleaned_texts]
+            missing = list(dict.fromkeys(
+                text for text, embedding in zip(cleaned_texts, embeddings) if embedding is None
+            ))
+            if not missing:
+                return embeddings
+            
             # 调用OpenAI API生成嵌入
             response = await asyncio.to_thread(
                 self.openai_client.embeddings.create,
                 model=self.model,
-                input=cleaned_texts
+                input=missing
             )
             
-            embeddings = [data.embedding for data in response.data]
-            logger.info(f"成功生成 {len(embeddings)} 个向量，维度: {len(embeddings[0]) if embeddings else 0}")
+            generated = {}
+            for text, data in zip(missing, response.data):
+                generated[text] = data.embedding
+                if use_cache:
+                    embedding_cache.put(self.model, text, data.embedding)
+            if use_cache:
+                logger.info(f"成功生成 {len(generated)} 个向量（缓存命中 {len(cleaned_texts) - len(missing)} 个）")
+            else:
+                logger.info(f"成功生成 {len(generated)} 个向量")
             
-            return embeddings
+            return [embedding if embedding is not None else generated[text]
+                    for text, embedding in zip(cleaned_texts, embeddings)]
             
         except Exception as e:
             logger.error(f"生成向量失败: {e}")
             return []
     
-    async def generate_single_embedding(self, text: str) -> Optional[List[float]]:
+    async def generate_single_embedding(self, text: str, use_cache: bool = False) -> Optional[List[float]]:
         """生成单个文本的向量"""
-        embeddings = await self.generate_embeddings([text])
+        embeddings = await self.generate_embeddings([text], use_cache=use_cache)
         return embeddings[0] if embeddings else None
     
     def _clean_text(self, text: str) -> str:
@@ -73,8 +234,8 @@ class EmbeddingService:
         if not text:
             return ""
         
-        # 移除多余的空白字符
-        cleaned = ' '.join(text.split())
+        # 统一全角半角并移除多余的空白字符（与缓存键的规范化一致）
+        cleaned = normalize_text(text)
         
         # 限制长度（OpenAI有token限制）
         max_length = 8000  # 大约对应8k tokens
@@ -122,28 +283,30 @@ class VectorDatabase:
         # 嵌入服务
         self.embedding_service = EmbeddingService()
         
-        # 数据库连接（用于pgvector操作）
-        self.db_connection = None
-        if self.db_url:
-            try:
-                self.db_connection = psycopg2.connect(self.db_url)
-                logger.info("PostgreSQL数据库连接成功")
-            except Exception as e:
-                logger.warning(f"无法连接PostgreSQL数据库: {e}")
+        # 数据库连接池（用于pgvector操作，首次查询时建立连接）
+        self.pg = create_pool_from_env(self.db_url)
+        
+        # 同一时间只允许一个向量索引构建
+        self._index_lock = asyncio.Lock()
     
-    async def initialize_vector_tables(self):
-        """初始化向量表结构"""
+    async def initialize_vector_tables(self, index_type: Optional[str] = None):
+        """
+        初始化向量表结构
+        
+        Args:
+            index_type: 向量索引类型 ivfflat 或 hnsw，默认取PGVECTOR_INDEX_TYPE环境变量
+        """
         try:
-            if not self.db_connection:
+            if not self.pg:
                 logger.warning("没有数据库连接，跳过向量表初始化")
                 return
             
-            with self.db_connection.cursor() as cursor:
+            async with self.pg.acquire() as conn, conn.transaction():
                 # 启用pgvector扩展
-                cursor.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+                await conn.execute("CREATE EXTENSION IF NOT EXISTS vector;")
                 
                 # 创建景点向量表
-                cursor.execute("""
+                await conn.execute("""
                     CREATE TABLE IF NOT EXISTS spot_attraction_embeddings (
                         id SERIAL PRIMARY KEY,
                         attraction_id UUID REFERENCES spot_attractions(id) ON DELETE CASCADE,
@@ -159,31 +322,103 @@ class VectorDatabase:
                 """)
                 
                 # 创建向量索引
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS spot_attraction_embeddings_vector_idx 
-                    ON spot_attraction_embeddings 
-                    USING ivfflat (embedding vector_cosine_ops) 
-                    WITH (lists = 100);
-                """)
+                await conn.execute(self._vector_index_sql(index_type or os.getenv("PGVECTOR_INDEX_TYPE", "ivfflat")))
                 
                 # 创建其他索引
-                cursor.execute("""
+                await conn.execute("""
                     CREATE INDEX IF NOT EXISTS spot_attraction_embeddings_attraction_id_idx 
                     ON spot_attraction_embeddings (attraction_id);
                 """)
                 
-                cursor.execute("""
+                await conn.execute("""
                     CREATE INDEX IF NOT EXISTS spot_attraction_embeddings_content_type_idx 
                     ON spot_attraction_embeddings (content_type);
                 """)
-                
-                self.db_connection.commit()
-                logger.info("向量表结构初始化完成")
+            
+            # 扩展可能是刚创建的，让连接重新初始化以注册vector类型
+            self.pg.expire_connections()
+            logger.info("向量表结构初始化完成")
                 
         except Exception as e:
             logger.error(f"初始化向量表失败: {e}")
-            if self.db_connection:
-                self.db_connection.rollback()
+    
+    async def create_vector_index(self, index_type: str = "hnsw", lists: int = 100, m: int = 16,
+                                  ef_construction: int = 64, replace: bool = True) -> Dict[str, Any]:
+        """
+        创建（或重建）向量索引：新索引在线构建（CREATE INDEX CONCURRENTLY）后再替换旧索引，
+        构建期间不阻塞写入，旧索引继续服务查询
+        
+        Args:
+            index_type: ivfflat 或 hnsw
+            lists: ivfflat聚类数（建议约为行数/1000）
+            m: hnsw每个节点的连接数
+            ef_construction: hnsw建索引时的候选列表大小
+            replace: 是否删除另一种类型的向量索引（两种索引并存时规划器只会选其中一个）
+        
+        Returns:
+            创建的索引名和耗时
+        """
+        if index_type not in VECTOR_INDEX_NAMES:
+            raise ValueError(f"不支持的向量索引类型: {index_type}，可选: {', '.join(VECTOR_INDEX_NAMES)}")
+        if not self.pg:
+            raise ConnectionError("没有数据库连接，无法创建向量索引")
+        
+        if self._index_lock.locked():
+            raise RuntimeError("已有向量索引正在创建，请稍后再试")
+        
+        started = datetime.now()
+        name = VECTOR_INDEX_NAMES[index_type]
+        building = f"{name}_building"
+        async with self._index_lock, self.pg.acquire() as conn:
+            # 建索引远超普通查询的超时时间：timeout=None会回落到连接池的command_timeout，
+            # 因此每条语句显式传入超时，并放宽服务端statement_timeout（连接归还时RESET ALL恢复）
+            await conn.execute(f"SET statement_timeout = {int(VECTOR_INDEX_TIMEOUT * 1000)}")
+            # CONCURRENTLY不能在事务中执行：新索引先用临时名字在线构建，不阻塞写入，
+            # 构建完成前原有索引继续服务查询；上次中断留下的无效临时索引先删除
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {building}", timeout=VECTOR_INDEX_TIMEOUT)
+            try:
+                await conn.execute(
+                    self._vector_index_sql(index_type, lists, m, ef_construction, name=building, concurrently=True),
+                    timeout=VECTOR_INDEX_TIMEOUT
+                )
+            except Exception:
+                # 构建失败时CONCURRENTLY会留下无效索引，删除后再报错（删除失败时由下次构建清理）
+                try:
+                    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {building}", timeout=VECTOR_INDEX_TIMEOUT)
+                except Exception as e:
+                    logger.warning(f"删除未完成的向量索引 {building} 失败: {e}")
+                raise
+            
+            # 新索引可用后再替换旧索引，期间始终有可用的向量索引
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}", timeout=VECTOR_INDEX_TIMEOUT)
+            await conn.execute(f"ALTER INDEX {building} RENAME TO {name}", timeout=VECTOR_INDEX_TIMEOUT)
+            if replace:
+                for other_type, other_name in VECTOR_INDEX_NAMES.items():
+                    if other_type != index_type:
+                        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {other_name}", timeout=VECTOR_INDEX_TIMEOUT)
+            await conn.execute("ANALYZE spot_attraction_embeddings", timeout=VECTOR_INDEX_TIMEOUT)
+        
+        elapsed = (datetime.now() - started).total_seconds()
+        logger.info(f"向量索引 {name} 创建完成，耗时 {elapsed:.1f}s")
+        return {"index": name, "index_type": index_type, "elapsed_seconds": round(elapsed, 2)}
+    
+    @staticmethod
+    def _vector_index_sql(index_type: str, lists: int = 100, m: int = 16, ef_construction: int = 64,
+                          name: Optional[str] = None, concurrently: bool = False) -> str:
+        """向量索引的建索引语句（都使用余弦距离vector_cosine_ops）"""
+        if index_type not in VECTOR_INDEX_NAMES:
+            raise ValueError(f"不支持的向量索引类型: {index_type}")
+        name = name or VECTOR_INDEX_NAMES[index_type]
+        if index_type == "hnsw":
+            options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+        else:
+            options = f"lists = {int(lists)}"
+        return f"""
+            CREATE INDEX {"CONCURRENTLY " if concurrently else ""}IF NOT EXISTS {name} 
+            ON spot_attraction_embeddings 
+            USING {index_type} (embedding vector_cosine_ops) 
+            WITH ({options});
+        """
     
     async def store_attraction_embeddings(self, attraction_id: str, contents: Dict[str, str], language_code: str = 'zh-CN'):
         """存储景点向量"""
@@ -209,7 +444,7 @@ class VectorDatabase:
                     continue
                 
                 # 存储到数据库
-                if self.db_connection:
+                if self.pg:
                     await self._store_embedding_to_postgres(
                         attraction_id, content_type, language_code, text, embedding, content_hash
                     )
@@ -231,14 +466,13 @@ class VectorDatabase:
     async def _embedding_exists(self, attraction_id: str, content_type: str, language_code: str, content_hash: str) -> bool:
         """检查向量是否已存在"""
         try:
-            if self.db_connection:
-                with self.db_connection.cursor() as cursor:
-                    cursor.execute("""
-                        SELECT id FROM spot_attraction_embeddings 
-                        WHERE attraction_id = %s AND content_type = %s 
-                        AND language_code = %s AND content_hash = %s
-                    """, (attraction_id, content_type, language_code, content_hash))
-                    return cursor.fetchone() is not None
+            if self.pg:
+                row_id = await self.pg.fetchval("""
+                    SELECT id FROM spot_attraction_embeddings 
+                    WHERE attraction_id = $1 AND content_type = $2 
+                    AND language_code = $3 AND content_hash = $4
+                """, attraction_id, content_type, language_code, content_hash)
+                return row_id is not None
             else:
                 result = self.supabase.table('spot_attraction_embeddings')\
                     .select('id')\
@@ -257,24 +491,19 @@ class VectorDatabase:
                                          language_code: str, text: str, embedding: List[float], content_hash: str):
         """存储向量到PostgreSQL"""
         try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO spot_attraction_embeddings 
-                    (attraction_id, content_type, language_code, content_text, embedding, content_hash)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (attraction_id, content_type, language_code, content_hash) 
-                    DO UPDATE SET 
-                        content_text = EXCLUDED.content_text,
-                        embedding = EXCLUDED.embedding,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (attraction_id, content_type, language_code, text, embedding, content_hash))
-                
-                self.db_connection.commit()
+            await self.pg.execute("""
+                INSERT INTO spot_attraction_embeddings 
+                (attraction_id, content_type, language_code, content_text, embedding, content_hash)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (attraction_id, content_type, language_code, content_hash) 
+                DO UPDATE SET 
+                    content_text = EXCLUDED.content_text,
+                    embedding = EXCLUDED.embedding,
+                    updated_at = CURRENT_TIMESTAMP
+            """, attraction_id, content_type, language_code, text, np.asarray(embedding, dtype=np.float32), content_hash)
                 
         except Exception as e:
             logger.error(f"存储向量到PostgreSQL失败: {e}")
-            if self.db_connection:
-                self.db_connection.rollback()
             raise
     
     async def _store_embedding_to_supabase(self, attraction_id: str, content_type: str,
@@ -299,74 +528,219 @@ class VectorDatabase:
             raise
     
     async def similarity_search(self, query: str, language_code: str = 'zh-CN', 
-                              limit: int = 10, threshold: float = 0.7) -> List[Dict]:
-        """基于向量相似度搜索景点"""
+                              limit: int = 10, threshold: float = 0.7,
+                              probes: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict]:
+        """
+        基于向量相似度搜索景点
+        
+        Args:
+            query: 查询文本
+            language_code: 语言
+            limit: 返回数量
+            threshold: 最低余弦相似度
+            probes: ivfflat扫描的聚类数（越大越准越慢），默认取PGVECTOR_PROBES环境变量
+            ef_search: hnsw搜索的候选列表大小，默认取PGVECTOR_EF_SEARCH环境变量
+            （指定probes或ef_search时不走本地索引优先路径；每条结果的search_backend记录检索来源）
+        """
         try:
             # 生成查询向量
-            query_embedding = await self.embedding_service.generate_single_embedding(query)
+            query_embedding = await self.embedding_service.generate_single_embedding(query, use_cache=True)
             if not query_embedding:
                 logger.error("无法生成查询向量")
                 return []
             
-            # 执行相似度搜索
-            if self.db_connection:
-                results = await self._similarity_search_postgres(
-                    query_embedding, language_code, limit, threshold
-                )
-            else:
-                results = await self._similarity_search_supabase(
+            # 执行相似度搜索：本地索引优先（prefer模式），其次PostgreSQL；
+            # 数据库连接不可用时退回本地索引，都不可用时退回Supabase
+            results, backend = None, None
+            use_local = local_vector_index.ready(language_code)
+            if use_local and self._prefer_local(probes, ef_search):
+                results, backend = await asyncio.to_thread(
+                    local_vector_index.search, query_embedding, language_code, limit, threshold
+                ), "local"
+            if results is None and self.pg:
+                results, backend = await self._similarity_search_postgres(
+                    query_embedding, language_code, limit, threshold, probes, ef_search
+                ), "postgres"
+            if results is None and use_local:
+                results, backend = await asyncio.to_thread(
+                    local_vector_index.search, query_embedding, language_code, limit, threshold
+                ), "local"
+            if results is None:
+                results, backend = await self._similarity_search_supabase(
                     query_embedding, language_code, limit, threshold
-                )
+                ), "supabase"
             
-            logger.info(f"相似度搜索返回 {len(results)} 个结果")
-            return results
+            logger.info(f"相似度搜索返回 {len(results)} 个结果（{backend}）")
+            return self._tag_backend(results, backend)
             
         except Exception as e:
             logger.error(f"相似度搜索失败: {e}")
             return []
     
-    async def _similarity_search_postgres(self, query_embedding: List[float], 
-                                        language_code: str, limit: int, threshold: float) -> List[Dict]:
-        """使用PostgreSQL进行相似度搜索"""
+    async def _similarity_search_postgres(self, query_embedding: List[float], language_code: str, limit: int,
+                                        threshold: float, probes: Optional[int] = None,
+                                        ef_search: Optional[int] = None) -> Optional[List[Dict]]:
+        """使用PostgreSQL进行相似度搜索，连接不可用时返回None"""
         try:
-            with self.db_connection.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute("""
-                    SELECT 
-                        e.attraction_id,
-                        e.content_type,
-                        e.content_text,
-                        e.embedding <-> %s::vector as distance,
-                        1 - (e.embedding <-> %s::vector) as similarity,
-                        a.name,
-                        a.category,
-                        a.city,
-                        a.country,
-                        a.address,
-                        a.main_image_url,
-                        ST_X(a.location) as longitude,
-                        ST_Y(a.location) as latitude
-                    FROM spot_attraction_embeddings e
-                    JOIN spot_attractions a ON e.attraction_id = a.id
-                    WHERE e.language_code = %s
-                    AND 1 - (e.embedding <-> %s::vector) >= %s
-                    ORDER BY e.embedding <-> %s::vector
-                    LIMIT %s
-                """, (query_embedding, query_embedding, language_code, query_embedding, threshold, query_embedding, limit))
-                
-                rows = cursor.fetchall()
-                
-                # 转换为字典列表
-                results = []
-                for row in rows:
-                    result = dict(row)
-                    results.append(result)
-                
-                return results
+            rows = await self.pg.fetch(
+                SIMILARITY_SQL,
+                np.asarray(query_embedding, dtype=np.float32), language_code, threshold, limit,
+                settings=self._search_settings(probes, ef_search)
+            )
+            
+            # 转换为字典列表
+            return [dict(row) for row in rows]
                 
+        except (ConnectionError, OSError) as e:
+            logger.warning(f"PostgreSQL不可用，改用Supabase搜索: {e}")
+            return None
         except Exception as e:
             logger.error(f"PostgreSQL相似度搜索失败: {e}")
             return []
     
+    def _prefer_local(self, probes: Optional[int], ef_search: Optional[int]) -> bool:
+        """是否先查本地索引：指定了probes/ef_search时这些参数只对PostgreSQL有效，直接查数据库"""
+        if local_vector_index.mode != "prefer":
+            return False
+        if (probes or ef_search) and self.pg:
+            logger.info("指定了向量索引参数，跳过本地索引直接查询PostgreSQL")
+            return False
+        return True
+    
+    @staticmethod
+    def _tag_backend(results: List[Dict], backend: str) -> List[Dict]:
+        """在每条结果中记录检索来源（local / postgres / supabase）"""
+        for result in results:
+            result['search_backend'] = backend
+        return results
+    
+    @staticmethod
+    def _search_settings(probes: Optional[int] = None, ef_search: Optional[int] = None) -> Dict[str, int]:
+        """单次查询的向量索引参数（未指定时使用环境变量，都没有时使用pgvector默认值）"""
+        settings = {}
+        probes = probes or os.getenv("PGVECTOR_PROBES")
+        ef_search = ef_search or os.getenv("PGVECTOR_EF_SEARCH")
+        if probes:
+            settings["ivfflat.probes"] = int(probes)
+        if ef_search:
+            settings["hnsw.ef_search"] = int(ef_search)
+        return settings
+    
+    async def benchmark_recall(self, k: int = 10, samples: int = 50, language_code: str = 'zh-CN',
+                               probes: Optional[List[int]] = None,
+                               ef_search: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        向量索引召回率基准测试：每种参数设置的recall@k和平均耗时，以精确搜索（禁用索引扫描）为准
+        
+        Args:
+            k: 每个查询取前k个
+            samples: 查询数量（从已存储的向量中随机抽取）
+            language_code: 语言
+            probes: 要测试的ivfflat.probes取值
+            ef_search: 要测试的hnsw.ef_search取值
+        
+        Returns:
+            {"exact_ms": 精确搜索平均耗时, "results": [{"setting", "recall", "avg_ms"}, ...]}
+        """
+        if not self.pg:
+            raise ConnectionError("没有数据库连接，无法测试召回率")
+        
+        # 查询向量取自已存储的行，该行在精确和近似结果中都必然排第一，计算召回率时排除，避免虚高
+        queries = [(row['id'], row['embedding'])
+                   for row in await self.pg.fetch(SAMPLE_EMBEDDINGS_SQL, language_code, samples)]
+        if not queries:
+            return {"queries": 0, "exact_ms": 0.0, "results": []}
+        
+        async def run(settings: Dict[str, Any]) -> Tuple[List[set], float]:
+            found, started = [], asyncio.get_running_loop().time()
+            for query_id, query in queries:
+                rows = await self.pg.fetch(NEAREST_IDS_SQL, query, language_code, k, query_id, settings=settings)
+                found.append({row['id'] for row in rows})
+            return found, (asyncio.get_running_loop().time() - started) / len(queries) * 1000
+        
+        truth, exact_ms = await run({"enable_indexscan": "off", "enable_bitmapscan": "off"})
+        settings_list = [{"ivfflat.probes": p} for p in (probes or [])] + \
+                        [{"hnsw.ef_search": e} for e in (ef_search or [])]
+        if not settings_list:
+            settings_list = [{}]
+        
+        results = []
+        for settings in settings_list:
+            found, avg_ms = await run(settings)
+            hits = sum(len(expected & got) for expected, got in zip(truth, found))
+            total = sum(len(expected) for expected in truth)
+            results.append({
+                "setting": settings or "default",
+                "recall": round(hits / total, 4) if total else 1.0,
+                "avg_ms": round(avg_ms, 2)
+            })
+            logger.info(f"召回率基准 {settings or 'default'}: recall@{k}={results[-1]['recall']}, {avg_ms:.1f}ms")
+        
+        return {"queries": len(queries), "k": k, "exact_ms": round(exact_ms, 2), "results": results}
+    
+    async def fetch_embedding_rows(self, since: Optional[str] = None,
+                                   batch_size: int = 1000) -> AsyncIterator[List[Dict]]:
+        """
+        按批读取向量行（本地索引同步的数据源）
+        
+        Args:
+            since: 只读取updated_at不早于该时间的行，None表示全部
+            batch_size: 每批行数
+        
+        Yields:
+            向量行列表，embedding为float32数组
+        """
+        if self.pg:
+            last_updated = datetime.fromisoformat(since) if since else datetime(1970, 1, 1)
+            # 游标时间相同的行会重新读取一次，写入本地索引时按id覆盖
+            last_id = 0 if since is None else -1
+            while True:
+                rows = await self.pg.fetch(SYNC_ROWS_SQL, last_updated, last_id, batch_size)
+                if not rows:
+                    return
+                batch = [dict(row) for row in rows]
+                for row in batch:
+                    row['embedding'] = self._parse_embedding(row['embedding'])
+                    row['updated_at'] = row['updated_at'].isoformat()
+                yield batch
+                last_updated, last_id = rows[-1]['updated_at'], rows[-1]['id']
+            return
+        
+        # 没有直接数据库连接时通过Supabase分页读取
+        offset = 0
+        while True:
+            query = self.supabase.table('spot_attraction_embeddings')\
+                .select('id, attraction_id, content_type, language_code, content_text, embedding, updated_at, '
+                        'spot_attractions(*)')
+            if since:
+                query = query.gte('updated_at', since)
+            result = await asyncio.to_thread(
+                query.order('updated_at').order('id').range(offset, offset + batch_size - 1).execute
+            )
+            if not result.data:
+                return
+            batch = []
+            for row in result.data:
+                attraction = row.pop('spot_attractions', None) or {}
+                row['embedding'] = self._parse_embedding(row['embedding'])
+                for field in ('name', 'category', 'city', 'country', 'address', 'main_image_url',
+                              'longitude', 'latitude'):
+                    row[field] = attraction.get(field)
+                batch.append(row)
+            yield batch
+            if len(result.data) < batch_size:
+                return
+            offset += batch_size
+    
+    @staticmethod
+    def _parse_embedding(value) -> np.ndarray:
+        """解析向量字段（未注册pgvector类型时是文本格式 [1,2,...]；新版pgvector解码为Vector对象）"""
+        if isinstance(value, str):
+            value = json.loads(value)
+        elif hasattr(value, 'to_numpy'):
+            value = value.to_numpy()
+        return np.asarray(value, dtype=np.float32)
+    
     async def _similarity_search_supabase(self, query_embedding: List[float],
                                         language_code: str, limit: int, threshold: float) -> List[Dict]:
         """使用Supabase进行相似度搜索（备用方案）"""
@@ -464,66 +838,143 @@ class VectorDatabase:
             logger.error(f"批量处理景点失败: {e}")
     
     async def search_attractions_by_semantic(self, query: str, location: Optional[Tuple[float, float]] = None,
-                                           radius_km: float = 50, limit: int = 10) -> List[Dict]:
-        """语义搜索景点（结合地理位置）"""
+                                           radius_km: float = 50, limit: int = 10, language_code: str = 'zh-CN',
+                                           similarity_weight: Optional[float] = None,
+                                           probes: Optional[int] = None,
+                                           ef_search: Optional[int] = None) -> List[Dict]:
+        """
+        语义搜索景点（结合地理位置）
+        
+        指定位置时距离过滤在检索内部完成（PostgreSQL混合查询或本地索引），
+        范围内的景点足够时恰好返回limit个
+        
+        Args:
+            query: 查询文本
+            location: (纬度, 经度)，为空时只做语义搜索
+            radius_km: 搜索半径（公里）
+            limit: 返回数量
+            language_code: 语言
+            similarity_weight: 综合得分中相似度的权重（其余为距离），默认取HYBRID_SIMILARITY_WEIGHT
+            probes, ef_search: 向量索引参数，见similarity_search
+        """
         try:
-            # 先进行语义搜索
-            semantic_results = await self.similarity_search(query, limit=limit * 2)
-            
             if not location:
-                return semantic_results[:limit]
+                return await self.similarity_search(
+                    query, language_code, limit=limit, probes=probes, ef_search=ef_search
+                )
             
-            # 结合地理位置过滤
-            lat, lon = location
-            filtered_results = []
+            query_embedding = await self.embedding_service.generate_single_embedding(query, use_cache=True)
+            if not query_embedding:
+                logger.error("无法生成查询向量")
+                return []
             
-            for result in semantic_results:
-                if 'latitude' in result and 'longitude' in result:
-                    attr_lat = result['latitude']
-                    attr_lon = result['longitude']
-                    
-                    # 计算距离
-                    distance = self._calculate_distance(lat, lon, attr_lat, attr_lon)
-                    
-                    if distance <= radius_km:
-                        result['distance_km'] = distance
-                        filtered_results.append(result)
-            
-            # 按相似度和距离综合排序
-            filtered_results.sort(key=lambda x: (
-                -x.get('similarity', 0) * 0.7 +  # 相似度权重70%
-                x.get('distance_km', 0) / radius_km * 0.3  # 距离权重30%
-            ))
+            lat, lon = location
+            weight = HYBRID_SIMILARITY_WEIGHT if similarity_weight is None else similarity_weight
+            
+            # 检索顺序与similarity_search相同：本地索引（prefer）> PostgreSQL > 本地索引（fallback）> Supabase
+            results, backend = None, None
+            use_local = local_vector_index.ready(language_code)
+            if use_local and self._prefer_local(probes, ef_search):
+                results, backend = await asyncio.to_thread(
+                    local_vector_index.search_nearby, query_embedding, lat, lon, radius_km, language_code, limit, weight
+                ), "local"
+            if results is None and self.pg:
+                results, backend = await self._hybrid_search_postgres(
+                    query_embedding, lat, lon, radius_km, language_code, limit, weight, probes, ef_search
+                ), "postgres"
+            if results is None and use_local:
+                results, backend = await asyncio.to_thread(
+                    local_vector_index.search_nearby, query_embedding, lat, lon, radius_km, language_code, limit, weight
+                ), "local"
+            if results is None:
+                semantic_results = await self._similarity_search_supabase(
+                    query_embedding, language_code, HYBRID_CANDIDATES, 0.0
+                )
+                results, backend = self._rank_by_distance(semantic_results, lat, lon, radius_km, limit, weight), "supabase"
             
-            return filtered_results[:limit]
+            logger.info(f"位置语义搜索返回 {len(results)} 个结果（{backend}）")
+            return self._tag_backend(results, backend)
             
         except Exception as e:
             logger.error(f"语义搜索失败: {e}")
             return []
     
-    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """计算两点间距离（公里）"""
-        import math
-        
-        R = 6371  # 地球半径（公里）
-        
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(dlat/2) * math.sin(dlat/2) + 
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-             math.sin(dlon/2) * math.sin(dlon/2))
+    async def _hybrid_search_postgres(self, query_embedding: List[float], lat: float, lon: float, radius_km: float,
+                                      language_code: str, limit: int, similarity_weight: float,
+                                      probes: Optional[int] = None,
+                                      ef_search: Optional[int] = None) -> Optional[List[Dict]]:
+        """PostgreSQL混合查询（位置过滤 + 向量排序），连接不可用时返回None"""
+        lat_min, lat_max, lon_min, lon_max = bounding_box(lat, lon, radius_km)
+        if lon_min is None:
+            lon_min, lon_max = -180.0, 180.0
+        args = (
+            np.asarray(query_embedding, dtype=np.float32), language_code, lon, lat, radius_km * 1000,
+            max(HYBRID_CANDIDATES, limit * 20), similarity_weight, limit,
+            lon_min, lat_min, lon_max, lat_max
+        )
+        try:
+            settings = self._search_settings(probes, ef_search)
+            # 近似索引先取候选再过滤位置，范围较小时候选可能不足（可用PGVECTOR_ITERATIVE_SCAN开启pgvector的迭代扫描）
+            iterative_scan = os.getenv("PGVECTOR_ITERATIVE_SCAN")
+            if iterative_scan:
+                settings.update({"hnsw.iterative_scan": iterative_scan, "ivfflat.iterative_scan": iterative_scan})
+            rows = await self.pg.fetch(HYBRID_SQL, *args, settings=settings)
+            
+            if len(rows) < limit:
+                # 结果不足时不用向量索引重新查询：经纬度范围走location的GiST位图扫描粗筛，
+                # 再对范围内的向量精确排序（enable_indexscan不影响位图扫描）
+                rows = await self.pg.fetch(HYBRID_SQL, *args, settings={"enable_indexscan": "off"})
+            
+            return [dict(row) for row in rows]
+            
+        except (ConnectionError, OSError) as e:
+            logger.warning(f"PostgreSQL不可用，改用其他方式搜索: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"PostgreSQL位置语义搜索失败: {e}")
+            return []
+    
+    def _rank_by_distance(self, semantic_results: List[Dict], lat: float, lon: float, radius_km: float,
+                          limit: int, similarity_weight: float) -> List[Dict]:
+        """对语义搜索结果按距离过滤、每个景点保留一条，并按综合得分排序（无法在检索中过滤位置时使用）"""
+        located_results = [
+            result for result in semantic_results
+            if result.get('latitude') is not None and result.get('longitude') is not None
+        ]
+        if not located_results:
+            return []
         
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
+        # 一次性向量化计算所有结果的距离
+        distances = one_to_many_km(
+            lat, lon,
+            [result['latitude'] for result in located_results],
+            [result['longitude'] for result in located_results]
+        )
+        best = {}
+        for result, distance in zip(located_results, distances.tolist()):
+            if distance > radius_km:
+                continue
+            result['distance_km'] = distance
+            result['score'] = combined_score(result.get('similarity', 0), distance, radius_km, similarity_weight)
+            current = best.get(result.get('attraction_id'))
+            if current is None or result['score'] > current['score']:
+                best[result.get('attraction_id')] = result
         
-        return distance
+        return sorted(best.values(), key=lambda x: x['score'], reverse=True)[:limit]
     
-    def close(self):
-        """关闭数据库连接"""
-        if self.db_connection:
-            self.db_connection.close()
-            logger.info("数据库连接已关闭")
+    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """计算两点间距离（公里）"""
+        return distance_km(lat1, lon1, lat2, lon2)
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """获取数据库连接池指标"""
+        return self.pg.stats() if self.pg else {"created": False, "configured": False}
+    
+    async def close(self):
+        """关闭数据库连接池"""
+        if self.pg:
+            await self.pg.close()
+            logger.info("数据库连接池已关闭")
 
 
 # 全局向量数据库实例
@@ -534,4 +985,21 @@ def get_vector_database() -> VectorDatabase:
     global vector_db
     if vector_db is None:
         vector_db = VectorDatabase()
-    return vector_db
\ No newline at end of file
+    return vector_db
+
+async def start_local_vector_index():
+    """启动本地向量索引的后台同步（应用启动时调用，缺少数据库配置时跳过）"""
+    if local_vector_index.mode == "off":
+        return
+    try:
+        db = get_vector_database()
+    except Exception as e:
+        logger.warning(f"向量数据库不可用，本地向量索引不同步: {e}")
+        return
+    await local_vector_index.start(db.fetch_embedding_rows)
+
+async def close_vector_database():
+    """停止本地索引同步并关闭向量数据库实例的连接池（应用关闭时调用）"""
+    await local_vector_index.stop()
+    if vector_db is not None:
+        await vector_db.close()
\ No newline at end of file
@@ -0,0 +1,359 @@
+"""
+Doro视频生成任务队列
+提交请求时只保存输入并立即返回任务ID；后台任务生成静态合影并提交Veo作业，
+由单个调度循环统一轮询所有进行中的Veo作业。任务状态和输入文件保存在本地，
+服务重启后会恢复未完成的任务
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from gemini_service import gemini_service
+from doro_assets import doro_assets
+from generation_pool import generation_pool
+from media_streaming import generated_media_url
+from upload_spool import SpooledUpload
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "video_jobs.db")
+DEFAULT_INPUT_DIR = os.path.join(DATA_DIR, "video_jobs")
+
+# 任务状态：queued（已接受）→ starting（生成静态合影并提交Veo作业）→ running（Veo作业进行中）→ succeeded / failed
+ACTIVE_STATUSES = ("queued", "starting", "running")
+
+
+class VideoJobStore:
+    """视频任务的SQLite持久化存储"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS video_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_video_jobs_status ON video_jobs(status)")
+        self._lock = threading.Lock()
+
+    def save(self, job: Dict[str, Any]):
+        job["updated_at"] = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO video_jobs (id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job["id"], job["status"], json.dumps(job, ensure_ascii=False), job["created_at"], job["updated_at"])
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM video_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT data FROM video_jobs WHERE status IN ({placeholders}) ORDER BY created_at",
+                ACTIVE_STATUSES
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class VideoJobManager:
+    """视频生成任务管理"""
+
+    def __init__(self, store: VideoJobStore, input_dir: str = DEFAULT_INPUT_DIR,
+                 poll_interval: float = 10, max_wait: float = 600):
+        """
+        初始化任务管理器
+
+        Args:
+            store: 任务持久化存储
+            input_dir: 保存任务输入图片的目录
+            poll_interval: 轮询Veo作业状态的间隔（秒）
+            max_wait: Veo作业的最长等待时间（秒），超时后任务失败
+        """
+        self.store = store
+        self.input_dir = input_dir
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+
+        # 进行中的任务缓存在内存中，完成后只保留在SQLite
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: set = set()
+        self._poller: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # ==================== 对外接口 ====================
+
+    async def start(self):
+        """启动调度循环，并恢复上次运行时未完成的任务"""
+        self._wakeup = asyncio.Event()
+        for job in self.store.list_active():
+            self._jobs[job["id"]] = job
+            if job["status"] == "running":
+                continue
+            if not self._has_inputs(job):
+                self._fail(job, "任务输入已丢失，请重新提交")
+                continue
+            # 重启前已经接受的任务不受准入限制
+            generation_pool.acquire(force=True)
+            self._spawn(self._start_job(job))
+
+        resumed = len(self._jobs)
+        if resumed:
+            logger.info(f"恢复了 {resumed} 个未完成的视频任务")
+        self._poller = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        """停止调度循环（进行中的任务保留在存储中，下次启动时恢复）"""
+        tasks = [t for t in (self._poller, *self._tasks) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._poller = None
+
+    async def submit(self, inputs: Dict[str, SpooledUpload], attraction_info: Dict,
+                     doro_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        提交视频生成任务，生成任务池已满时抛出GenerationPoolSaturated（HTTP 429）
+
+        Args:
+            inputs: 已落盘的输入图片，键为user_photo/doro_photo/style_photo，文件会被移动到任务目录
+            attraction_info: 景点信息
+            doro_id: 使用预设或已保存的Doro时的ID（此时inputs中没有doro_photo）
+
+        Returns:
+            任务的公开信息
+        """
+        generation_pool.acquire()
+        try:
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            job = {
+                "id": job_id,
+                "status": "queued",
+                "message": "任务已提交，等待生成",
+                "attraction_info": attraction_info,
+                "doro_id": doro_id,
+                "inputs": {},
+                "created_at": now,
+                "updated_at": now
+            }
+
+            job_dir = os.path.join(self.input_dir, job_id)
+            os.makedirs(job_dir, exist_ok=True)
+            for field, upload in inputs.items():
+                upload.move_to(os.path.join(job_dir, field))
+                job["inputs"][field] = upload.filename
+
+            self.store.save(job)
+            self._jobs[job_id] = job
+        except BaseException:
+            generation_pool.release()
+            raise
+
+        self._spawn(self._start_job(job))
+        logger.info(f"视频任务已提交: {job_id} ({attraction_info.get('name')})")
+        return self.public_view(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务的公开信息"""
+        job = self._jobs.get(job_id) or self.store.get(job_id)
+        return self.public_view(job) if job else None
+
+    @staticmethod
+    def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+        """返回给客户端的任务信息（不包含内部字段）"""
+        view = {
+            "job_id": job["id"],
+            "status": job["status"],
+            "message": job.get("message"),
+            "attraction_name": job["attraction_info"].get("name"),
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "status_url": f"/api/doro/jobs/{job['id']}"
+        }
+        if job.get("static_image_filename"):
+            view["static_image_url"] = generated_media_url(job["static_image_filename"])
+        if job["status"] == "succeeded":
+            view.update({
+                "video_url": generated_media_url(job["filename"]),
+                "filename": job["filename"],
+                "prompt_used": job.get("prompt_used"),
+                "generation_time": job.get("generation_time")
+            })
+        return view
+
+    # ==================== 任务执行 ====================
+
+    async def _start_job(self, job: Dict[str, Any]):
+        """生成静态合影并提交Veo作业（占用一个生成任务名额）"""
+        try:
+            job["status"] = "starting"
+            job["message"] = "正在生成静态合影"
+            self.store.save(job)
+
+            uploads = self._load_inputs(job)
+            if job.get("doro_id"):
+                uploads["doro_photo"] = await doro_assets.get(job["doro_id"])
+                if uploads["doro_photo"] is None:
+                    self._fail(job, "指定的Doro不存在")
+                    return
+            success, message, result = await gemini_service.start_doro_video_operation(
+                user_photo=uploads["user_photo"],
+                doro_photo=uploads["doro_photo"],
+                style_photo=uploads.get("style_photo"),
+                attraction_info=job["attraction_info"]
+            )
+            if not success:
+                self._fail(job, message)
+                return
+
+            job.update(result)
+            job["status"] = "running"
+            job["message"] = "视频生成中"
+            job["started_at"] = time.time()
+            self.store.save(job)
+            self._remove_inputs(job["id"])
+            self._wakeup.set()
+        except asyncio.CancelledError:
+            # 服务关闭，任务保留为未完成状态，下次启动时重新执行
+            raise
+        except Exception as e:
+            logger.error(f"视频任务 {job['id']} 启动失败: {e}")
+            self._fail(job, f"视频生成失败: {str(e)}")
+        finally:
+            generation_pool.release()
+
+    async def _poll_loop(self):
+        """统一轮询所有进行中的Veo作业（单个作业或单轮轮询出错都不会结束轮询任务）"""
+        while True:
+            try:
+                running = [job for job in self._jobs.values() if job["status"] == "running"]
+                if running:
+                    await asyncio.gather(*(self._poll_job(job) for job in running), return_exceptions=True)
+
+                self._wakeup.clear()
+                try:
+                    # 没有进行中的作业时一直等待新任务，否则按轮询间隔检查
+                    timeout = self.poll_interval if any(
+                        job["status"] == "running" for job in self._jobs.values()
+                    ) else None
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                    # 新提交的作业至少等待一个轮询间隔再查询
+                    await asyncio.sleep(self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"视频任务轮询出错: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _poll_job(self, job: Dict[str, Any]):
+        """查询一个作业的状态，任何异常都记为该作业失败"""
+        try:
+            await self._check_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"视频任务 {job['id']} 处理失败: {e}")
+            self._fail(job, f"视频生成失败: {str(e)}")
+
+    async def _check_job(self, job: Dict[str, Any]):
+        waited = time.time() - job["started_at"]
+        try:
+            operation = await asyncio.to_thread(gemini_service.get_video_operation, job["operation_name"])
+        except Exception as e:
+            logger.warning(f"查询视频任务 {job['id']} 状态失败: {e}")
+            if waited > self.max_wait:
+                self._fail(job, "视频生成超时，请稍后重试")
+            return
+
+        if getattr(operation, "error", None):
+            self._fail(job, f"视频生成失败: {operation.error}")
+            return
+
+        if not operation.done:
+            if waited > self.max_wait:
+                self._fail(job, "视频生成超时，请稍后重试")
+            else:
+                logger.info(f"⏳ 视频任务 {job['id']} 生成中... 已等待 {int(waited)}秒")
+            return
+
+        success, message, result = await asyncio.to_thread(
+            gemini_service.save_generated_video, operation, job["attraction_info"].get("name")
+        )
+        if not success:
+            self._fail(job, message)
+            return
+
+        job.update(result)
+        job["status"] = "succeeded"
+        job["message"] = message
+        job["generation_time"] = round(waited, 1)
+        self.store.save(job)
+        self._jobs.pop(job["id"], None)
+
+    # ==================== 内部方法 ====================
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _fail(self, job: Dict[str, Any], message: str):
+        logger.error(f"视频任务 {job['id']} 失败: {message}")
+        job["status"] = "failed"
+        job["message"] = message
+        try:
+            self.store.save(job)
+            self._jobs.pop(job["id"], None)
+        except Exception as e:
+            # 保存失败时保留内存中的失败状态，状态查询仍能看到结果
+            logger.error(f"保存视频任务 {job['id']} 状态失败: {e}")
+        self._remove_inputs(job["id"])
+
+    def _has_inputs(self, job: Dict[str, Any]) -> bool:
+        job_dir = os.path.join(self.input_dir, job["id"])
+        required = ("user_photo",) if job.get("doro_id") else ("user_photo", "doro_photo")
+        return all(os.path.exists(os.path.join(job_dir, field)) for field in required)
+
+    def _load_inputs(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        # 图片处理进程直接按路径读取任务目录中的文件，不读入内存
+        job_dir = os.path.join(self.input_dir, job["id"])
+        return {
+            field: SpooledUpload.from_file(os.path.join(job_dir, field), filename)
+            for field, filename in job["inputs"].items()
+        }
+
+    def _remove_inputs(self, job_id: str):
+        shutil.rmtree(os.path.join(self.input_dir, job_id), ignore_errors=True)
+
+
+# 全局实例
+video_job_manager = VideoJobManager(
+    store=VideoJobStore(os.getenv("VIDEO_JOBS_DB", DEFAULT_DB_PATH)),
+    poll_interval=float(os.getenv("VIDEO_JOB_POLL_INTERVAL", "10")),
+    max_wait=float(os.getenv("VIDEO_JOB_MAX_WAIT", "600"))
+)
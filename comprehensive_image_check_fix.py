@@ -13,7 +13,6 @@ import os
 import sys
 import json
 import asyncio
-import aiohttp
 import logging
 import requests
 from typing import List, Dict, Optional
@@ -24,6 +23,7 @@ from dotenv import load_dotenv
 sys.path.append('backend')
 
 from supabase_client import supabase_client
+from http_client import http_clients
 
 # 加载环境变量
 load_dotenv()
@@ -113,9 +113,9 @@ class ComprehensiveImageChecker:
     async def check_image_accessibility(self, url: str) -> bool:
         """检查图片URL是否可访问"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.head(url, timeout=10) as response:
-                    return response.status == 200
+            session = http_clients.get("media")
+            async with session.head(url, timeout=10) as response:
+                return response.status == 200
         except Exception as e:
             logger.warning(f"图片访问检查失败 {url}: {e}")
             return False
@@ -132,32 +132,32 @@ class ComprehensiveImageChecker:
                 "size": "large"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        images = []
-                        
-                        for photo in data.get("photos", []):
-                            image_info = {
-                                "id": photo["id"],
-                                "url": photo["src"]["large"],
-                                "medium_url": photo["src"]["medium"],
-                                "thumbnail": photo["src"]["tiny"],
-                                "description": photo.get("alt", query) or query,
-                                "photographer": photo["photographer"],
-                                "photographer_url": photo["photographer_url"],
-                                "source": "Pexels",
-                                "width": photo["width"],
-                                "height": photo["height"],
-                                "quality": "high"
-                            }
-                            images.append(image_info)
-                        
-                        logger.info(f"Pexels图片搜索成功: {query} -> {len(images)}张图片")
-                        return images
-                    else:
-                        logger.error(f"Pexels图片搜索失败: {response.status}")
+            session = http_clients.get("image_search")
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    images = []
+                    
+                    for photo in data.get("photos", []):
+                        image_info = {
+                            "id": photo["id"],
+                            "url": photo["src"]["large"],
+                            "medium_url": photo["src"]["medium"],
+                            "thumbnail": photo["src"]["tiny"],
+                            "description": photo.get("alt", query) or query,
+                            "photographer": photo["photographer"],
+                            "photographer_url": photo["photographer_url"],
+                            "source": "Pexels",
+                            "width": photo["width"],
+                            "height": photo["height"],
+                            "quality": "high"
+                        }
+                        images.append(image_info)
+                    
+                    logger.info(f"Pexels图片搜索成功: {query} -> {len(images)}张图片")
+                    return images
+                else:
+                    logger.error(f"Pexels图片搜索失败: {response.status}")
             
             return []
             
@@ -414,6 +414,8 @@ async def main():
         logger.info("用户中断操作")
     except Exception as e:
         logger.error(f"程序执行失败: {e}")
+    finally:
+        await http_clients.close()
 
 
 if __name__ == "__main__":
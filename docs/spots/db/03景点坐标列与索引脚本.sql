@@ -0,0 +1,26 @@
+-- Spot地图相册系统 - 景点坐标列与索引脚本
+-- Coordinate Columns and Indexes for spot_attractions
+-- =====================================
+-- 版本: v1.0
+--
+-- 说明:
+-- PostGIS RPC不可用时，后端的备用查询通过PostgREST的gte/lte过滤经纬度范围，
+-- 并使用updated_at水位线判断景点快照是否过期。
+-- 本脚本为spot_attractions添加由location生成的经纬度列，以及相应的B树索引
+-- =====================================
+
+BEGIN;
+
+-- 由location自动生成的经纬度列，写入时无需额外维护
+ALTER TABLE spot_attractions
+    ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION GENERATED ALWAYS AS (ST_Y(location)) STORED,
+    ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION GENERATED ALWAYS AS (ST_X(location)) STORED;
+
+-- 经纬度范围查询索引
+CREATE INDEX IF NOT EXISTS idx_spot_attractions_latitude ON spot_attractions(latitude);
+CREATE INDEX IF NOT EXISTS idx_spot_attractions_longitude ON spot_attractions(longitude);
+
+-- 快照水位线查询索引（ORDER BY updated_at DESC LIMIT 1）
+CREATE INDEX IF NOT EXISTS idx_spot_attractions_updated_at ON spot_attractions(updated_at DESC);
+
+COMMIT;
@@ -11,7 +11,6 @@
 import os
 import sys
 import asyncio
-import aiohttp
 import logging
 from typing import List, Dict
 from dotenv import load_dotenv
@@ -20,6 +19,7 @@ from dotenv import load_dotenv
 sys.path.append('backend')
 
 from supabase_client import supabase_client
+from http_client import http_clients
 
 # 加载环境变量
 load_dotenv()
@@ -77,45 +77,45 @@ class BeijingAttractionsUpdater:
             video_url = f"https://api.pexels.com/videos/search"
             headers = {"Authorization": self.pexels_key}
             
-            async with aiohttp.ClientSession() as session:
-                # 搜索图片
-                image_params = {
-                    "query": query,
-                    "per_page": 3,
-                    "orientation": "landscape",
-                    "size": "large"
-                }
-                
-                async with session.get(image_url, headers=headers, params=image_params) as response:
-                    if response.status == 200:
-                        image_data = await response.json()
-                        images = image_data.get("photos", [])
-                    else:
-                        images = []
-                
-                # 搜索视频
-                video_params = {
-                    "query": query,
-                    "per_page": 2,
-                    "orientation": "landscape",
-                    "size": "medium"
-                }
-                
-                async with session.get(video_url, headers=headers, params=video_params) as response:
-                    if response.status == 200:
-                        video_data = await response.json()
-                        videos = video_data.get("videos", [])
-                    else:
-                        videos = []
-                
-                result = {
-                    "image": images[0]["src"]["large"] if images else None,
-                    "video": videos[0]["video_files"][0]["link"] if videos and videos[0].get("video_files") else None
-                }
-                
-                logger.info(f"Pexels搜索成功: {query} -> 图片: {'✅' if result['image'] else '❌'}, 视频: {'✅' if result['video'] else '❌'}")
-                return result
-                
+            session = http_clients.get("image_search")
+            # 搜索图片
+            image_params = {
+                "query": query,
+                "per_page": 3,
+                "orientation": "landscape",
+                "size": "large"
+            }
+            
+            async with session.get(image_url, headers=headers, params=image_params) as response:
+                if response.status == 200:
+                    image_data = await response.json()
+                    images = image_data.get("photos", [])
+                else:
+                    images = []
+            
+            # 搜索视频
+            video_params = {
+                "query": query,
+                "per_page": 2,
+                "orientation": "landscape",
+                "size": "medium"
+            }
+            
+            async with session.get(video_url, headers=headers, params=video_params) as response:
+                if response.status == 200:
+                    video_data = await response.json()
+                    videos = video_data.get("videos", [])
+                else:
+                    videos = []
+            
+            result = {
+                "image": images[0]["src"]["large"] if images else None,
+                "video": videos[0]["video_files"][0]["link"] if videos and videos[0].get("video_files") else None
+            }
+            
+            logger.info(f"Pexels搜索成功: {query} -> 图片: {'✅' if result['image'] else '❌'}, 视频: {'✅' if result['video'] else '❌'}")
+            return result
+            
         except Exception as e:
             logger.error(f"Pexels搜索失败 {query}: {e}")
             return {"image": None, "video": None}
@@ -263,6 +263,8 @@ async def main():
         logger.info("用户中断操作")
     except Exception as e:
         logger.error(f"程序执行失败: {e}")
+    finally:
+        await http_clients.close()
 
 
 if __name__ == "__main__":
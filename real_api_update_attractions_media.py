@@ -15,7 +15,6 @@ import os
 import sys
 import json
 import asyncio
-import aiohttp
 import logging
 from typing import List, Dict, Optional
 from datetime import datetime
@@ -25,6 +24,7 @@ from dotenv import load_dotenv
 sys.path.append('backend')
 
 from supabase_client import supabase_client
+from http_client import http_clients
 
 # 加载环境变量
 load_dotenv()
@@ -71,32 +71,32 @@ class RealAPIMediaUpdater:
                 "orientation": "landscape"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        images = []
-                        
-                        for photo in data.get("results", []):
-                            image_info = {
-                                "id": photo["id"],
-                                "url": photo["urls"]["regular"],
-                                "medium_url": photo["urls"]["small"],
-                                "thumbnail": photo["urls"]["thumb"],
-                                "description": photo.get("alt_description", query) or query,
-                                "photographer": photo["user"]["name"],
-                                "photographer_url": photo["user"]["links"]["html"],
-                                "source": "Unsplash",
-                                "width": photo["width"],
-                                "height": photo["height"],
-                                "quality": "high"
-                            }
-                            images.append(image_info)
-                        
-                        logger.info(f"Unsplash图片搜索成功: {query} -> {len(images)}张图片")
-                        return images
-                    else:
-                        logger.error(f"Unsplash图片搜索失败: {response.status}")
+            session = http_clients.get("image_search")
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    images = []
+                    
+                    for photo in data.get("results", []):
+                        image_info = {
+                            "id": photo["id"],
+                            "url": photo["urls"]["regular"],
+                            "medium_url": photo["urls"]["small"],
+                            "thumbnail": photo["urls"]["thumb"],
+                            "description": photo.get("alt_description", query) or query,
+                            "photographer": photo["user"]["name"],
+                            "photographer_url": photo["user"]["links"]["html"],
+                            "source": "Unsplash",
+                            "width": photo["width"],
+                            "height": photo["height"],
+                            "quality": "high"
+                        }
+                        images.append(image_info)
+                    
+                    logger.info(f"Unsplash图片搜索成功: {query} -> {len(images)}张图片")
+                    return images
+                else:
+                    logger.error(f"Unsplash图片搜索失败: {response.status}")
             
             return []
             
@@ -120,32 +120,32 @@ class RealAPIMediaUpdater:
                 "orientation": "landscape"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        images = []
-                        
-                        for photo in data.get("photos", []):
-                            image_info = {
-                                "id": photo["id"],
-                                "url": photo["src"]["large"],
-                                "medium_url": photo["src"]["medium"],
-                                "thumbnail": photo["src"]["tiny"],
-                                "description": photo.get("alt", query) or query,
-                                "photographer": photo["photographer"],
-                                "photographer_url": photo["photographer_url"],
-                                "source": "Pexels",
-                                "width": photo["width"],
-                                "height": photo["height"],
-                                "quality": "high"
-                            }
-                            images.append(image_info)
-                        
-                        logger.info(f"Pexels图片搜索成功: {query} -> {len(images)}张图片")
-                        return images
-                    else:
-                        logger.error(f"Pexels图片搜索失败: {response.status}")
+            session = http_clients.get("image_search")
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    images = []
+                    
+                    for photo in data.get("photos", []):
+                        image_info = {
+                            "id": photo["id"],
+                            "url": photo["src"]["large"],
+                            "medium_url": photo["src"]["medium"],
+                            "thumbnail": photo["src"]["tiny"],
+                            "description": photo.get("alt", query) or query,
+                            "photographer": photo["photographer"],
+                            "photographer_url": photo["photographer_url"],
+                            "source": "Pexels",
+                            "width": photo["width"],
+                            "height": photo["height"],
+                            "quality": "high"
+                        }
+                        images.append(image_info)
+                    
+                    logger.info(f"Pexels图片搜索成功: {query} -> {len(images)}张图片")
+                    return images
+                else:
+                    logger.error(f"Pexels图片搜索失败: {response.status}")
             
             return []
             
@@ -169,38 +169,38 @@ class RealAPIMediaUpdater:
                 "orientation": "landscape"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        videos = []
-                        
-                        for video in data.get("videos", []):
-                            # 选择最高质量的视频文件
-                            video_files = video.get("video_files", [])
-                            if video_files:
-                                # 按质量排序，选择最佳质量
-                                best_video = max(video_files, key=lambda x: x.get("width", 0) * x.get("height", 0))
-                                
-                                video_info = {
-                                    "id": video["id"],
-                                    "url": best_video["link"],
-                                    "preview_url": video["image"],
-                                    "description": f"{query} 视频",
-                                    "photographer": video["user"]["name"],
-                                    "photographer_url": video["user"]["url"],
-                                    "source": "Pexels",
-                                    "width": best_video.get("width", 0),
-                                    "height": best_video.get("height", 0),
-                                    "duration": video.get("duration", 0),
-                                    "quality": best_video.get("quality", "hd")
-                                }
-                                videos.append(video_info)
-                        
-                        logger.info(f"Pexels视频搜索成功: {query} -> {len(videos)}个视频")
-                        return videos
-                    else:
-                        logger.error(f"Pexels视频搜索失败: {response.status}")
+            session = http_clients.get("image_search")
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    videos = []
+                    
+                    for video in data.get("videos", []):
+                        # 选择最高质量的视频文件
+                        video_files = video.get("video_files", [])
+                        if video_files:
+                            # 按质量排序，选择最佳质量
+                            best_video = max(video_files, key=lambda x: x.get("width", 0) * x.get("height", 0))
+                            
+                            video_info = {
+                                "id": video["id"],
+                                "url": best_video["link"],
+                                "preview_url": video["image"],
+                                "description": f"{query} 视频",
+                                "photographer": video["user"]["name"],
+                                "photographer_url": video["user"]["url"],
+                                "source": "Pexels",
+                                "width": best_video.get("width", 0),
+                                "height": best_video.get("height", 0),
+                                "duration": video.get("duration", 0),
+                                "quality": best_video.get("quality", "hd")
+                            }
+                            videos.append(video_info)
+                    
+                    logger.info(f"Pexels视频搜索成功: {query} -> {len(videos)}个视频")
+                    return videos
+                else:
+                    logger.error(f"Pexels视频搜索失败: {response.status}")
             
             return []
             
@@ -502,6 +502,8 @@ async def main():
         logger.info("用户中断操作")
     except Exception as e:
         logger.error(f"程序执行失败: {e}")
+    finally:
+        await http_clients.close()
 
 
 if __name__ == "__main__":
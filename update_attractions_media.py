@@ -11,7 +11,6 @@ import os
 import sys
 import json
 import asyncio
-import aiohttp
 import logging
 from typing import List, Dict, Optional
 from datetime import datetime
@@ -21,6 +20,7 @@ from dotenv import load_dotenv
 sys.path.append('backend')
 
 from supabase_client import supabase_client
+from http_client import http_clients
 from media_service_enhanced import ImageSearchService, VideoSearchService
 
 # 加载环境变量
@@ -67,33 +67,33 @@ class PexelsMediaUpdater:
                 "size": "large"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        images = []
-                        
-                        for photo in data.get("photos", []):
-                            image_info = {
-                                "id": photo["id"],
-                                "url": photo["src"]["large"],
-                                "medium_url": photo["src"]["medium"],
-                                "small_url": photo["src"]["small"],
-                                "thumbnail": photo["src"]["tiny"],
-                                "description": photo.get("alt", query),
-                                "photographer": photo["photographer"],
-                                "photographer_url": photo["photographer_url"],
-                                "source": "Pexels",
-                                "width": photo["width"],
-                                "height": photo["height"],
-                                "quality": "high"
-                            }
-                            images.append(image_info)
-                        
-                        logger.info(f"Pexels图片搜索成功: {query} -> {len(images)}张图片")
-                        return images
-                    else:
-                        logger.error(f"Pexels图片搜索失败: {response.status} - {await response.text()}")
+            session = http_clients.get("image_search")
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    images = []
+                    
+                    for photo in data.get("photos", []):
+                        image_info = {
+                            "id": photo["id"],
+                            "url": photo["src"]["large"],
+                            "medium_url": photo["src"]["medium"],
+                            "small_url": photo["src"]["small"],
+                            "thumbnail": photo["src"]["tiny"],
+                            "description": photo.get("alt", query),
+                            "photographer": photo["photographer"],
+                            "photographer_url": photo["photographer_url"],
+                            "source": "Pexels",
+                            "width": photo["width"],
+                            "height": photo["height"],
+                            "quality": "high"
+                        }
+                        images.append(image_info)
+                    
+                    logger.info(f"Pexels图片搜索成功: {query} -> {len(images)}张图片")
+                    return images
+                else:
+                    logger.error(f"Pexels图片搜索失败: {response.status} - {await response.text()}")
             
             return []
             
@@ -115,38 +115,38 @@ class PexelsMediaUpdater:
                 "size": "large"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        videos = []
-                        
-                        for video in data.get("videos", []):
-                            # 选择最高质量的视频文件
-                            video_files = video.get("video_files", [])
-                            if video_files:
-                                # 按质量排序，选择最佳质量
-                                best_video = max(video_files, key=lambda x: x.get("width", 0) * x.get("height", 0))
-                                
-                                video_info = {
-                                    "id": video["id"],
-                                    "url": best_video["link"],
-                                    "preview_url": video["image"],
-                                    "description": f"{query} 视频",
-                                    "photographer": video["user"]["name"],
-                                    "photographer_url": video["user"]["url"],
-                                    "source": "Pexels",
-                                    "width": best_video.get("width", 0),
-                                    "height": best_video.get("height", 0),
-                                    "duration": video.get("duration", 0),
-                                    "quality": best_video.get("quality", "hd")
-                                }
-                                videos.append(video_info)
-                        
-                        logger.info(f"Pexels视频搜索成功: {query} -> {len(videos)}个视频")
-                        return videos
-                    else:
-                        logger.error(f"Pexels视频搜索失败: {response.status} - {await response.text()}")
+            session = http_clients.get("image_search")
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    videos = []
+                    
+                    for video in data.get("videos", []):
+                        # 选择最高质量的视频文件
+                        video_files = video.get("video_files", [])
+                        if video_files:
+                            # 按质量排序，选择最佳质量
+                            best_video = max(video_files, key=lambda x: x.get("width", 0) * x.get("height", 0))
+                            
+                            video_info = {
+                                "id": video["id"],
+                                "url": best_video["link"],
+                                "preview_url": video["image"],
+                                "description": f"{query} 视频",
+                                "photographer": video["user"]["name"],
+                                "photographer_url": video["user"]["url"],
+                                "source": "Pexels",
+                                "width": best_video.get("width", 0),
+                                "height": best_video.get("height", 0),
+                                "duration": video.get("duration", 0),
+                                "quality": best_video.get("quality", "hd")
+                            }
+                            videos.append(video_info)
+                    
+                    logger.info(f"Pexels视频搜索成功: {query} -> {len(videos)}个视频")
+                    return videos
+                else:
+                    logger.error(f"Pexels视频搜索失败: {response.status} - {await response.text()}")
             
             return []
             
@@ -428,6 +428,8 @@ async def main():
         logger.info("用户中断操作")
     except Exception as e:
         logger.error(f"程序执行失败: {e}")
+    finally:
+        await http_clients.close()
 
 
 if __name__ == "__main__":